@@ -5,7 +5,7 @@ Optional: Groq Whisper (paid fallback)
 """
 
 import logging
-from typing import Optional
+from typing import Callable, Optional
 from config import config
 
 logger = logging.getLogger(__name__)
@@ -40,13 +40,18 @@ class ASRRouter:
             except Exception as e:
                 logger.error(f"Failed to initialize Groq Whisper: {e}")
     
-    def transcribe_audio(self, audio_file_path: str, language: Optional[str] = None) -> str:
+    def transcribe_audio(self, audio_file_path: str, language: Optional[str] = None,
+                         file_hash: Optional[str] = None,
+                         on_partial: Optional[Callable] = None) -> str:
         """
         Transcribe audio file using available engines
         
         Args:
             audio_file_path: Path to audio file
             language: Optional language hint
+            file_hash: SHA-256 of the file, if known, for the transcript cache
+            on_partial: Receives finished windows while Faster-Whisper is still
+                decoding the rest (the Groq fallback returns the whole text at once)
             
         Returns:
             Transcribed text
@@ -55,7 +60,7 @@ class ASRRouter:
         if self.faster_whisper_engine and self.faster_whisper_engine.is_available():
             try:
                 logger.info("Using Faster-Whisper for transcription")
-                return self.faster_whisper_engine.transcribe(audio_file_path, language)
+                return self.faster_whisper_engine.transcribe(audio_file_path, language, file_hash, on_partial)
             except Exception as e:
                 logger.error(f"Faster-Whisper failed: {e}")
                 # Continue to fallback
@@ -131,7 +136,9 @@ def get_asr_router() -> ASRRouter:
         asr_router = ASRRouter()
     return asr_router
 
-def transcribe_audio(audio_file_path: str, language: Optional[str] = None) -> str:
+def transcribe_audio(audio_file_path: str, language: Optional[str] = None,
+                     file_hash: Optional[str] = None,
+                     on_partial: Optional[Callable] = None) -> str:
     """Convenience function for audio transcription"""
     router = get_asr_router()
-    return router.transcribe_audio(audio_file_path, language)
\ No newline at end of file
+    return router.transcribe_audio(audio_file_path, language, file_hash, on_partial)
\ No newline at end of file
@@ -0,0 +1,154 @@
+"""
+Persistent transcript cache
+
+Indexed SQLite store replacing the loose asr_cache/*.txt files. Entries are
+keyed by the SHA-256 of the source audio plus a variant (engine, model,
+language), so a hash computed while downloading (utils.downloads) is enough
+for a lookup and a cache hit never reads the audio file. Each entry records
+its size; when the total exceeds max_bytes the least recently used entries
+are evicted.
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def file_sha256(path: str, block_size: int = HASH_BLOCK_SIZE) -> str:
+    """SHA-256 of a file read in fixed-size blocks (for audio not fetched via DownloadService)"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class TranscriptCache:
+    """
+    Transcripts indexed by (content hash, variant) with size-based LRU eviction
+
+    Args:
+        db_path: SQLite file (parent directory is created)
+        max_bytes: Total payload size to keep; 0 disables eviction
+    """
+
+    def __init__(self, db_path: str = "asr_cache/transcripts.db", max_bytes: int = 256 * 1024 * 1024):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS transcripts (
+                content_hash TEXT NOT NULL,
+                variant TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (content_hash, variant)
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_transcripts_access ON transcripts(accessed_at)"
+        )
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, content_hash: str, variant: str = "") -> Optional[Dict[str, Any]]:
+        """Cached payload or None; a hit refreshes the entry's LRU position"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload FROM transcripts WHERE content_hash = ? AND variant = ?",
+                (content_hash, variant)
+            ).fetchone()
+            if row is None:
+                self._misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE transcripts SET accessed_at = ? WHERE content_hash = ? AND variant = ?",
+                (time.time(), content_hash, variant)
+            )
+            self._hits += 1
+        try:
+            return json.loads(row[0])
+        except ValueError:
+            logger.warning(f"Corrupted transcript cache entry {content_hash[:12]}")
+            return None
+
+    def put(self, content_hash: str, payload: Dict[str, Any], variant: str = ""):
+        """Store a payload (JSON-serializable dict) and evict old entries over max_bytes"""
+        raw = json.dumps(payload, ensure_ascii=False, separators=(',', ':'))
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO transcripts "
+                "(content_hash, variant, payload, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (content_hash, variant, raw, len(raw.encode()), now, now)
+            )
+            self._evict()
+
+    def _evict(self):
+        if not self.max_bytes:
+            return
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM transcripts").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Walk the access index from the oldest; the newest entry is always kept
+        stale = []
+        for content_hash, variant, size in self._conn.execute(
+            "SELECT content_hash, variant, size FROM transcripts ORDER BY accessed_at ASC"
+        ).fetchall()[:-1]:
+            if total <= self.max_bytes:
+                break
+            stale.append((content_hash, variant))
+            total -= size
+        if stale:
+            self._conn.executemany(
+                "DELETE FROM transcripts WHERE content_hash = ? AND variant = ?", stale
+            )
+            self._evictions += len(stale)
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            count, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM transcripts"
+            ).fetchone()
+        return {
+            'entries': count,
+            'bytes': size,
+            'hits': self._hits,
+            'misses': self._misses,
+            'evictions': self._evictions,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def create_transcript_cache(config=None) -> Optional[TranscriptCache]:
+    """Cache from ASR_CACHE_PATH / ASR_CACHE_MAX_MB; None when ASR_CACHE_MAX_MB is 0"""
+    max_mb = getattr(config, 'ASR_CACHE_MAX_MB', 256)
+    if not max_mb:
+        return None
+    try:
+        return TranscriptCache(
+            db_path=getattr(config, 'ASR_CACHE_PATH', 'asr_cache/transcripts.db'),
+            max_bytes=max_mb * 1024 * 1024,
+        )
+    except sqlite3.Error as e:
+        logger.warning(f"Transcript cache disabled: {e}")
+        return None
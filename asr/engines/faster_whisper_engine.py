@@ -1,14 +1,18 @@
 """
 Faster-Whisper ASR Engine - Free local alternative to Groq Whisper
 Uses CTranslate2 for efficient CPU inference
+
+Long audio is split on VAD silence into ~30-60 s windows (asr.vad) that are
+transcribed in parallel by a pool of model workers and merged back in order
+with absolute timestamps; finished windows are streamed to the caller.
 """
 
 import os
 import logging
 import tempfile
-import hashlib
-from typing import Optional, Tuple
-from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 import subprocess
 
 try:
@@ -18,10 +22,37 @@ except ImportError:
     FASTER_WHISPER_AVAILABLE = False
     WhisperModel = None
 
+from asr.cache import create_transcript_cache, file_sha256
+from asr.vad import SAMPLE_RATE, find_silences, plan_windows, read_wav
 from config import config
 
 logger = logging.getLogger(__name__)
 
+
+@dataclass
+class TranscriptWindow:
+    """One transcribed window; segment timestamps are absolute (seconds from file start)"""
+    index: int
+    start: float
+    end: float
+    text: str
+    segments: List[Dict[str, Any]]
+    language: Optional[str]
+
+
+def tune_workers(cores: int, requested: int = 0) -> Tuple[int, int]:
+    """
+    (num_workers, cpu_threads) for CTranslate2
+
+    num_workers is how many windows decode at once; cpu_threads splits the
+    cores between them. Auto mode uses half the cores (up to 4) as workers:
+    beyond that each decode gets too few threads to pay off.
+    """
+    workers = requested or max(1, min(4, cores // 2))
+    workers = max(1, min(workers, cores))
+    return workers, max(1, cores // workers)
+
+
 class FasterWhisperEngine:
     """Faster-Whisper ASR engine with caching and preprocessing"""
     
@@ -29,32 +60,44 @@ class FasterWhisperEngine:
         self.model = None
         self.model_size = config.FASTER_WHISPER_MODEL
         self.compute_type = config.FASTER_WHISPER_COMPUTE
-        self.cache_dir = Path("./asr_cache")
-        self.cache_dir.mkdir(exist_ok=True)
+        self.cache = create_transcript_cache(config)
+        self.num_workers, self.cpu_threads = tune_workers(
+            os.cpu_count() or 1, getattr(config, 'ASR_WORKERS', 0)
+        )
+        self.window_min = getattr(config, 'ASR_WINDOW_MIN_SECONDS', 30)
+        self.window_max = getattr(config, 'ASR_WINDOW_MAX_SECONDS', 60)
         
         if not FASTER_WHISPER_AVAILABLE:
             raise ImportError("faster-whisper не установлен. Установите: pip install faster-whisper")
         
         self._load_model()
+        self._pool = ThreadPoolExecutor(max_workers=self.num_workers, thread_name_prefix="asr")
     
     def _load_model(self):
         """Load the Whisper model with caching"""
         try:
-            logger.info(f"Loading Faster-Whisper model: {self.model_size} with compute_type: {self.compute_type}")
+            logger.info(
+                f"Loading Faster-Whisper model: {self.model_size} with compute_type: {self.compute_type}, "
+                f"{self.num_workers} workers x {self.cpu_threads} threads"
+            )
             
             # Try to use the specified compute type, fallback to float32 if needed
             try:
                 self.model = WhisperModel(
                     self.model_size,
                     device="cpu",
-                    compute_type=self.compute_type
+                    compute_type=self.compute_type,
+                    cpu_threads=self.cpu_threads,
+                    num_workers=self.num_workers
                 )
             except Exception as e:
                 logger.warning(f"Failed to load with {self.compute_type}, trying float32: {e}")
                 self.model = WhisperModel(
                     self.model_size,
                     device="cpu",
-                    compute_type="float32"
+                    compute_type="float32",
+                    cpu_threads=self.cpu_threads,
+                    num_workers=self.num_workers
                 )
             
             logger.info("Faster-Whisper model loaded successfully")
@@ -63,29 +106,9 @@ class FasterWhisperEngine:
             logger.error(f"Failed to load Faster-Whisper model: {e}")
             raise
     
-    def _get_file_hash(self, file_path: str) -> str:
-        """Get hash of audio file for caching"""
-        with open(file_path, 'rb') as f:
-            content = f.read()
-        return hashlib.md5(content).hexdigest()
-    
-    def _get_cached_result(self, file_hash: str) -> Optional[str]:
-        """Check if transcription is cached"""
-        cache_file = self.cache_dir / f"{file_hash}.txt"
-        if cache_file.exists():
-            try:
-                return cache_file.read_text(encoding='utf-8')
-            except Exception as e:
-                logger.warning(f"Failed to read cache file: {e}")
-        return None
-    
-    def _save_to_cache(self, file_hash: str, transcription: str):
-        """Save transcription to cache"""
-        try:
-            cache_file = self.cache_dir / f"{file_hash}.txt"
-            cache_file.write_text(transcription, encoding='utf-8')
-        except Exception as e:
-            logger.warning(f"Failed to save to cache: {e}")
+    def _cache_variant(self, language: Optional[str]) -> str:
+        """Cache key part: the same audio gives different text per model/language"""
+        return f"faster_whisper:{self.model_size}:{language or 'auto'}"
     
     def _preprocess_audio(self, input_path: str) -> str:
         """
@@ -125,13 +148,100 @@ class FasterWhisperEngine:
             logger.error(f"Audio preprocessing failed: {e}")
             raise
     
-    def transcribe(self, audio_file_path: str, language: Optional[str] = None) -> str:
+    def _transcribe_window(self, samples, window: Tuple[float, float], index: int,
+                           language: Optional[str]) -> TranscriptWindow:
+        """Transcribe one window of the preprocessed audio (runs on a pool thread)"""
+        start, end = window
+        segments, info = self.model.transcribe(
+            samples[int(start * SAMPLE_RATE):int(end * SAMPLE_RATE)],
+            language=language,
+            beam_size=5,
+            best_of=5,
+            temperature=0.0,
+            compression_ratio_threshold=2.4,
+            log_prob_threshold=-1.0,
+            no_speech_threshold=0.6,
+            condition_on_previous_text=False,
+            vad_filter=True,
+            vad_parameters=dict(min_silence_duration_ms=500)
+        )
+        
+        # Segments are decoded lazily: iterate here so the work stays on this thread
+        parts = []
+        merged = []
+        for segment in segments:
+            text = segment.text.strip()
+            if text:
+                parts.append(text)
+                merged.append({
+                    "start": round(start + segment.start, 2),
+                    "end": round(start + segment.end, 2),
+                    "text": text
+                })
+        return TranscriptWindow(index, start, end, " ".join(parts), merged, info.language)
+    
+    def transcribe_stream(self, audio_file_path: str,
+                          language: Optional[str] = None) -> Iterator[TranscriptWindow]:
+        """
+        Transcribe audio window by window, yielding windows in order as they finish
+        
+        Windows are decoded in parallel on the worker pool. Without a language
+        hint the first window is decoded alone and its detected language is
+        used for the rest, so all windows agree.
+        """
+        if not self.model:
+            raise RuntimeError("Faster-Whisper model not loaded")
+        
+        preprocessed_path = self._preprocess_audio(audio_file_path)
+        try:
+            samples = read_wav(preprocessed_path)
+        finally:
+            # Clean up preprocessed file: the samples are in memory now
+            try:
+                os.unlink(preprocessed_path)
+            except Exception as e:
+                logger.warning(f"Failed to clean up temp file: {e}")
+        
+        duration = len(samples) / SAMPLE_RATE
+        windows = plan_windows(duration, find_silences(samples), self.window_min, self.window_max)
+        logger.info(
+            f"Starting transcription with language: {language}, "
+            f"{duration:.0f}s in {len(windows)} windows on {self.num_workers} workers"
+        )
+        
+        first = 0
+        if language is None:
+            head = self._transcribe_window(samples, windows[0], 0, None)
+            language = head.language
+            logger.info(f"Detected language: {language}")
+            first = 1
+            yield head
+        
+        futures = [
+            self._pool.submit(self._transcribe_window, samples, window, index, language)
+            for index, window in enumerate(windows[first:], start=first)
+        ]
+        try:
+            for future in futures:
+                yield future.result()
+        finally:
+            # Caller stopped early or a window failed: drop windows not started yet
+            for future in futures:
+                future.cancel()
+    
+    def transcribe(self, audio_file_path: str, language: Optional[str] = None,
+                   file_hash: Optional[str] = None,
+                   on_partial: Optional[Callable[[TranscriptWindow], None]] = None) -> str:
         """
         Transcribe audio file to text
         
         Args:
             audio_file_path: Path to audio file
             language: Optional language code ('ru', 'en', etc.)
+            file_hash: SHA-256 of the file if already known (computed while downloading);
+                with it a cache hit never reads the file
+            on_partial: Called with each finished window, in order, while later
+                windows are still being decoded
             
         Returns:
             Transcribed text
@@ -140,63 +250,48 @@ class FasterWhisperEngine:
             raise RuntimeError("Faster-Whisper model not loaded")
         
         # Check cache first
-        file_hash = self._get_file_hash(audio_file_path)
-        cached_result = self._get_cached_result(file_hash)
-        if cached_result:
-            logger.info("Using cached transcription")
-            return cached_result
+        variant = self._cache_variant(language)
+        if self.cache is not None:
+            if file_hash is None:
+                file_hash = file_sha256(audio_file_path)
+            cached = self.cache.get(file_hash, variant)
+            if cached and cached.get("text"):
+                logger.info("Using cached transcription")
+                return cached["text"]
         
-        preprocessed_path = None
         try:
-            # Preprocess audio
-            preprocessed_path = self._preprocess_audio(audio_file_path)
-            
-            # Transcribe
-            logger.info(f"Starting transcription with language: {language}")
-            
-            segments, info = self.model.transcribe(
-                preprocessed_path,
-                language=language,
-                beam_size=5,
-                best_of=5,
-                temperature=0.0,
-                compression_ratio_threshold=2.4,
-                log_prob_threshold=-1.0,
-                no_speech_threshold=0.6,
-                condition_on_previous_text=False,
-                vad_filter=True,
-                vad_parameters=dict(min_silence_duration_ms=500)
-            )
+            windows = []
+            for window in self.transcribe_stream(audio_file_path, language):
+                windows.append(window)
+                if on_partial and window.text:
+                    try:
+                        on_partial(window)
+                    except Exception as e:
+                        logger.warning(f"Partial transcript callback failed: {e}")
             
-            # Collect segments into text
-            transcription_parts = []
-            for segment in segments:
-                transcription_parts.append(segment.text.strip())
-            
-            transcription = " ".join(transcription_parts).strip()
+            transcription = " ".join(window.text for window in windows if window.text).strip()
             
             if not transcription:
                 raise Exception("No speech detected in audio file")
             
             logger.info(f"Transcription completed: {len(transcription)} characters")
-            logger.info(f"Detected language: {info.language} (probability: {info.language_probability:.2f})")
             
             # Cache the result
-            self._save_to_cache(file_hash, transcription)
+            if self.cache is not None:
+                try:
+                    self.cache.put(file_hash, {
+                        "text": transcription,
+                        "language": windows[0].language,
+                        "segments": [segment for window in windows for segment in window.segments]
+                    }, variant)
+                except Exception as e:
+                    logger.warning(f"Failed to save to cache: {e}")
             
             return transcription
             
         except Exception as e:
             logger.error(f"Transcription failed: {e}")
             raise Exception(f"Не удалось распознать речь: {str(e)}")
-            
-        finally:
-            # Clean up preprocessed file
-            if preprocessed_path and os.path.exists(preprocessed_path):
-                try:
-                    os.unlink(preprocessed_path)
-                except Exception as e:
-                    logger.warning(f"Failed to clean up temp file: {e}")
     
     def is_available(self) -> bool:
         """Check if engine is available and working"""
@@ -213,7 +308,9 @@ def get_faster_whisper_engine() -> FasterWhisperEngine:
         faster_whisper_engine = FasterWhisperEngine()
     return faster_whisper_engine
 
-def transcribe_audio(audio_file_path: str, language: Optional[str] = None) -> str:
+def transcribe_audio(audio_file_path: str, language: Optional[str] = None,
+                     file_hash: Optional[str] = None,
+                     on_partial: Optional[Callable[[TranscriptWindow], None]] = None) -> str:
     """Convenience function for audio transcription"""
     engine = get_faster_whisper_engine()
-    return engine.transcribe(audio_file_path, language)
\ No newline at end of file
+    return engine.transcribe(audio_file_path, language, file_hash, on_partial)
\ No newline at end of file
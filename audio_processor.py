@@ -4,8 +4,6 @@ import io
 import tempfile
 import logging
 import asyncio
-import aiohttp
-import aiofiles
 import math
 import subprocess
 import shutil
@@ -13,6 +11,9 @@ from pathlib import Path
 from typing import Dict, Any, Optional, List, Tuple
 from groq import Groq
 
+from asr.cache import TranscriptCache
+from utils.downloads import DownloadResult, DownloadTooLarge, download_service
+
 # --- ADD: make pydub use bundled ffmpeg ---
 from utils.ffmpeg import ensure_ffmpeg
 FFMPEG_BIN = ensure_ffmpeg()
@@ -31,12 +32,17 @@ os.environ["PATH"] = os.path.dirname(FFMPEG_BIN) + os.pathsep + os.environ.get("
 logger = logging.getLogger(__name__)
 logger.info(f"Using ffmpeg binary at: {FFMPEG_BIN}")
 
+# Вариант ключа кэша транскриптов: модель и формат ответа transcribe_wav
+GROQ_CACHE_VARIANT = "groq:whisper-large-v3:verbose"
+
 SUPPORTED_EXTS = {".ogg", ".oga", ".mp3", ".m4a", ".wav", ".flac", ".webm", ".aac", ".opus"}
 
 class AudioProcessor:
-    def __init__(self, groq_client: Groq, max_file_size_mb: int = 50):
+    def __init__(self, groq_client: Groq, max_file_size_mb: int = 50,
+                 transcript_cache: Optional[TranscriptCache] = None):
         self.groq = groq_client
         self.max_mb = max_file_size_mb
+        self.transcript_cache = transcript_cache
 
     def format_timestamp(self, seconds: float) -> str:
         """Форматирует секунды в MM:SS или HH:MM:SS"""
@@ -125,14 +131,9 @@ class AudioProcessor:
                 "emotion_map": {i: "нейтрально" for i in range(len(segments))}
             }
 
-    async def download_telegram_file(self, file_url: str, dst_path: str) -> None:
-        """Скачивает файл из Telegram через aiohttp"""
-        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=600)) as session:
-            async with session.get(file_url) as resp:
-                resp.raise_for_status()
-                async with aiofiles.open(dst_path, "wb") as f:
-                    async for chunk in resp.content.iter_chunked(8192):
-                        await f.write(chunk)
+    async def download_telegram_file(self, file_url: str, dst_path: str) -> DownloadResult:
+        """Скачивает файл из Telegram через общий сервис скачивания (лимит - max_mb)"""
+        return await download_service.download(file_url, dst_path, max_bytes=self.max_mb * 1024 * 1024)
 
     async def download_audio_by_file_id(self, bot_token: str, file_id: str, dst_path: str) -> str:
         """
@@ -148,42 +149,33 @@ class AudioProcessor:
         """
         # Получаем информацию о файле
         get_file_url = f"https://api.telegram.org/bot{bot_token}/getFile?file_id={file_id}"
-        
-        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=600)) as session:
-            # Получаем file_path
-            async with session.get(get_file_url) as resp:
-                resp.raise_for_status()
-                file_info = await resp.json()
-                
-                if not file_info.get("ok"):
-                    raise Exception(f"Не удалось получить информацию о файле: {file_info.get('description', 'неизвестная ошибка')}")
-                
-                file_path = file_info["result"]["file_path"]
-                file_size = file_info["result"].get("file_size", 0)
-                
-                # Проверяем размер файла
-                max_size_bytes = self.max_mb * 1024 * 1024
-                if file_size > max_size_bytes:
-                    raise Exception(f"Файл слишком большой: {file_size / 1024 / 1024:.1f} МБ (лимит: {self.max_mb} МБ)")
-            
-            # Скачиваем файл
-            download_url = f"https://api.telegram.org/file/bot{bot_token}/{file_path}"
-            
-            # Определяем имя файла
-            import uuid
-            unique_id = str(uuid.uuid4())[:8]
-            file_extension = os.path.splitext(file_path)[1] or ".tmp"
-            final_filename = f"telegram_audio_{unique_id}{file_extension}"
-            final_path = os.path.join(dst_path, final_filename)
-            
-            async with session.get(download_url) as resp:
-                resp.raise_for_status()
-                async with aiofiles.open(final_path, "wb") as f:
-                    async for chunk in resp.content.iter_chunked(8192):
-                        await f.write(chunk)
-            
-            logger.info(f"Файл скачан: {final_path} ({file_size / 1024:.1f} КБ)")
-            return final_path
+        file_info = await download_service.get_json(get_file_url)
+
+        if not file_info.get("ok"):
+            raise Exception(f"Не удалось получить информацию о файле: {file_info.get('description', 'неизвестная ошибка')}")
+
+        file_path = file_info["result"]["file_path"]
+        file_size = file_info["result"].get("file_size", 0)
+
+        # Проверяем размер файла
+        max_size_bytes = self.max_mb * 1024 * 1024
+        if file_size > max_size_bytes:
+            raise Exception(f"Файл слишком большой: {file_size / 1024 / 1024:.1f} МБ (лимит: {self.max_mb} МБ)")
+
+        # Скачиваем файл
+        download_url = f"https://api.telegram.org/file/bot{bot_token}/{file_path}"
+
+        # Определяем имя файла
+        import uuid
+        unique_id = str(uuid.uuid4())[:8]
+        file_extension = os.path.splitext(file_path)[1] or ".tmp"
+        final_filename = f"telegram_audio_{unique_id}{file_extension}"
+        final_path = os.path.join(dst_path, final_filename)
+
+        download = await self.download_telegram_file(download_url, final_path)
+
+        logger.info(f"Файл скачан: {final_path} ({download.size / 1024:.1f} КБ)")
+        return final_path
 
     def _convert_to_wav16k_mono(self, src_path: str, dst_path: str) -> Tuple[float, int]:
         """Конвертация через ffmpeg + возврат (длительность_сек, битрейт_Гц)."""
@@ -261,6 +253,67 @@ class AudioProcessor:
             "language": language
         }
 
+    async def _transcribe_file(self, original_path: str, wav_path: str) -> Optional[Dict[str, Any]]:
+        """Конвертация и распознавание файла; None - речь не распознана"""
+        # Конвертируем в WAV 16kHz mono
+        duration, _ = self._convert_to_wav16k_mono(original_path, wav_path)
+
+        # Если длительное — режем и транскрибируем по кускам
+        chunk_paths = self._split_wav(wav_path, chunk_secs=600) if duration > 620 else [wav_path]
+
+        all_segments = []
+        all_text_parts = []
+        time_offset = 0.0
+        detected_language = "unknown"
+
+        for cp in chunk_paths:
+            result = await self.transcribe_wav(cp)
+            if result and result.get("text"):
+                all_text_parts.append(result["text"])
+                detected_language = result.get("language", detected_language)
+
+                # Добавляем сегменты с корректировкой времени
+                for seg in result.get("segments", []):
+                    all_segments.append({
+                        "start": seg["start"] + time_offset,
+                        "end": seg["end"] + time_offset,
+                        "text": seg["text"]
+                    })
+
+                # Обновляем смещение времени для следующего куска
+                if result.get("segments"):
+                    time_offset = all_segments[-1]["end"]
+
+        if not all_text_parts:
+            return None
+
+        return {
+            "transcript": "\n".join(all_text_parts),
+            "segments": all_segments,
+            "language": detected_language,
+            "duration_sec": duration,
+        }
+
+    def _cached_transcript(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        if self.transcript_cache is None:
+            return None
+        try:
+            cached = self.transcript_cache.get(content_hash, GROQ_CACHE_VARIANT)
+        except Exception as e:
+            logger.warning(f"Ошибка чтения кэша транскриптов: {e}")
+            return None
+        if cached:
+            logger.info(f"Транскрипт из кэша: {content_hash[:12]}")
+        return cached
+
+    def _store_transcript(self, content_hash: str, asr_result: Dict[str, Any]):
+        if self.transcript_cache is None:
+            return
+        try:
+            self.transcript_cache.put(content_hash, asr_result, GROQ_CACHE_VARIANT)
+        except Exception as e:
+            logger.warning(f"Не удалось сохранить транскрипт в кэш: {e}")
+
     async def process_audio_from_telegram(self, file_url: str, filename_hint: str) -> Dict[str, Any]:
         """Основной метод обработки аудио из Telegram"""
         if not filename_hint:
@@ -276,45 +329,24 @@ class AudioProcessor:
         wav_path = os.path.join(tmp_dir, "audio.wav")
 
         try:
-            await self.download_telegram_file(file_url, original_path)
-
-            size_mb = os.path.getsize(original_path) / (1024 * 1024)
-            if size_mb > self.max_mb:
-                return {"success": False, "error": f"Аудио слишком большое ({size_mb:.1f}MB), лимит {self.max_mb}MB"}
-
-            # Конвертируем в WAV 16kHz mono
-            duration, _ = self._convert_to_wav16k_mono(original_path, wav_path)
-
-            # Если длительное — режем и транскрибируем по кускам
-            chunk_paths = self._split_wav(wav_path, chunk_secs=600) if duration > 620 else [wav_path]
-
-            all_segments = []
-            all_text_parts = []
-            time_offset = 0.0
-            detected_language = "unknown"
-
-            for cp in chunk_paths:
-                result = await self.transcribe_wav(cp)
-                if result and result.get("text"):
-                    all_text_parts.append(result["text"])
-                    detected_language = result.get("language", detected_language)
-
-                    # Добавляем сегменты с корректировкой времени
-                    for seg in result.get("segments", []):
-                        all_segments.append({
-                            "start": seg["start"] + time_offset,
-                            "end": seg["end"] + time_offset,
-                            "text": seg["text"]
-                        })
-
-                    # Обновляем смещение времени для следующего куска
-                    if result.get("segments"):
-                        time_offset = all_segments[-1]["end"]
-
-            if not all_text_parts:
-                return {"success": False, "error": "Не удалось распознать речь."}
-
-            transcript = "\n".join(all_text_parts)
+            try:
+                # Лимит проверяется по ходу скачивания, а не после
+                download = await self.download_telegram_file(file_url, original_path)
+            except DownloadTooLarge as e:
+                return {"success": False, "error": f"Аудио слишком большое ({e.size / 1024 / 1024:.1f}MB), лимит {self.max_mb}MB"}
+
+            # SHA-256 посчитан при скачивании: попадание в кэш не читает файл
+            asr_result = self._cached_transcript(download.sha256)
+            if asr_result is None:
+                asr_result = await self._transcribe_file(original_path, wav_path)
+                if asr_result is None:
+                    return {"success": False, "error": "Не удалось распознать речь."}
+                self._store_transcript(download.sha256, asr_result)
+
+            transcript = asr_result["transcript"]
+            all_segments = asr_result["segments"]
+            detected_language = asr_result["language"]
+            duration = asr_result["duration_sec"]
 
             # Определяем спикеров и эмоции (только если есть сегменты)
             speaker_emotion_data = None
@@ -11,7 +11,7 @@ from dataclasses import dataclass, field
 logger = logging.getLogger(__name__)
 
 
-@dataclass
+@dataclass(slots=True)
 class ChatContext:
     """Контекст диалога пользователя"""
     user_id: int
@@ -8,7 +8,7 @@ from dataclasses import dataclass
 logger = logging.getLogger(__name__)
 
 
-@dataclass
+@dataclass(slots=True)
 class ContentItem:
     """Элемент контента"""
     type: str  # 'text', 'image', 'url', 'pdf', 'youtube'
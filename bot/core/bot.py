@@ -5,8 +5,12 @@ import logging
 import aiohttp
 from typing import Optional, Dict
 from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 
 from bot.core.router import UpdateRouter
+from bot.core.dispatcher import UpdateDispatcher, coalesce_text_updates, supersedes_callback
+from bot.core.update_ledger import UpdateLedger, STATUS_SHED
+from bot.core.webhook import WebhookServer
 from bot.handlers.commands import CommandHandler
 from bot.handlers.text_handler import TextHandler
 from bot.handlers.document_handler import DocumentHandler
@@ -14,6 +18,11 @@ from bot.handlers.audio_handler import AudioHandler
 from bot.handlers.photo_handler import PhotoHandler
 from bot.handlers.callback_handler import CallbackHandler
 from bot.handlers.choice_handler import ChoiceHandler
+from bot.middleware.send_queue import OutboundMessageQueue, PRIORITY_INTERACTIVE
+from bot.rate_limiter import create_rate_limiter
+from bot.state_store import create_store
+from bot.media_cache import create_media_cache
+from utils.downloads import download_service
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +30,8 @@ logger = logging.getLogger(__name__)
 class RefactoredBot:
     """Рефакторенный Telegram бот с модульной архитектурой"""
 
+    ALLOWED_UPDATES = ["message", "callback_query"]
+
     def __init__(
         self,
         token: str,
@@ -62,18 +73,25 @@ class RefactoredBot:
         # HTTP session
         self.session: Optional[aiohttp.ClientSession] = None
 
+        # Очередь исходящих сообщений с лимитами Telegram
+        self.outbound: Optional[OutboundMessageQueue] = None
+
         # Thread pool для блокирующих операций
         self.executor = ThreadPoolExecutor(max_workers=4)
 
         # Router для маршрутизации обновлений
         self.router = UpdateRouter()
 
-        # Shared state dictionaries для handlers
-        self.user_settings: Dict = {}
-        self.user_states: Dict = {}
-        self.user_messages_buffer: Dict = {}
-        self.user_requests: Dict = {}
-        self.processing_users: set = set()
+        # Shared state для handlers: ограниченные хранилища (LRU + TTL), при
+        # STATE_BACKEND=sqlite/redis общие для всех реплик
+        self.user_settings = create_store('user_settings', config)
+        self.user_states = create_store('user_states', config)
+        self.user_messages_buffer = create_store('user_messages_buffer', config)
+        # Общий лимитер запросов для всех обработчиков
+        self.rate_limiter = create_rate_limiter(config)
+        # Результаты обработки медиа по file_unique_id (общие для обработчиков)
+        self.media_cache = create_media_cache(config)
+        self._state_sweep_task: Optional[asyncio.Task] = None
 
         # Handlers будут инициализированы после создания session
         self.command_handler: Optional[CommandHandler] = None
@@ -84,9 +102,32 @@ class RefactoredBot:
         self.callback_handler: Optional[CallbackHandler] = None
         self.choice_handler: Optional[ChoiceHandler] = None
 
-        # Offset для long polling
+        # Offset для long polling (восстанавливается из журнала при старте)
         self.update_offset = 0
 
+        # Журнал обновлений: сохраненный offset и идемпотентность по update_id
+        self.ledger = UpdateLedger(
+            getattr(config, 'UPDATE_LEDGER_PATH', 'bot_updates.db'),
+            max_attempts=getattr(config, 'UPDATE_MAX_ATTEMPTS', 3),
+        )
+
+        # Диспетчер обновлений: ограниченный пул воркеров, FIFO очередь на пользователя
+        coalesce_window = getattr(config, 'TEXT_COALESCE_SECONDS', 10)
+        self.dispatcher = UpdateDispatcher(
+            self._process_and_commit,
+            on_overload=self._send_busy_reply,
+            max_workers=getattr(config, 'UPDATE_WORKERS', 8),
+            max_pending=getattr(config, 'UPDATE_QUEUE_LIMIT', 500),
+            max_pending_per_chat=getattr(config, 'UPDATE_CHAT_QUEUE_LIMIT', 20),
+            on_queued=self._send_queued_reply,
+            on_dropped=self._drop_superseded,
+            coalesce=partial(coalesce_text_updates, window=coalesce_window) if coalesce_window > 0 else None,
+            supersedes=supersedes_callback,
+        )
+
+        # Webhook сервер (только в режиме BOT_MODE=webhook)
+        self.webhook_server: Optional[WebhookServer] = None
+
         # Throttling для логирования ошибок
         self._last_error_log_time = 0
         self._error_log_interval = 10  # Логировать ошибки максимум раз в 10 секунд
@@ -101,8 +142,24 @@ class RefactoredBot:
         # Создаем aiohttp session
         self.session = aiohttp.ClientSession()
 
+        self.outbound = OutboundMessageQueue(
+            self.session,
+            self.base_url,
+            global_rate=getattr(self.config, 'TG_GLOBAL_MSG_PER_SEC', 30.0),
+            chat_rate=getattr(self.config, 'TG_CHAT_MSG_PER_SEC', 1.0),
+            chat_burst=getattr(self.config, 'TG_CHAT_MSG_BURST', 3.0),
+        )
+        self.outbound.start()
+
         # Инициализируем handlers
         self._initialize_handlers()
+        self.dispatcher.start()
+        self._state_sweep_task = asyncio.create_task(self._state_sweep_loop())
+
+        # Прогрев NER моделей в фоне, чтобы первый запрос не ждал их загрузки
+        if getattr(self.config, 'NER_WARMUP', False):
+            from summarization.ner_registry import ner_registry
+            asyncio.get_running_loop().run_in_executor(self.executor, ner_registry.warm_up)
 
         # Получаем информацию о боте
         bot_info = await self._get_me()
@@ -112,8 +169,14 @@ class RefactoredBot:
             logger.error("❌ Не удалось получить информацию о боте")
             return
 
-        # Запускаем long polling
-        await self.run_polling()
+        # Возобновляем обновления, принятые до рестарта, но не завершенные
+        await self._resume_pending_updates()
+
+        # Запускаем прием обновлений
+        if getattr(self.config, 'BOT_MODE', 'polling') == 'webhook':
+            await self.run_webhook()
+        else:
+            await self.run_polling()
 
     def _initialize_handlers(self):
         """Инициализация всех handlers"""
@@ -139,8 +202,7 @@ class RefactoredBot:
             groq_client=self.groq_client,
             openrouter_client=self.openrouter_client,
             smart_summarizer=None,  # TODO: создать если нужен
-            user_requests=self.user_requests,
-            processing_users=self.processing_users,
+            rate_limiter=self.rate_limiter,
             user_states=self.user_states,
             user_settings=self.user_settings,
             user_messages_buffer=self.user_messages_buffer,
@@ -156,8 +218,7 @@ class RefactoredBot:
             state_manager=self.state_manager,
             file_processor=self.file_processor,
             groq_client=self.groq_client,
-            user_requests=self.user_requests,
-            processing_users=self.processing_users,
+            rate_limiter=self.rate_limiter,
             db_executor=self.executor,
         )
 
@@ -172,8 +233,7 @@ class RefactoredBot:
             smart_summarizer=None,  # TODO: создать если нужен
             groq_client=self.groq_client,
             openrouter_client=self.openrouter_client,
-            user_requests=self.user_requests,
-            processing_users=self.processing_users,
+            rate_limiter=self.rate_limiter,
             db_executor=self.executor,
         )
 
@@ -183,8 +243,7 @@ class RefactoredBot:
             base_url=self.base_url,
             db=self.db,
             state_manager=self.state_manager,
-            user_requests=self.user_requests,
-            processing_users=self.processing_users,
+            rate_limiter=self.rate_limiter,
             db_executor=self.executor,
         )
 
@@ -209,23 +268,94 @@ class RefactoredBot:
             url_processor=self.url_processor,
         )
 
+        # Все исходящие сообщения handlers идут через общую очередь
+        for handler in (
+            self.command_handler,
+            self.text_handler,
+            self.document_handler,
+            self.audio_handler,
+            self.photo_handler,
+            self.callback_handler,
+            self.choice_handler,
+        ):
+            handler.outbound = self.outbound
+        for handler in (self.document_handler, self.audio_handler, self.photo_handler):
+            handler.media_cache = self.media_cache
+
         logger.info("✅ Все handlers инициализированы (включая PhotoHandler для Gemini Vision и ChoiceHandler)")
 
+    async def run_webhook(self):
+        """Прием обновлений через webhook (несколько реплик за балансировщиком)"""
+        webhook_url = getattr(self.config, 'WEBHOOK_URL', '')
+        if not webhook_url:
+            logger.error("❌ BOT_MODE=webhook, но WEBHOOK_URL не задан")
+            return
+
+        secret_token = getattr(self.config, 'WEBHOOK_SECRET', '') or None
+        self.webhook_server = WebhookServer(
+            self.dispatcher,
+            host=getattr(self.config, 'WEBHOOK_HOST', '0.0.0.0'),
+            port=getattr(self.config, 'WEBHOOK_PORT', 8080),
+            path=getattr(self.config, 'WEBHOOK_PATH', '/webhook'),
+            secret_token=secret_token,
+            accept_update=lambda update: self._accept_updates([update]),
+        )
+        await self.webhook_server.start()
+
+        if not await self._set_webhook(webhook_url, secret_token):
+            await self.webhook_server.stop()
+            return
+
+        await self.webhook_server.wait_closed()
+
+    async def _set_webhook(self, url: str, secret_token: Optional[str]) -> bool:
+        """Регистрация webhook в Telegram"""
+        payload = {
+            "url": url,
+            "allowed_updates": self.ALLOWED_UPDATES,
+            "max_connections": getattr(self.config, 'WEBHOOK_MAX_CONNECTIONS', 40),
+        }
+        if secret_token:
+            payload["secret_token"] = secret_token
+
+        try:
+            async with self.session.post(f"{self.base_url}/setWebhook", json=payload) as response:
+                data = await response.json()
+                if data.get("ok"):
+                    logger.info(f"✅ Webhook установлен: {url}")
+                    return True
+                logger.error(f"❌ Ошибка setWebhook: {data.get('description')}")
+                return False
+        except Exception as e:
+            logger.error(f"❌ Ошибка запроса setWebhook: {e}")
+            return False
+
+    async def _delete_webhook(self):
+        """Удаление webhook (getUpdates не работает при активном webhook)"""
+        try:
+            async with self.session.post(f"{self.base_url}/deleteWebhook") as response:
+                data = await response.json()
+                if not data.get("ok"):
+                    logger.warning(f"Ошибка deleteWebhook: {data.get('description')}")
+        except Exception as e:
+            logger.warning(f"Ошибка запроса deleteWebhook: {e}")
+
     async def run_polling(self):
         """Основной цикл long polling"""
         logger.info("Запуск long polling...")
 
+        # Если ранее был установлен webhook, getUpdates вернет 409
+        await self._delete_webhook()
+
         while True:
             try:
                 updates = await self._get_updates()
 
                 if updates:
-                    for update in updates:
-                        # Обрабатываем каждое обновление
-                        asyncio.create_task(self.process_update(update))
-
-                        # Обновляем offset
-                        self.update_offset = update["update_id"] + 1
+                    # Сначала журнал и offset на диск, затем обработка
+                    offset = updates[-1]["update_id"] + 1
+                    await self._accept_updates(updates, offset=offset)
+                    self.update_offset = offset
 
             except asyncio.CancelledError:
                 logger.info("Long polling остановлен")
@@ -234,6 +364,39 @@ class RefactoredBot:
                 logger.error(f"Ошибка в long polling: {e}", exc_info=True)
                 await asyncio.sleep(3)
 
+    async def _ledger_call(self, func, *args):
+        """Синхронный вызов SQLite журнала в executor бота, не блокируя event loop"""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def _accept_updates(self, updates: list, offset: Optional[int] = None):
+        """Запись обновлений в журнал и передача новых в диспетчер"""
+        fresh = await self._ledger_call(self.ledger.record_batch, updates, offset)
+        for update in fresh:
+            # При перегрузке пользователь получает ответ "занят", повторять не нужно
+            if not self.dispatcher.submit(update):
+                await self._ledger_call(self.ledger.mark_done, update["update_id"], STATUS_SHED)
+
+    async def _resume_pending_updates(self):
+        """Повторная постановка незавершенных обновлений после рестарта"""
+        self.update_offset = await self._ledger_call(self.ledger.load_offset)
+        await self._ledger_call(self.ledger.cleanup)
+
+        pending = await self._ledger_call(self.ledger.resume_pending)
+        if pending:
+            logger.info(f"Возобновляем {len(pending)} незавершенных обновлений после рестарта")
+        for update in pending:
+            if not self.dispatcher.submit(update):
+                await self._ledger_call(self.ledger.mark_done, update["update_id"], STATUS_SHED)
+
+    async def _process_and_commit(self, update: dict):
+        """Обработка обновления и отметка о завершении в журнале"""
+        await self.process_update(update)
+        # При отмене (остановка бота) сюда не доходим - обновление возобновится
+        await self._ledger_call(self.ledger.mark_done, update["update_id"])
+        # Сообщения, дописанные к этому обновлению в очереди
+        for update_id in update.get("coalesced_update_ids", ()):
+            await self._ledger_call(self.ledger.mark_done, update_id)
+
     async def process_update(self, update: dict):
         """
         Обработка одного обновления от Telegram
@@ -285,6 +448,41 @@ class RefactoredBot:
         except Exception as e:
             logger.error(f"Ошибка обработки обновления: {e}", exc_info=True)
 
+    async def _send_busy_reply(self, update: dict):
+        """Ответ пользователю, когда очередь обновлений переполнена"""
+        message = update.get("message")
+        if not message:
+            return
+
+        chat_id = message.get("chat", {}).get("id")
+        if chat_id is None:
+            return
+
+        await self.send_message(
+            chat_id,
+            "⏳ Сейчас очень много запросов, ваше сообщение не принято.\n"
+            "Пожалуйста, отправьте его еще раз через минуту.",
+        )
+
+    async def _send_queued_reply(self, update: dict, ahead: int, coalesced: bool):
+        """Ответ пользователю, чье сообщение ждет завершения его предыдущих запросов"""
+        message = update.get("message")
+        if not message or message.get("text", "").startswith("/"):
+            return
+
+        if coalesced:
+            text = "📎 Добавил к предыдущему сообщению — обработаю их вместе."
+        else:
+            text = f"⏳ Сообщение в очереди, перед ним запросов: {ahead}. Обработаю сразу после них."
+        await self.send_message(message["chat"]["id"], text)
+
+    async def _drop_superseded(self, update: dict):
+        """Ожидавшее обновление заменено более новым выбором пользователя"""
+        await self._ledger_call(self.ledger.mark_done, update["update_id"], STATUS_SHED)
+        query = update.get("callback_query")
+        if query and self.callback_handler:
+            await self.callback_handler.answer_callback_query(query["id"], "Заменено новым выбором")
+
     async def _handle_command(self, update: dict, extra_data: Optional[Dict]):
         """Обработка команд через CommandHandler"""
         if not extra_data or "command" not in extra_data:
@@ -320,7 +518,7 @@ class RefactoredBot:
         params = {
             "offset": self.update_offset,
             "timeout": 30,
-            "allowed_updates": ["message", "callback_query"],
+            "allowed_updates": self.ALLOWED_UPDATES,
         }
 
         max_retries = 3
@@ -395,13 +593,97 @@ class RefactoredBot:
             logger.error(f"Ошибка запроса getMe: {e}")
             return None
 
+    async def send_message(
+        self,
+        chat_id: int,
+        text: str,
+        parse_mode: Optional[str] = None,
+        reply_markup: Optional[dict] = None,
+        priority: int = PRIORITY_INTERACTIVE,
+    ) -> Optional[dict]:
+        """
+        Отправка сообщения через очередь (используется дайджестами и алертами)
+
+        Args:
+            priority: PRIORITY_INTERACTIVE или PRIORITY_BULK для массовых рассылок
+        """
+        payload = {"chat_id": chat_id, "text": text}
+        if parse_mode:
+            payload["parse_mode"] = parse_mode
+        if reply_markup:
+            payload["reply_markup"] = reply_markup
+
+        result = await self.outbound.request(
+            "sendMessage", payload, chat_id=chat_id, priority=priority
+        )
+        if not result or not result.get("ok"):
+            logger.error(f"Ошибка отправки сообщения в чат {chat_id}: {result}")
+            return None
+        return result
+
+    def _state_stores(self) -> list:
+        stores = [
+            self.user_settings, self.user_states, self.user_messages_buffer, self.media_cache,
+        ]
+        if self.text_handler:
+            stores.extend(self.text_handler.state_stores())
+        return stores
+
+    async def _state_sweep_loop(self):
+        """Периодическая очистка истекших записей и отчет о памяти хранилищ"""
+        interval = getattr(self.config, 'STATE_SWEEP_INTERVAL', 300)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                loop = asyncio.get_running_loop()
+                for store in self._state_stores():
+                    removed = await loop.run_in_executor(self.executor, store.sweep)
+                    stats = store.get_stats()
+                    logger.info(
+                        f"State store {stats['namespace']}: {stats['entries']} записей, "
+                        f"{stats['bytes'] / 1024:.0f} КБ, удалено {removed}"
+                    )
+                # Состояния StateManager чистятся пачками по времени последней активности
+                removed = await loop.run_in_executor(
+                    self.executor,
+                    lambda: self.state_manager.cleanup_inactive(
+                        getattr(self.config, 'STATE_TTL_SECONDS', 86400) / 3600,
+                        batch_size=getattr(self.config, 'STATE_CLEANUP_BATCH', 500),
+                    )
+                )
+                if removed:
+                    logger.info(f"StateManager: удалено {removed} неактивных состояний")
+                # Завершенные записи журнала обновлений
+                removed = await self._ledger_call(self.ledger.cleanup)
+                if removed:
+                    logger.info(f"Журнал обновлений: удалено {removed} завершенных записей")
+                # Окна лимитера ушедших пользователей
+                idle = self.rate_limiter.evict_idle()
+                if idle:
+                    logger.info(f"Rate limiter: удалено {idle} окон, {self.rate_limiter.get_stats()}")
+            except Exception as e:
+                logger.error(f"Ошибка очистки хранилищ состояния: {e}")
+
     async def stop(self):
         """Остановка бота и очистка ресурсов"""
         logger.info("Остановка RefactoredBot...")
 
-        # Закрываем HTTP session
+        if self._state_sweep_task:
+            self._state_sweep_task.cancel()
+
+        # Прекращаем прием webhook и дорабатываем очередь обновлений
+        if self.webhook_server:
+            await self.webhook_server.stop()
+        await self.dispatcher.stop()
+
+        # Досылаем очередь исходящих сообщений
+        if self.outbound:
+            await self.outbound.stop()
+
+        # Закрываем HTTP session и пул соединений для скачивания файлов
         if self.session:
             await self.session.close()
+        await download_service.close()
 
         # Закрываем thread pool
         if self.executor:
@@ -0,0 +1,294 @@
+"""Диспетчер обновлений с ограниченным пулом воркеров и backpressure"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+# Выбор из этих кнопок заменяет еще не начатый выбор на том же сообщении
+SUPERSEDING_CALLBACK_PREFIXES = ("compression_", "settings_level_", "action_regen_", "action_llm_")
+
+
+def get_update_queue_key(update: dict) -> Any:
+    """
+    Ключ очереди: отправитель (очередь пользователя), без него - chat_id,
+    для прочих обновлений - update_id
+    """
+    for kind in ("message", "callback_query"):
+        if kind in update:
+            user_id = update[kind].get("from", {}).get("id")
+            if user_id is not None:
+                return user_id
+    if "message" in update:
+        return update["message"].get("chat", {}).get("id")
+    if "callback_query" in update:
+        chat_id = update["callback_query"].get("message", {}).get("chat", {}).get("id")
+        if chat_id is not None:
+            return chat_id
+    return ("update", update.get("update_id"))
+
+
+def _plain_text(update: dict) -> Optional[str]:
+    """Текст обычного сообщения (не команды и без ссылок) или None"""
+    message = update.get("message") or {}
+    text = message.get("text")
+    if not text or text.startswith("/") or "http" in text:
+        return None
+    return text
+
+
+def coalesce_text_updates(queued: dict, update: dict, window: float = 10.0) -> bool:
+    """
+    Дописать текст update к ожидающему текстовому обновлению queued
+
+    Как и буфер сообщений пользователя, объединяет части одного длинного
+    текста, которые Telegram разбивает на несколько сообщений. Поглощенные
+    update_id сохраняются в queued["coalesced_update_ids"].
+    """
+    queued_text, text = _plain_text(queued), _plain_text(update)
+    if queued_text is None or text is None:
+        return False
+    queued_message, message = queued["message"], update["message"]
+    if queued_message.get("chat", {}).get("id") != message.get("chat", {}).get("id"):
+        return False
+    if abs(message.get("date", 0) - queued_message.get("date", 0)) > window:
+        return False
+
+    queued_message["text"] = f"{queued_text}\n\n{text}"
+    queued_message["date"] = message.get("date", queued_message.get("date"))
+    queued.setdefault("coalesced_update_ids", []).append(update["update_id"])
+    return True
+
+
+def supersedes_callback(queued: dict, update: dict) -> bool:
+    """Новый выбор уровня/пересоздания на том же сообщении делает ожидающий лишним"""
+    old, new = queued.get("callback_query"), update.get("callback_query")
+    if not old or not new:
+        return False
+    if not all(str(q.get("data", "")).startswith(SUPERSEDING_CALLBACK_PREFIXES) for q in (old, new)):
+        return False
+    old_message, new_message = old.get("message", {}), new.get("message", {})
+    return (
+        old_message.get("message_id") == new_message.get("message_id")
+        and old_message.get("chat", {}).get("id") == new_message.get("chat", {}).get("id")
+    )
+
+
+class UpdateDispatcher:
+    """
+    Ограниченный пул воркеров для обработки обновлений.
+
+    У каждого пользователя своя FIFO очередь: его обновления обрабатываются
+    строго последовательно, разных пользователей - параллельно (не более
+    max_workers одновременно). Новое обновление, попавшее в очередь за
+    другими, может быть объединено с ожидающим (coalesce) или заменить
+    ожидающее (supersedes); пользователь узнает свое место в очереди
+    через on_queued. При переполнении очереди обновление отбрасывается,
+    а пользователь получает сообщение о занятости (on_overload).
+    """
+
+    def __init__(
+        self,
+        handle_update: Callable[[dict], Awaitable[None]],
+        on_overload: Optional[Callable[[dict], Awaitable[None]]] = None,
+        max_workers: int = 8,
+        max_pending: int = 500,
+        max_pending_per_chat: int = 20,
+        on_queued: Optional[Callable[[dict, int, bool], Awaitable[None]]] = None,
+        on_dropped: Optional[Callable[[dict], Awaitable[None]]] = None,
+        coalesce: Optional[Callable[[dict, dict], bool]] = None,
+        supersedes: Optional[Callable[[dict, dict], bool]] = None,
+    ):
+        """
+        Args:
+            handle_update: Корутина обработки одного обновления
+            on_overload: Корутина уведомления пользователя о перегрузке
+            max_workers: Максимум одновременно обрабатываемых обновлений
+            max_pending: Максимум обновлений в очереди (всего)
+            max_pending_per_chat: Максимум обновлений в очереди одного пользователя
+            on_queued: Корутина уведомления об очереди (update, сколько впереди, объединено ли)
+            on_dropped: Корутина для ожидающего обновления, замененного более новым
+            coalesce: Дописать новое обновление к последнему ожидающему (True - поглощено)
+            supersedes: Делает ли новое обновление ожидающее лишним
+        """
+        self.handle_update = handle_update
+        self.on_overload = on_overload
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.max_pending_per_chat = max_pending_per_chat
+        self.on_queued = on_queued
+        self.on_dropped = on_dropped
+        self.coalesce = coalesce
+        self.supersedes = supersedes
+
+        self._chat_queues: Dict[Any, Deque[Tuple[float, dict]]] = {}
+        self._active_keys: set = set()
+        self._ready: asyncio.Queue = asyncio.Queue()
+        self._workers: List[asyncio.Task] = []
+        self._background: set = set()
+        self._pending = 0
+        self._active = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._accepting = True
+
+        self.stats = {
+            'submitted': 0,
+            'processed': 0,
+            'failed': 0,
+            'shed': 0,
+            'coalesced': 0,
+            'superseded': 0,
+            'max_pending_seen': 0,
+            'total_wait_ms': 0.0,
+        }
+
+    def start(self):
+        """Запуск воркеров"""
+        if not self._workers:
+            self._workers = [
+                asyncio.create_task(self._worker(i)) for i in range(self.max_workers)
+            ]
+            logger.info(f"Диспетчер обновлений запущен: {self.max_workers} воркеров, очередь {self.max_pending}")
+
+    def submit(self, update: dict) -> bool:
+        """
+        Поставить обновление в очередь без ожидания.
+
+        Returns:
+            True если обновление принято, False если отброшено из-за перегрузки
+        """
+        key = get_update_queue_key(update)
+        chat_queue = self._chat_queues.get(key)
+
+        if chat_queue and self._accepting and self._merge_waiting(key, chat_queue, update):
+            return True
+
+        if (
+            not self._accepting
+            or self._pending >= self.max_pending
+            or (chat_queue is not None and len(chat_queue) >= self.max_pending_per_chat)
+        ):
+            self.stats['shed'] += 1
+            logger.warning(
+                f"Перегрузка: update {update.get('update_id')} отброшен "
+                f"(в очереди {self._pending}, активных {self._active})"
+            )
+            if self.on_overload and self._accepting:
+                self._spawn(self.on_overload(update))
+            return False
+
+        item = (time.monotonic(), update)
+        if chat_queue is None:
+            # Пользователь простаивает - сразу делаем его очередь доступной воркерам
+            self._chat_queues[key] = deque([item])
+            self._ready.put_nowait(key)
+        else:
+            # Пользователь уже в очереди или обрабатывается - воркер подхватит по порядку
+            chat_queue.append(item)
+            if self.on_queued:
+                self._spawn(self.on_queued(update, self._ahead(key, chat_queue), False))
+
+        self._pending += 1
+        self._idle.clear()
+        self.stats['submitted'] += 1
+        self.stats['max_pending_seen'] = max(self.stats['max_pending_seen'], self._pending)
+        return True
+
+    def _ahead(self, key: Any, chat_queue: Deque[Tuple[float, dict]]) -> int:
+        """Сколько обновлений пользователя будет обработано раньше последнего в очереди"""
+        return len(chat_queue) - 1 + (1 if key in self._active_keys else 0)
+
+    def _merge_waiting(self, key: Any, chat_queue: Deque[Tuple[float, dict]], update: dict) -> bool:
+        """Заменить ожидающие обновления новым или дописать его к последнему; True - update принят"""
+        if self.supersedes:
+            stale = [i for i, (_, queued) in enumerate(chat_queue) if self.supersedes(queued, update)]
+            if stale:
+                # Новое обновление занимает место первого замененного, остальные удаляются
+                dropped = [chat_queue[i][1] for i in stale]
+                chat_queue[stale[0]] = (chat_queue[stale[0]][0], update)
+                for i in reversed(stale[1:]):
+                    del chat_queue[i]
+                self._pending -= len(stale) - 1
+                self.stats['superseded'] += len(stale)
+                self.stats['submitted'] += 1
+                for queued in dropped:
+                    logger.info(f"Update {queued.get('update_id')} заменен более новым {update.get('update_id')}")
+                    if self.on_dropped:
+                        self._spawn(self.on_dropped(queued))
+                return True
+
+        if self.coalesce and self.coalesce(chat_queue[-1][1], update):
+            self.stats['coalesced'] += 1
+            self.stats['submitted'] += 1
+            if self.on_queued:
+                self._spawn(self.on_queued(update, self._ahead(key, chat_queue), True))
+            return True
+        return False
+
+    async def _worker(self, worker_id: int):
+        """Воркер: берет чат из очереди готовых и обрабатывает одно его обновление"""
+        while True:
+            key = await self._ready.get()
+            chat_queue = self._chat_queues[key]
+            enqueued_at, update = chat_queue.popleft()
+            self._pending -= 1
+            self._active += 1
+            self._active_keys.add(key)
+            self.stats['total_wait_ms'] += (time.monotonic() - enqueued_at) * 1000
+
+            try:
+                await self.handle_update(update)
+                self.stats['processed'] += 1
+            except Exception as e:
+                self.stats['failed'] += 1
+                logger.error(f"Воркер {worker_id}: ошибка обработки обновления: {e}", exc_info=True)
+            finally:
+                self._active -= 1
+                self._active_keys.discard(key)
+                if chat_queue:
+                    self._ready.put_nowait(key)
+                else:
+                    del self._chat_queues[key]
+                if not self._pending and not self._active:
+                    self._idle.set()
+
+    def _spawn(self, coro):
+        """Фоновая задача с сохранением ссылки (защита от сборщика мусора)"""
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def stop(self, drain_timeout: float = 30.0):
+        """Прекращение приема и доработка очереди"""
+        self._accepting = False
+        logger.info(f"Остановка диспетчера: в очереди {self._pending}, активных {self._active}")
+
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Не успели обработать {self._pending + self._active} обновлений за {drain_timeout}s")
+
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, *self._background, return_exceptions=True)
+        self._workers = []
+
+    @property
+    def queue_depth(self) -> int:
+        return self._pending
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Метрики очереди"""
+        done = self.stats['processed'] + self.stats['failed']
+        return {
+            **self.stats,
+            'pending': self._pending,
+            'active': self._active,
+            'chats_queued': len(self._chat_queues),
+            'avg_wait_ms': round(self.stats['total_wait_ms'] / done, 1) if done else 0.0,
+        }
@@ -0,0 +1,152 @@
+"""Журнал обновлений: сохраненный offset и идемпотентная обработка по update_id"""
+
+import json
+import logging
+import sqlite3
+import time
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+STATUS_PENDING = "pending"
+STATUS_DONE = "done"
+STATUS_SHED = "shed"
+STATUS_FAILED = "failed"
+
+
+class UpdateLedger:
+    """
+    SQLite журнал обновлений Telegram.
+
+    Offset сохраняется на диск после записи пачки обновлений в журнал,
+    поэтому после рестарта принятые, но не обработанные обновления
+    возобновляются, а завершенные не обрабатываются повторно.
+    """
+
+    def __init__(self, db_path: str = "bot_updates.db", max_attempts: int = 3):
+        """
+        Args:
+            db_path: Путь к файлу SQLite
+            max_attempts: Сколько раз пытаться обработать обновление после рестартов
+        """
+        self.db_path = db_path
+        self.max_attempts = max_attempts
+        self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init_db(self):
+        """Инициализация таблиц журнала"""
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS update_ledger (
+                    update_id INTEGER PRIMARY KEY,
+                    payload TEXT,
+                    status TEXT NOT NULL,
+                    attempts INTEGER DEFAULT 0,
+                    received_at INTEGER,
+                    completed_at INTEGER
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS bot_offsets (
+                    key TEXT PRIMARY KEY,
+                    value INTEGER
+                )
+            """)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_update_ledger_status ON update_ledger(status)"
+            )
+
+    def load_offset(self, key: str = "polling") -> int:
+        """Последний сохраненный offset long polling"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM bot_offsets WHERE key = ?", (key,)).fetchone()
+            return row[0] if row else 0
+
+    def record_batch(self, updates: List[dict], offset: Optional[int] = None,
+                     key: str = "polling") -> List[dict]:
+        """
+        Записать пачку обновлений и (атомарно) новый offset.
+
+        Returns:
+            Только новые обновления - уже известные update_id пропускаются
+        """
+        now = int(time.time())
+        fresh = []
+
+        with self._connect() as conn:
+            for update in updates:
+                cursor = conn.execute(
+                    """INSERT OR IGNORE INTO update_ledger
+                       (update_id, payload, status, attempts, received_at)
+                       VALUES (?, ?, ?, 1, ?)""",
+                    (update["update_id"], json.dumps(update, ensure_ascii=False), STATUS_PENDING, now)
+                )
+                if cursor.rowcount:
+                    fresh.append(update)
+                else:
+                    logger.info(f"Update {update['update_id']} уже в журнале, пропускаем")
+
+            if offset is not None:
+                conn.execute(
+                    """INSERT INTO bot_offsets (key, value) VALUES (?, ?)
+                       ON CONFLICT(key) DO UPDATE SET value = excluded.value""",
+                    (key, offset)
+                )
+
+        return fresh
+
+    def mark_done(self, update_id: int, status: str = STATUS_DONE):
+        """Отметить обновление завершенным (payload больше не нужен)"""
+        with self._connect() as conn:
+            conn.execute(
+                """UPDATE update_ledger SET status = ?, completed_at = ?, payload = NULL
+                   WHERE update_id = ?""",
+                (status, int(time.time()), update_id)
+            )
+
+    def resume_pending(self) -> List[dict]:
+        """
+        Обновления, принятые до рестарта, но не завершенные.
+
+        Обновления, исчерпавшие max_attempts, помечаются как failed,
+        чтобы "ядовитое" обновление не роняло бота при каждом старте.
+        """
+        with self._connect() as conn:
+            conn.execute(
+                """UPDATE update_ledger SET status = ?, completed_at = ?, payload = NULL
+                   WHERE status = ? AND attempts >= ?""",
+                (STATUS_FAILED, int(time.time()), STATUS_PENDING, self.max_attempts)
+            )
+            rows = conn.execute(
+                "SELECT update_id, payload FROM update_ledger WHERE status = ? ORDER BY update_id",
+                (STATUS_PENDING,)
+            ).fetchall()
+            conn.execute(
+                "UPDATE update_ledger SET attempts = attempts + 1 WHERE status = ?",
+                (STATUS_PENDING,)
+            )
+
+        updates = []
+        for row in rows:
+            try:
+                updates.append(json.loads(row["payload"]))
+            except (TypeError, json.JSONDecodeError) as e:
+                logger.warning(f"Поврежденный payload update {row['update_id']}: {e}")
+                self.mark_done(row["update_id"], STATUS_FAILED)
+        return updates
+
+    def cleanup(self, max_age_days: int = 7) -> int:
+        """Удалить завершенные записи старше max_age_days"""
+        cutoff = int(time.time()) - max_age_days * 86400
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "DELETE FROM update_ledger WHERE status != ? AND completed_at < ?",
+                (STATUS_PENDING, cutoff)
+            )
+            return cursor.rowcount
@@ -0,0 +1,116 @@
+"""Webhook-сервер для приема обновлений Telegram (альтернатива long polling)"""
+
+import asyncio
+import hmac
+import inspect
+import logging
+from typing import Any, Callable, Optional, TYPE_CHECKING
+
+from aiohttp import web
+
+if TYPE_CHECKING:
+    from bot.core.dispatcher import UpdateDispatcher
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookServer:
+    """
+    aiohttp сервер для webhook режима.
+
+    Проверяет secret token, передает обновление в диспетчер и сразу
+    отвечает 200. Очередь, пул воркеров и сброс нагрузки - в UpdateDispatcher.
+    """
+
+    def __init__(
+        self,
+        dispatcher: 'UpdateDispatcher',
+        host: str = "0.0.0.0",
+        port: int = 8080,
+        path: str = "/webhook",
+        secret_token: Optional[str] = None,
+        accept_update: Optional[Callable[[dict], Any]] = None,
+    ):
+        """
+        Args:
+            dispatcher: Диспетчер обновлений
+            host: Адрес для прослушивания
+            port: Порт для прослушивания
+            path: Путь webhook endpoint
+            secret_token: Ожидаемое значение заголовка X-Telegram-Bot-Api-Secret-Token
+            accept_update: Прием обновления, функция или корутина (по умолчанию dispatcher.submit)
+        """
+        self.dispatcher = dispatcher
+        self.accept_update = accept_update or dispatcher.submit
+        self.host = host
+        self.port = port
+        self.path = path
+        self.secret_token = secret_token
+
+        self._runner: Optional[web.AppRunner] = None
+        self._draining = False
+        self._stopped = asyncio.Event()
+
+    def create_app(self) -> web.Application:
+        """aiohttp приложение с webhook endpoint и health check"""
+        app = web.Application()
+        app.router.add_post(self.path, self._handle_update)
+        app.router.add_get("/healthz", self._handle_health)
+        return app
+
+    async def start(self):
+        """Запуск HTTP сервера"""
+        self._runner = web.AppRunner(self.create_app())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+
+        logger.info(f"Webhook сервер запущен на {self.host}:{self.port}{self.path}")
+
+    async def wait_closed(self):
+        """Ожидание остановки сервера"""
+        await self._stopped.wait()
+
+    async def _handle_update(self, request: web.Request) -> web.Response:
+        """Прием обновления от Telegram"""
+        if self.secret_token:
+            received = request.headers.get(SECRET_HEADER, "")
+            if not hmac.compare_digest(received, self.secret_token):
+                logger.warning(f"Webhook запрос с неверным secret token от {request.remote}")
+                return web.Response(status=401)
+
+        if self._draining:
+            return web.Response(status=503)
+
+        try:
+            update = await request.json()
+        except Exception:
+            return web.Response(status=400)
+
+        # При перегрузке диспетчер сам отвечает пользователю, Telegram повторять не нужно.
+        # Асинхронный прием (запись в журнал) дожидаемся до ответа 200
+        accepted = self.accept_update(update)
+        if inspect.isawaitable(accepted):
+            await accepted
+        return web.Response(status=200)
+
+    async def _handle_health(self, request: web.Request) -> web.Response:
+        """Health check для балансировщика"""
+        if self._draining:
+            return web.json_response({"status": "draining"}, status=503)
+        return web.json_response({"status": "ok", **self.dispatcher.get_stats()})
+
+    async def stop(self):
+        """Прекращение приема обновлений (доработку очереди выполняет диспетчер)"""
+        if self._draining:
+            return
+        self._draining = True
+        logger.info(f"Остановка webhook сервера, в очереди: {self.dispatcher.queue_depth}")
+
+        if self._runner:
+            await self._runner.cleanup()
+
+        self._stopped.set()
+        logger.info("✅ Webhook сервер остановлен")
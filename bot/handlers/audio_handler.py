@@ -3,11 +3,16 @@
 import logging
 import os
 import sqlite3
-from typing import Dict, Set, Optional
+from typing import Optional
 from .base import BaseHandler
+from bot.rate_limiter import SlidingWindowRateLimiter
 
 logger = logging.getLogger(__name__)
 
+# Параметры распознавания, от которых зависит кэшированный транскрипт
+AUDIO_ASR_VARIANT = "groq:whisper-large-v3"
+AUDIO_CACHE_FIELDS = ("success", "transcript", "segments", "language", "duration_sec", "speaker_emotion_data")
+
 
 class AudioHandler(BaseHandler):
     """Обработчик аудио сообщений (voice, audio, video_note, documents)"""
@@ -23,8 +28,7 @@ class AudioHandler(BaseHandler):
         smart_summarizer,
         groq_client,
         openrouter_client,
-        user_requests: Dict,
-        processing_users: Set,
+        rate_limiter: SlidingWindowRateLimiter,
         db_executor
     ):
         super().__init__(session, base_url, db, state_manager)
@@ -33,8 +37,7 @@ class AudioHandler(BaseHandler):
         self.smart_summarizer = smart_summarizer
         self.groq_client = groq_client
         self.openrouter_client = openrouter_client
-        self.user_requests = user_requests
-        self.processing_users = processing_users
+        self.rate_limiter = rate_limiter
         self.db_executor = db_executor
 
         # Временное хранилище для аудио данных (transcript, segments, reasoning)
@@ -75,26 +78,15 @@ class AudioHandler(BaseHandler):
         logger.info(f"Обрабатываю аудио для пользователя {user_id}: {audio_info}")
 
         # Проверка лимита запросов
-        if not self.check_user_rate_limit(user_id):
+        if not self.check_user_rate_limit(
+            user_id, 'audio', duration_sec=audio_descriptor.get('duration') or 0
+        ):
             await self.send_message(
                 chat_id,
-                "⏰ Превышен лимит запросов!\n\n"
-                "Пожалуйста, подождите минуту перед отправкой нового аудио. Лимит: 10 запросов в минуту."
+                self.rate_limit_message("нового аудио")
             )
             return
 
-        # Проверка на повторную обработку
-        if user_id in self.processing_users:
-            await self.send_message(
-                chat_id,
-                "⚠️ Обработка в процессе!\n\n"
-                "Пожалуйста, дождитесь завершения предыдущего запроса."
-            )
-            return
-
-        # Добавляем пользователя в список обрабатываемых
-        self.processing_users.add(user_id)
-
         # Отправляем прогресс-сообщение
         progress_msg = await self.send_message(
             chat_id,
@@ -116,62 +108,21 @@ class AudioHandler(BaseHandler):
                     await self.send_message(chat_id, error_msg)
                 return
 
-            # Обновляем прогресс - скачивание
-            if progress_message_id and isinstance(progress_message_id, int):
-                try:
-                    await self.edit_message_text(
-                        chat_id,
-                        progress_message_id,
-                        f"⬇️ Скачиваю файл…\n\n{audio_info}"
-                    )
-                except Exception as e:
-                    logger.warning(f"Не удалось обновить прогресс (скачивание): {e}")
-
-            # Получаем URL файла для скачивания
-            file_url = await self._get_file_url(audio_descriptor["file_id"])
-            filename_hint = audio_descriptor.get("filename") or "audio.ogg"
-
-            # Добавляем маппинг расширения по mime и дефолт .ogg
-            if not os.path.splitext(filename_hint)[1]:
-                mime = (audio_descriptor.get("mime_type") or "").lower()
-                ext_by_mime = {
-                    "audio/ogg": ".ogg",
-                    "audio/oga": ".oga",
-                    "audio/opus": ".ogg",
-                    "audio/mpeg": ".mp3",
-                    "audio/mp3": ".mp3",
-                    "audio/mp4": ".m4a",
-                    "audio/x-m4a": ".m4a",
-                    "audio/aac": ".aac",
-                    "audio/flac": ".flac",
-                    "audio/wav": ".wav",
-                    "audio/x-wav": ".wav",
-                    "video/webm": ".webm",
-                    "video/mp4": ".m4a",
-                    "application/octet-stream": ".ogg",
-                }
-                filename_hint += ext_by_mime.get(mime, ".ogg")
-
-            # Логируем информацию об аудио перед обработкой
-            logger.info(
-                f"Audio: mime={audio_descriptor.get('mime_type')} filename_hint={filename_hint}"
-            )
-
-            # Обновляем прогресс - конвертация
-            if progress_message_id and isinstance(progress_message_id, int):
-                try:
-                    await self.edit_message_text(
-                        chat_id,
-                        progress_message_id,
-                        f"🎛️ Конвертирую аудио…\n\n{audio_info}"
+            # Пересланный ранее файл: транскрипт из кэша, без скачивания и ASR
+            file_unique_id = audio_descriptor.get("file_unique_id")
+            result = None
+            if self.media_cache is not None:
+                result = self.media_cache.get('audio', file_unique_id, asr=AUDIO_ASR_VARIANT)
+            if result is None:
+                result = await self._download_and_transcribe(
+                    audio_descriptor, audio_info, chat_id, progress_message_id
+                )
+                if result.get("success") and self.media_cache is not None:
+                    self.media_cache.put(
+                        'audio', file_unique_id,
+                        {key: result.get(key) for key in AUDIO_CACHE_FIELDS},
+                        asr=AUDIO_ASR_VARIANT
                     )
-                except Exception as e:
-                    logger.warning(f"Не удалось обновить прогресс (конвертация): {e}")
-
-            # Обрабатываем аудио
-            result = await self.audio_processor.process_audio_from_telegram(
-                file_url, filename_hint
-            )
 
             if not result.get("success"):
                 error_msg = f"❌ Ошибка обработки аудио\n\n{result.get('error', 'Неизвестная ошибка')}"
@@ -360,13 +311,73 @@ class AudioHandler(BaseHandler):
             except Exception as send_error:
                 logger.error(f"Не удалось отправить сообщение об ошибке: {send_error}", exc_info=True)
 
-        finally:
-            # Убираем пользователя из списка обрабатываемых
-            logger.info(f"Завершена обработка аудио для пользователя {user_id}, удаляю из processing_users")
-            self.processing_users.discard(user_id)
-
     # ============ Вспомогательные методы ============
 
+    async def _download_and_transcribe(
+        self,
+        audio_descriptor: dict,
+        audio_info: str,
+        chat_id: int,
+        progress_message_id: Optional[int]
+    ) -> dict:
+        """Скачивание и распознавание аудио с обновлением прогресса"""
+        # Обновляем прогресс - скачивание
+        if progress_message_id and isinstance(progress_message_id, int):
+            try:
+                await self.edit_message_text(
+                    chat_id,
+                    progress_message_id,
+                    f"⬇️ Скачиваю файл…\n\n{audio_info}"
+                )
+            except Exception as e:
+                logger.warning(f"Не удалось обновить прогресс (скачивание): {e}")
+
+        # Получаем URL файла для скачивания
+        file_url = await self._get_file_url(audio_descriptor["file_id"])
+        filename_hint = audio_descriptor.get("filename") or "audio.ogg"
+
+        # Добавляем маппинг расширения по mime и дефолт .ogg
+        if not os.path.splitext(filename_hint)[1]:
+            mime = (audio_descriptor.get("mime_type") or "").lower()
+            ext_by_mime = {
+                "audio/ogg": ".ogg",
+                "audio/oga": ".oga",
+                "audio/opus": ".ogg",
+                "audio/mpeg": ".mp3",
+                "audio/mp3": ".mp3",
+                "audio/mp4": ".m4a",
+                "audio/x-m4a": ".m4a",
+                "audio/aac": ".aac",
+                "audio/flac": ".flac",
+                "audio/wav": ".wav",
+                "audio/x-wav": ".wav",
+                "video/webm": ".webm",
+                "video/mp4": ".m4a",
+                "application/octet-stream": ".ogg",
+            }
+            filename_hint += ext_by_mime.get(mime, ".ogg")
+
+        # Логируем информацию об аудио перед обработкой
+        logger.info(
+            f"Audio: mime={audio_descriptor.get('mime_type')} filename_hint={filename_hint}"
+        )
+
+        # Обновляем прогресс - конвертация
+        if progress_message_id and isinstance(progress_message_id, int):
+            try:
+                await self.edit_message_text(
+                    chat_id,
+                    progress_message_id,
+                    f"🎛️ Конвертирую аудио…\n\n{audio_info}"
+                )
+            except Exception as e:
+                logger.warning(f"Не удалось обновить прогресс (конвертация): {e}")
+
+        # Обрабатываем аудио
+        return await self.audio_processor.process_audio_from_telegram(
+            file_url, filename_hint
+        )
+
     async def _get_file_url(self, file_id: str) -> str:
         """Получает URL файла от Telegram API"""
         file_info_response = await self.get_file_info(file_id)
@@ -388,26 +399,6 @@ class AudioHandler(BaseHandler):
             logger.error(f"Ошибка получения информации о файле: {e}")
             return None
 
-    def check_user_rate_limit(self, user_id: int) -> bool:
-        """Проверка лимита запросов пользователя"""
-        import time
-
-        now = time.time()
-        if user_id not in self.user_requests:
-            self.user_requests[user_id] = []
-
-        # Удаляем запросы старше 1 минуты
-        self.user_requests[user_id] = [
-            req_time for req_time in self.user_requests[user_id] if now - req_time < 60
-        ]
-
-        # Проверяем лимит (10 запросов в минуту)
-        if len(self.user_requests[user_id]) >= 10:
-            return False
-
-        self.user_requests[user_id].append(now)
-        return True
-
     async def get_user_compression_level(self, user_id: int) -> int:
         """Получение уровня сжатия пользователя из базы данных"""
         try:
@@ -620,7 +611,6 @@ class AudioHandler(BaseHandler):
 
     async def send_message_with_keyboard(self, chat_id: int, text: str, keyboard: dict):
         """Отправляет сообщение с inline клавиатурой"""
-        url = f"{self.base_url}/sendMessage"
 
         # Сначала пробуем с Markdown
         data = {
@@ -630,25 +620,22 @@ class AudioHandler(BaseHandler):
             "parse_mode": "Markdown"
         }
 
-        async with self.session.post(url, json=data) as response:
-            result = await response.json()
+        result = await self.call_api('sendMessage', data, chat_id=chat_id) or {}
 
-            # Если ошибка связана с parse_mode, пробуем без него
-            if not result.get('ok') and 'parse' in result.get('description', '').lower():
-                logger.warning(f"Markdown parsing failed, retrying without parse_mode: {result.get('description')}")
-                data_no_parse = {
-                    "chat_id": chat_id,
-                    "text": text,
-                    "reply_markup": keyboard
-                }
-                async with self.session.post(url, json=data_no_parse) as response2:
-                    return await response2.json()
+        # Если ошибка связана с parse_mode, пробуем без него
+        if not result.get('ok') and 'parse' in result.get('description', '').lower():
+            logger.warning(f"Markdown parsing failed, retrying without parse_mode: {result.get('description')}")
+            data_no_parse = {
+                "chat_id": chat_id,
+                "text": text,
+                "reply_markup": keyboard
+            }
+            return await self.call_api('sendMessage', data_no_parse, chat_id=chat_id)
 
-            return result
+        return result
 
     async def edit_message_with_keyboard(self, chat_id: int, message_id: int, text: str, keyboard: dict):
         """Редактирует сообщение с inline клавиатурой"""
-        url = f"{self.base_url}/editMessageText"
 
         # Сначала пробуем с Markdown
         data = {
@@ -659,22 +646,20 @@ class AudioHandler(BaseHandler):
             "parse_mode": "Markdown"
         }
 
-        async with self.session.post(url, json=data) as response:
-            result = await response.json()
-
-            # Если ошибка связана с parse_mode, пробуем без него
-            if not result.get('ok') and 'parse' in result.get('description', '').lower():
-                logger.warning(f"Markdown parsing failed, retrying without parse_mode: {result.get('description')}")
-                data_no_parse = {
-                    "chat_id": chat_id,
-                    "message_id": message_id,
-                    "text": text,
-                    "reply_markup": keyboard
-                }
-                async with self.session.post(url, json=data_no_parse) as response2:
-                    return await response2.json()
-
-            return result
+        result = await self.call_api('editMessageText', data, chat_id=chat_id, coalesce=True) or {}
+
+        # Если ошибка связана с parse_mode, пробуем без него
+        if not result.get('ok') and 'parse' in result.get('description', '').lower():
+            logger.warning(f"Markdown parsing failed, retrying without parse_mode: {result.get('description')}")
+            data_no_parse = {
+                "chat_id": chat_id,
+                "message_id": message_id,
+                "text": text,
+                "reply_markup": keyboard
+            }
+            return await self.call_api('editMessageText', data_no_parse, chat_id=chat_id)
+
+        return result
 
     async def handle_audio_callback(self, callback_query: dict):
         """Обработка callback запросов от кнопок аудио"""
@@ -1,15 +1,24 @@
 """Базовый класс для обработчиков сообщений"""
 
 import logging
-from typing import Optional, TYPE_CHECKING
+import time
+from typing import AsyncIterator, Optional, TYPE_CHECKING
 import aiohttp
 
+from bot.middleware.send_queue import PRIORITY_INTERACTIVE
+
 if TYPE_CHECKING:
     from database import DatabaseManager
     from bot.state_manager import StateManager
+    from bot.middleware.send_queue import OutboundMessageQueue
+    from bot.rate_limiter import SlidingWindowRateLimiter
+    from bot.media_cache import MediaResultCache
 
 logger = logging.getLogger(__name__)
 
+TELEGRAM_TEXT_LIMIT = 4096
+STREAM_CURSOR = " ▌"
+
 
 class BaseHandler:
     """Базовый класс для всех обработчиков"""
@@ -26,6 +35,49 @@ class BaseHandler:
         self.db = db
         self.state_manager = state_manager
         self.logger = logger
+        # Очередь исходящих сообщений (устанавливается ботом после создания)
+        self.outbound: Optional['OutboundMessageQueue'] = None
+        # Общий лимитер запросов (передается обработчикам пользовательского контента)
+        self.rate_limiter: Optional['SlidingWindowRateLimiter'] = None
+        # Кэш результатов обработки медиа по file_unique_id (устанавливается ботом)
+        self.media_cache: Optional['MediaResultCache'] = None
+
+    def check_user_rate_limit(self, user_id: int, feature: str = 'text', duration_sec: float = 0) -> bool:
+        """Проверка лимита запросов пользователя с учетом веса запроса"""
+        if self.rate_limiter is None:
+            return True
+        return self.rate_limiter.try_acquire(user_id, feature, duration_sec)
+
+    def rate_limit_message(self, subject: str) -> str:
+        """Ответ при превышении лимита; subject - что отправлять ("нового текста")"""
+        text = f"⏰ Превышен лимит запросов!\n\nПожалуйста, подождите перед отправкой {subject}."
+        if self.rate_limiter is not None:
+            text += f"\n{self.rate_limiter.describe()}"
+        return text
+
+    async def call_api(
+        self,
+        method: str,
+        payload: dict,
+        chat_id: Optional[int] = None,
+        priority: int = PRIORITY_INTERACTIVE,
+        coalesce: bool = False
+    ) -> Optional[dict]:
+        """
+        Вызов метода Bot API через очередь исходящих сообщений
+
+        Без очереди запрос отправляется напрямую.
+
+        Returns:
+            JSON ответа Telegram или None при сетевой ошибке
+        """
+        if self.outbound is not None:
+            return await self.outbound.request(
+                method, payload, chat_id=chat_id, priority=priority, coalesce=coalesce
+            )
+
+        async with self.session.post(f"{self.base_url}/{method}", json=payload) as response:
+            return await response.json(content_type=None)
 
     async def send_message(
         self,
@@ -35,7 +87,6 @@ class BaseHandler:
         reply_markup: Optional[dict] = None
     ) -> Optional[dict]:
         """Отправить сообщение пользователю"""
-        url = f"{self.base_url}/sendMessage"
         payload = {
             'chat_id': chat_id,
             'text': text
@@ -47,13 +98,11 @@ class BaseHandler:
             payload['reply_markup'] = reply_markup
 
         try:
-            async with self.session.post(url, json=payload) as response:
-                if response.status == 200:
-                    return await response.json()
-                else:
-                    error_text = await response.text()
-                    self.logger.error(f"Ошибка отправки сообщения: {error_text}")
-                    return None
+            result = await self.call_api('sendMessage', payload, chat_id=chat_id)
+            if result and result.get('ok'):
+                return result
+            self.logger.error(f"Ошибка отправки сообщения: {result}")
+            return None
         except Exception as e:
             self.logger.error(f"Исключение при отправке сообщения: {e}")
             return None
@@ -79,7 +128,6 @@ class BaseHandler:
         reply_markup: Optional[dict] = None
     ) -> Optional[dict]:
         """Редактировать сообщение"""
-        url = f"{self.base_url}/editMessageText"
         payload = {
             'chat_id': chat_id,
             'message_id': message_id,
@@ -92,17 +140,52 @@ class BaseHandler:
             payload['reply_markup'] = reply_markup
 
         try:
-            async with self.session.post(url, json=payload) as response:
-                if response.status == 200:
-                    return await response.json()
-                else:
-                    error_text = await response.text()
-                    self.logger.error(f"Ошибка редактирования сообщения: {error_text}")
-                    return None
+            result = await self.call_api(
+                'editMessageText', payload, chat_id=chat_id, coalesce=True
+            )
+            if result and result.get('ok'):
+                return result
+            self.logger.error(f"Ошибка редактирования сообщения: {result}")
+            return None
         except Exception as e:
             self.logger.error(f"Исключение при редактировании сообщения: {e}")
             return None
 
+    async def edit_message_progressively(
+        self,
+        chat_id: int,
+        message_id: int,
+        chunks: AsyncIterator[str],
+        prefix: str = "",
+        interval: float = 1.0
+    ) -> str:
+        """
+        Показывать потоковый ответ, редактируя сообщение по мере генерации
+
+        Правки не чаще одной в interval секунд (лимиты Telegram на editMessageText),
+        промежуточные версии поверх очереди схлопываются (coalesce).
+
+        Returns:
+            Полный сгенерированный текст (без prefix)
+        """
+        parts = []
+        last_edit = 0.0
+        last_shown = ""
+
+        async for chunk in chunks:
+            parts.append(chunk)
+            now = time.monotonic()
+            if now - last_edit < interval:
+                continue
+
+            shown = (prefix + "".join(parts))[:TELEGRAM_TEXT_LIMIT - len(STREAM_CURSOR)]
+            if shown != last_shown:
+                await self.edit_message_text(chat_id, message_id, shown + STREAM_CURSOR)
+                last_shown = shown
+            last_edit = now
+
+        return "".join(parts)
+
     def get_user_id(self, update: dict) -> Optional[int]:
         """Получить user_id из update"""
         if 'message' in update:
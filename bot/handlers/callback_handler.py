@@ -4,6 +4,7 @@ import logging
 from .base import BaseHandler
 from bot.ui_components import UIComponents, Messages, AchievementSystem
 from bot.constants import MAIN_MENU_TEXT
+from summarizers.fast_path import fast_path_stats
 
 logger = logging.getLogger(__name__)
 
@@ -408,7 +409,7 @@ class CallbackHandler(BaseHandler):
 
     async def handle_summary_action(self, query_id: str, chat_id: int, message_id: int, user_id: int, callback_data: str):
         """Обработка быстрых действий после саммари"""
-        # Извлекаем действие (action_copy, action_regen, action_pdf, action_voice, action_more)
+        # Извлекаем действие (action_copy, action_regen, action_pdf, action_voice, action_more, action_llm)
         action = callback_data.split("_")[1]
 
         if action == "copy":
@@ -425,6 +426,19 @@ class CallbackHandler(BaseHandler):
             else:
                 await self.send_message(chat_id, "❌ Ошибка: отправьте текст заново")
 
+        elif action == "llm":
+            # Быстрое экстрактивное саммари -> полноценное через LLM
+            await self.answer_callback_query(query_id, "🤖 Улучшаю саммари через ИИ...")
+            if self.text_handler:
+                fast_path_stats.record_upgrade()
+                user_settings = self.db.get_user_settings(user_id)
+                compression_level = user_settings.get('compression_level', 30)
+                await self.text_handler.recreate_summary(
+                    user_id, chat_id, message_id, compression_level, allow_fast_path=False
+                )
+            else:
+                await self.send_message(chat_id, "❌ Ошибка: отправьте текст заново")
+
         elif action == "pdf":
             await self.answer_callback_query(query_id, "💾 PDF генерация в разработке...", show_alert=True)
             # TODO: Реализовать генерацию PDF
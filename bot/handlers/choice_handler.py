@@ -346,7 +346,6 @@ class ChoiceHandler(BaseHandler):
     ):
         """Редактирование текста сообщения"""
         try:
-            url = f"{self.base_url}/editMessageText"
             data = {
                 "chat_id": chat_id,
                 "message_id": message_id,
@@ -355,8 +354,7 @@ class ChoiceHandler(BaseHandler):
             if reply_markup:
                 data["reply_markup"] = reply_markup
 
-            async with self.session.post(url, json=data) as response:
-                return await response.json()
+            return await self.call_api('editMessageText', data, chat_id=chat_id, coalesce=True)
         except Exception as e:
             logger.error(f"Ошибка редактирования сообщения: {e}")
             return None
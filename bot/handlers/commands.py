@@ -68,7 +68,7 @@ class CommandHandler(BaseHandler):
             "• <code>/help</code> — эта справка\n"
             "• <code>/start</code> — перезапустить бота\n\n"
             "💡 **ЛИМИТЫ:**\n"
-            "• 10 запросов в минуту\n"
+            "• Бюджет запросов в минуту: фото и документы весят вдвое больше текста, аудио — по длительности\n"
             "• Документы до 20MB\n"
             "• Аудио до 50MB (~1 час)\n\n"
             "🔥 **Powered by Llama 3.3 70B + Whisper large v3**\n\n"
@@ -110,14 +110,15 @@ class CommandHandler(BaseHandler):
         user_id = update["message"]["from"]["id"]
 
         # Используем StateManager для управления smart_mode
-        state = self.state_manager.get_state(user_id)
-        state.smart_mode = not state.smart_mode
+        state = self.state_manager.update_state(
+            user_id, lambda s: setattr(s, 'smart_mode', not s.smart_mode)
+        )
         new_mode = state.smart_mode
 
         # Синхронизация с legacy словарем (временно для обратной совместимости)
-        if user_id not in self.user_settings:
-            self.user_settings[user_id] = {}
-        self.user_settings[user_id]["smart_mode"] = new_mode
+        settings = self.user_settings.get(user_id, {})
+        settings["smart_mode"] = new_mode
+        self.user_settings[user_id] = settings
 
         if new_mode:
             mode_text = ("🧠 **Умная суммаризация включена!**\n\n"
@@ -270,15 +271,15 @@ class CommandHandler(BaseHandler):
 
         logger.info(f"🚀 DIRECT COMPRESSION: Команда /{compression_level} от пользователя {user_id}")
 
-        # Инициализируем состояние пользователя
-        self.user_states[user_id] = {"step": "format_selection"}
-        self.user_settings[user_id] = {"compression": compression_level if compression_level else 30}
+        # Инициализируем состояние пользователя: сразу ожидание текста
+        # с настройками по умолчанию (всегда маркированный список)
+        self.user_states[user_id] = {"step": "waiting_text"}
+        self.user_settings[user_id] = {
+            "compression": compression_level if compression_level else 30,
+            "format": "bullets",
+        }
         self.user_messages_buffer[user_id] = []
 
-        # Устанавливаем состояние ожидания текста сразу с настройками по умолчанию
-        self.user_states[user_id]["step"] = "waiting_text"
-        self.user_settings[user_id]["format"] = "bullets"  # Всегда маркированный список
-
         await self.send_text_request(chat_id, user_id)
 
     # ============ Вспомогательные методы ============
@@ -311,7 +312,7 @@ class CommandHandler(BaseHandler):
         await self.send_message(chat_id, text)
 
         # Устанавливаем состояние ожидания текста
-        self.user_states[user_id]["step"] = "waiting_text"
+        self.user_states[user_id] = {**self.user_states.get(user_id, {}), "step": "waiting_text"}
 
     def update_user_compression_level(self, user_id: int, compression_level: int, username: str = ""):
         """Обновление уровня сжатия пользователя в базе данных"""
@@ -329,21 +330,19 @@ class CommandHandler(BaseHandler):
         import asyncio
 
         try:
-            url = f"{self.base_url}/sendMessage"
             data = {
                 "chat_id": chat_id,
                 "text": "🔄 Обновляю интерфейс...",
                 "reply_markup": json.dumps({"remove_keyboard": True})
             }
 
-            async with self.session.post(url, data=data) as response:
-                result = await response.json()
-                if result.get("ok"):
-                    # Удаляем сообщение об обновлении после короткой задержки
-                    message_id = result["result"]["message_id"]
-                    await asyncio.sleep(1)
-                    await self.delete_message(chat_id, message_id)
-                    logger.info(f"Пользовательские клавиатуры очищены для чата {chat_id}")
+            result = await self.call_api('sendMessage', data, chat_id=chat_id)
+            if result and result.get("ok"):
+                # Удаляем сообщение об обновлении после короткой задержки
+                message_id = result["result"]["message_id"]
+                await asyncio.sleep(1)
+                await self.delete_message(chat_id, message_id)
+                logger.info(f"Пользовательские клавиатуры очищены для чата {chat_id}")
 
         except Exception as e:
             logger.error(f"Ошибка при очистке клавиатур: {e}")
@@ -1,15 +1,21 @@
 """Обработчик документов и файлов"""
 
 import logging
-import time
 import sqlite3
-from typing import Dict, Set, Optional
+from itertools import islice
+from typing import Optional
 from .base import BaseHandler
+from bot.rate_limiter import SlidingWindowRateLimiter
 from bot.core.decorators import retry_on_failure
 from llm.provider_router import groq_compatible_client
+from utils.chunking import iter_chunks
+from config import config
 
 logger = logging.getLogger(__name__)
 
+# Сколько чанков книги саммаризируется (бюджет: BOOK_MAX_CHUNKS * BOOK_CHUNK_TOKENS)
+BOOK_MAX_CHUNKS = 5
+
 
 class DocumentHandler(BaseHandler):
     """Обработчик документов (PDF, DOCX, EPUB, FB2 и др.)"""
@@ -22,16 +28,14 @@ class DocumentHandler(BaseHandler):
         state_manager,
         file_processor,
         groq_client,
-        user_requests: Dict,
-        processing_users: Set,
+        rate_limiter: SlidingWindowRateLimiter,
         db_executor
     ):
         super().__init__(session, base_url, db, state_manager)
         self.file_processor = file_processor
         # Используем Groq-совместимый wrapper с LLM Router (Gemini → OpenRouter → Groq)
         self.groq_client = groq_compatible_client
-        self.user_requests = user_requests
-        self.processing_users = processing_users
+        self.rate_limiter = rate_limiter
         self.db_executor = db_executor
 
     async def handle_document_message(self, update: dict):
@@ -44,27 +48,13 @@ class DocumentHandler(BaseHandler):
             document = message["document"]
 
             # Проверка лимита запросов
-            if not self.check_user_rate_limit(user_id):
-                await self.send_message(
-                    chat_id,
-                    "⏰ Превышен лимит запросов!\n\n"
-                    "Пожалуйста, подождите минуту перед отправкой нового файла. "
-                    "Лимит: 10 запросов в минуту."
-                )
-                return
-
-            # Проверка на повторную обработку
-            if user_id in self.processing_users:
+            if not self.check_user_rate_limit(user_id, 'document'):
                 await self.send_message(
                     chat_id,
-                    "⚠️ Обработка в процессе!\n\n"
-                    "Пожалуйста, дождитесь завершения предыдущего запроса."
+                    self.rate_limit_message("нового файла")
                 )
                 return
 
-            # Добавляем пользователя в список обрабатываемых
-            self.processing_users.add(user_id)
-
             # Проверяем информацию о файле
             file_name = document.get("file_name", "unknown")
             file_size = document.get("file_size", 0)
@@ -92,8 +82,6 @@ class DocumentHandler(BaseHandler):
                     parse_mode="HTML"
                 )
 
-                # Удаляем пользователя из списка обрабатываемых
-                self.processing_users.discard(user_id)
                 return
 
             # Отправляем сообщение о начале обработки
@@ -108,80 +96,21 @@ class DocumentHandler(BaseHandler):
             )
 
             try:
-                # Получаем информацию о файле от Telegram
-                file_info_response = await self.get_file_info(document["file_id"])
-                if not file_info_response or not file_info_response.get("ok"):
-                    await self.send_message(chat_id, "❌ Не удалось получить информацию о файле")
-                    return
-
-                file_info = file_info_response["result"]
-                file_path = f"https://api.telegram.org/file/bot{self.base_url.split('/bot')[1].split('/')[0]}/{file_info['file_path']}"
-
-                # Обновляем сообщение о прогрессе
-                if processing_message_id:
-                    await self.edit_message_text(
-                        chat_id,
-                        processing_message_id,
-                        f"📄 Обрабатываю документ: {file_name}\n\n📥 Скачиваю файл..."
-                    )
-
-                # Используем file_processor для скачивания и обработки
-                download_result = await self.file_processor.download_telegram_file(
-                    {"file_path": file_path}, file_name, file_size, self.session
-                )
-
-                if not download_result["success"]:
-                    if processing_message_id:
-                        await self.delete_message(chat_id, processing_message_id)
-                    await self.send_message(chat_id, f"❌ {download_result['error']}")
-                    return
-
-                # Определяем прогресс сообщение в зависимости от типа файла
-                extension = download_result["file_extension"].lower()
-                if extension == '.pdf':
-                    progress_text = (
-                        f"📄 Обрабатываю документ: {file_name}\n\n"
-                        f"🔍 Извлекаю текст (PDF → текстовый слой + OCR)..."
-                    )
-                elif extension == '.pptx':
-                    progress_text = (
-                        f"📊 Обрабатываю презентацию: {file_name}\n\n"
-                        f"🎯 Извлекаю слайды и заметки..."
-                    )
-                elif extension in ('.png', '.jpg', '.jpeg'):
-                    progress_text = (
-                        f"🖼️ Обрабатываю изображение: {file_name}\n\n"
-                        f"👁️ Распознаю текст (OCR)..."
+                # Пересланный ранее документ: текст из кэша, без скачивания и OCR
+                file_unique_id = document.get("file_unique_id")
+                text_result = None
+                if self.media_cache is not None:
+                    text_result = self.media_cache.get('document', file_unique_id, ocr=config.OCR_LANGS)
+                if text_result is None:
+                    text_result = await self._download_and_extract(
+                        document, file_name, file_size, chat_id, processing_message_id
                     )
-                elif extension in ('.epub', '.fb2'):
-                    progress_text = (
-                        f"📚 Обрабатываю книгу: {file_name}\n\n"
-                        f"📖 Извлекаю текст и метаданные..."
-                    )
-                else:
-                    progress_text = (
-                        f"📄 Обрабатываю документ: {file_name}\n\n"
-                        f"📝 Извлекаю текст..."
-                    )
-
-                if processing_message_id:
-                    await self.edit_message_text(chat_id, processing_message_id, progress_text)
-
-                # Извлекаем текст из файла
-                text_result = self.file_processor.extract_text_from_file(
-                    download_result["file_path"],
-                    download_result["file_extension"]
-                )
-
-                # Очищаем временные файлы
-                self.file_processor.cleanup_temp_file(download_result["temp_dir"])
-
-                if not text_result["success"]:
-                    if processing_message_id:
-                        await self.delete_message(chat_id, processing_message_id)
-                    await self.send_message(chat_id, f"❌ {text_result['error']}")
-                    return
+                    if text_result is None:
+                        return
+                    if self.media_cache is not None:
+                        self.media_cache.put('document', file_unique_id, text_result, ocr=config.OCR_LANGS)
 
+                extension = text_result["file_extension"].lower()
                 extracted_text = text_result["text"]
                 extraction_method = text_result.get("method", "unknown")
                 extraction_meta = text_result.get("meta", {})
@@ -229,7 +158,7 @@ class DocumentHandler(BaseHandler):
                 doc_type = self._detect_document_type(
                     extracted_text,
                     file_name,
-                    download_result["file_extension"],
+                    text_result["file_extension"],
                     extraction_meta
                 )
 
@@ -245,7 +174,7 @@ class DocumentHandler(BaseHandler):
                     summary = await self.summarize_file_content(
                         extracted_text,
                         file_name,
-                        download_result["file_extension"],
+                        text_result["file_extension"],
                         compression_ratio
                     )
 
@@ -349,12 +278,94 @@ class DocumentHandler(BaseHandler):
                 "❌ Произошла ошибка!\n\nПожалуйста, попробуйте позже."
             )
 
-        finally:
-            # Удаляем пользователя из списка обрабатываемых
-            self.processing_users.discard(user_id)
-
     # ============ Вспомогательные методы ============
 
+    async def _download_and_extract(
+        self,
+        document: dict,
+        file_name: str,
+        file_size: int,
+        chat_id: int,
+        processing_message_id: Optional[int]
+    ) -> Optional[dict]:
+        """Скачивание и извлечение текста; None - ошибка (пользователь уже уведомлен)"""
+        # Получаем информацию о файле от Telegram
+        file_info_response = await self.get_file_info(document["file_id"])
+        if not file_info_response or not file_info_response.get("ok"):
+            await self.send_message(chat_id, "❌ Не удалось получить информацию о файле")
+            return None
+
+        file_info = file_info_response["result"]
+        file_path = f"https://api.telegram.org/file/bot{self.base_url.split('/bot')[1].split('/')[0]}/{file_info['file_path']}"
+
+        # Обновляем сообщение о прогрессе
+        if processing_message_id:
+            await self.edit_message_text(
+                chat_id,
+                processing_message_id,
+                f"📄 Обрабатываю документ: {file_name}\n\n📥 Скачиваю файл..."
+            )
+
+        # Используем file_processor для скачивания и обработки
+        download_result = await self.file_processor.download_telegram_file(
+            {"file_path": file_path}, file_name, file_size
+        )
+
+        if not download_result["success"]:
+            if processing_message_id:
+                await self.delete_message(chat_id, processing_message_id)
+            await self.send_message(chat_id, f"❌ {download_result['error']}")
+            return None
+
+        # Определяем прогресс сообщение в зависимости от типа файла
+        extension = download_result["file_extension"].lower()
+        if extension == '.pdf':
+            progress_text = (
+                f"📄 Обрабатываю документ: {file_name}\n\n"
+                f"🔍 Извлекаю текст (PDF → текстовый слой + OCR)..."
+            )
+        elif extension == '.pptx':
+            progress_text = (
+                f"📊 Обрабатываю презентацию: {file_name}\n\n"
+                f"🎯 Извлекаю слайды и заметки..."
+            )
+        elif extension in ('.png', '.jpg', '.jpeg'):
+            progress_text = (
+                f"🖼️ Обрабатываю изображение: {file_name}\n\n"
+                f"👁️ Распознаю текст (OCR)..."
+            )
+        elif extension in ('.epub', '.fb2'):
+            progress_text = (
+                f"📚 Обрабатываю книгу: {file_name}\n\n"
+                f"📖 Извлекаю текст и метаданные..."
+            )
+        else:
+            progress_text = (
+                f"📄 Обрабатываю документ: {file_name}\n\n"
+                f"📝 Извлекаю текст..."
+            )
+
+        if processing_message_id:
+            await self.edit_message_text(chat_id, processing_message_id, progress_text)
+
+        # Извлекаем текст из файла
+        text_result = self.file_processor.extract_text_from_file(
+            download_result["file_path"],
+            download_result["file_extension"]
+        )
+
+        # Очищаем временные файлы
+        self.file_processor.cleanup_temp_file(download_result["temp_dir"])
+
+        if not text_result["success"]:
+            if processing_message_id:
+                await self.delete_message(chat_id, processing_message_id)
+            await self.send_message(chat_id, f"❌ {text_result['error']}")
+            return None
+
+        text_result["file_extension"] = download_result["file_extension"]
+        return text_result
+
     async def get_file_info(self, file_id: str):
         """Получает информацию о файле от Telegram API"""
         try:
@@ -435,22 +446,22 @@ class DocumentHandler(BaseHandler):
                     f"применяю чанк-саммаризацию"
                 )
 
-                # Разбиваем на чанки по ~15000 символов
-                chunk_size = 15000
-                chunks = []
-                for i in range(0, len(text), chunk_size):
-                    chunk = text[i:i + chunk_size]
-                    if len(chunk) > 1000:  # Пропускаем слишком короткие чанки
-                        chunks.append(chunk)
-
-                logger.info(f"📚 Разбито на {len(chunks)} чанков")
+                # Разбиваем на чанки по бюджету токенов на границах абзацев/предложений.
+                # Максимум BOOK_MAX_CHUNKS чанков, чтобы не превысить лимиты API;
+                # чанки за пределами бюджета даже не нарезаются
+                chunks = islice(
+                    (
+                        chunk for chunk in iter_chunks(text, config.BOOK_CHUNK_TOKENS)
+                        if len(chunk) > 1000  # Пропускаем слишком короткие чанки
+                    ),
+                    BOOK_MAX_CHUNKS,
+                )
 
                 # Саммаризируем каждый чанк отдельно
                 chunk_summaries = []
-                # Максимум 5 чанков чтобы не превысить лимиты API
-                for idx, chunk in enumerate(chunks[:5]):
+                for idx, chunk in enumerate(chunks):
                     logger.info(
-                        f"📚 Обработка чанка {idx + 1}/{min(len(chunks), 5)}"
+                        f"📚 Обработка чанка {idx + 1} (максимум {BOOK_MAX_CHUNKS})"
                     )
 
                     chunk_prompt = f"""Создай краткое резюме этой части книги "{book_title}" (автор: {book_author}).
@@ -665,26 +676,6 @@ class DocumentHandler(BaseHandler):
             logger.error(f"Ошибка при суммаризации файла: {e}")
             return f"❌ Ошибка при обработке: {str(e)[:100]}"
 
-    def check_user_rate_limit(self, user_id: int) -> bool:
-        """Проверка лимита запросов пользователя (10 запросов в минуту)"""
-        now = time.time()
-        if user_id not in self.user_requests:
-            self.user_requests[user_id] = []
-
-        # Удаляем запросы старше 1 минуты
-        self.user_requests[user_id] = [
-            req_time
-            for req_time in self.user_requests[user_id]
-            if now - req_time < 60
-        ]
-
-        # Проверяем лимит (10 запросов в минуту)
-        if len(self.user_requests[user_id]) >= 10:
-            return False
-
-        self.user_requests[user_id].append(now)
-        return True
-
     async def get_user_compression_level(self, user_id: int) -> float:
         """Получение уровня сжатия пользователя из базы данных"""
         try:
@@ -1,16 +1,22 @@
 """Обработчик фотографий и изображений"""
 
 import logging
-import time
 import sqlite3
-from typing import Dict, Set, Optional
+from typing import Optional
+import aiohttp
 from .base import BaseHandler
+from bot.media_cache import params_digest
+from bot.rate_limiter import SlidingWindowRateLimiter
 from bot.core.decorators import retry_on_failure
 from llm.provider_router import analyze_image
 from config import config
+from utils.downloads import DownloadTooLarge, download_service
 
 logger = logging.getLogger(__name__)
 
+# Фото Telegram (самое большое разрешение) укладывается в несколько мегабайт
+PHOTO_MAX_BYTES = 10 * 1024 * 1024
+
 
 class PhotoHandler(BaseHandler):
     """Обработчик фотографий и изображений через Gemini Vision"""
@@ -21,13 +27,11 @@ class PhotoHandler(BaseHandler):
         base_url,
         db,
         state_manager,
-        user_requests: Dict,
-        processing_users: Set,
+        rate_limiter: SlidingWindowRateLimiter,
         db_executor
     ):
         super().__init__(session, base_url, db, state_manager)
-        self.user_requests = user_requests
-        self.processing_users = processing_users
+        self.rate_limiter = rate_limiter
         self.db_executor = db_executor
 
     async def handle_photo_message(self, update: dict):
@@ -40,27 +44,13 @@ class PhotoHandler(BaseHandler):
             photo = message["photo"][-1]  # Берем самое большое разрешение
 
             # Проверка лимита запросов
-            if not self.check_user_rate_limit(user_id):
+            if not self.check_user_rate_limit(user_id, 'photo'):
                 await self.send_message(
                     chat_id,
-                    "⏰ Превышен лимит запросов!\n\n"
-                    "Пожалуйста, подождите минуту перед отправкой нового изображения. "
-                    "Лимит: 10 запросов в минуту."
+                    self.rate_limit_message("нового изображения")
                 )
                 return
 
-            # Проверка на повторную обработку
-            if user_id in self.processing_users:
-                await self.send_message(
-                    chat_id,
-                    "⚠️ Обработка в процессе!\n\n"
-                    "Пожалуйста, дождитесь завершения предыдущего запроса."
-                )
-                return
-
-            # Добавляем пользователя в список обрабатываемых
-            self.processing_users.add(user_id)
-
             logger.info(f"Получено фото от пользователя {user_id}")
 
             # Отправляем сообщение о начале обработки
@@ -75,38 +65,6 @@ class PhotoHandler(BaseHandler):
             )
 
             try:
-                # Получаем информацию о файле от Telegram
-                file_info_response = await self.get_file_info(photo["file_id"])
-                if not file_info_response or not file_info_response.get("ok"):
-                    await self.send_message(chat_id, "❌ Не удалось получить информацию о фото")
-                    return
-
-                file_info = file_info_response["result"]
-                file_path = f"https://api.telegram.org/file/bot{self.base_url.split('/bot')[1].split('/')[0]}/{file_info['file_path']}"
-
-                # Обновляем сообщение о прогрессе
-                if processing_message_id:
-                    await self.edit_message_text(
-                        chat_id,
-                        processing_message_id,
-                        "🖼️ Анализирую изображение...\n\n📥 Скачиваю фото..."
-                    )
-
-                # Скачиваем изображение
-                async with self.session.get(file_path) as response:
-                    if response.status != 200:
-                        await self.send_message(chat_id, "❌ Не удалось скачать изображение")
-                        return
-                    image_data = await response.read()
-
-                # Обновляем прогресс
-                if processing_message_id:
-                    await self.edit_message_text(
-                        chat_id,
-                        processing_message_id,
-                        "🖼️ Анализирую изображение...\n\n🤖 Распознаю с помощью Gemini Vision..."
-                    )
-
                 # Получаем caption если есть (дополнительный контекст)
                 caption = message.get("caption", "")
 
@@ -116,70 +74,97 @@ class PhotoHandler(BaseHandler):
                 else:
                     analysis_prompt = config.IMAGE_ANALYSIS_PROMPT
 
-                # Анализируем изображение через Gemini Vision
-                try:
-                    analysis_result = analyze_image(
-                        image_data=image_data,
-                        prompt=analysis_prompt,
-                        temperature=0.3,
-                        max_tokens=2000
-                    )
+                # Пересланное ранее фото с тем же промптом: ответ из кэша, без скачивания
+                file_unique_id = photo.get("file_unique_id")
+                prompt_key = params_digest(analysis_prompt)
+                cached = None
+                if self.media_cache is not None:
+                    cached = self.media_cache.get('photo', file_unique_id, prompt=prompt_key)
 
-                    if analysis_result:
-                        # Формируем итоговый ответ
-                        response_text = f"""🖼️ **Анализ изображения**
-
-{analysis_result}
+                if cached is not None:
+                    analysis_result = cached["analysis"]
+                else:
+                    image_data = await self._download_photo(photo, user_id, chat_id, processing_message_id)
+                    if image_data is None:
+                        return
 
-📊 **Информация:**
-• Размер: {photo.get('width', 0)}×{photo.get('height', 0)} px
-• Метод: Gemini Vision AI"""
+                    # Обновляем прогресс
+                    if processing_message_id:
+                        await self.edit_message_text(
+                            chat_id,
+                            processing_message_id,
+                            "🖼️ Анализирую изображение...\n\n🤖 Распознаю с помощью Gemini Vision..."
+                        )
 
-                        # Удаляем сообщение о обработке
+                    # Анализируем изображение через Gemini Vision
+                    try:
+                        analysis_result = analyze_image(
+                            image_data=image_data,
+                            prompt=analysis_prompt,
+                            temperature=0.3,
+                            max_tokens=2000
+                        )
+                    except NotImplementedError:
+                        # Fallback на OCR если Gemini недоступен
                         if processing_message_id:
-                            await self.delete_message(chat_id, processing_message_id)
-
-                        await self.send_message(chat_id, response_text)
-
-                        # Сохраняем в базу данных
-                        try:
-                            await self._run_in_executor(
-                                self.db.save_user_request,
-                                user_id,
-                                f"photo_analysis",
-                                len(analysis_result),
-                                len(analysis_result),
-                                0.0,
-                                'gemini_vision'
+                            await self.edit_message_text(
+                                chat_id,
+                                processing_message_id,
+                                "🖼️ Анализирую изображение...\n\n👁️ Использую OCR (Gemini недоступен)..."
                             )
-                        except (OSError, sqlite3.Error) as save_error:
-                            logger.error(f"Ошибка сохранения запроса в БД: {save_error}")
-
-                        logger.info(f"Успешно проанализировано фото пользователя {user_id}")
 
-                    else:
-                        if processing_message_id:
-                            await self.delete_message(chat_id, processing_message_id)
+                        # Здесь можно добавить fallback на OCR
                         await self.send_message(
                             chat_id,
-                            "❌ Не удалось проанализировать изображение!\n\n"
-                            "Попробуйте позже или отправьте другое фото."
+                            "⚠️ Gemini Vision временно недоступен.\n\n"
+                            "Отправьте изображение как документ для обработки через OCR."
                         )
+                        return
+
+                    if analysis_result and self.media_cache is not None:
+                        self.media_cache.put(
+                            'photo', file_unique_id, {"analysis": analysis_result}, prompt=prompt_key
+                        )
+
+                if analysis_result:
+                    # Формируем итоговый ответ
+                    response_text = f"""🖼️ **Анализ изображения**
 
-                except NotImplementedError:
-                    # Fallback на OCR если Gemini недоступен
+{analysis_result}
+
+📊 **Информация:**
+• Размер: {photo.get('width', 0)}×{photo.get('height', 0)} px
+• Метод: Gemini Vision AI"""
+
+                    # Удаляем сообщение о обработке
                     if processing_message_id:
-                        await self.edit_message_text(
-                            chat_id,
-                            processing_message_id,
-                            "🖼️ Анализирую изображение...\n\n👁️ Использую OCR (Gemini недоступен)..."
+                        await self.delete_message(chat_id, processing_message_id)
+
+                    await self.send_message(chat_id, response_text)
+
+                    # Сохраняем в базу данных
+                    try:
+                        await self._run_in_executor(
+                            self.db.save_user_request,
+                            user_id,
+                            f"photo_analysis",
+                            len(analysis_result),
+                            len(analysis_result),
+                            0.0,
+                            'gemini_vision'
                         )
+                    except (OSError, sqlite3.Error) as save_error:
+                        logger.error(f"Ошибка сохранения запроса в БД: {save_error}")
+
+                    logger.info(f"Успешно проанализировано фото пользователя {user_id}")
 
-                    # Здесь можно добавить fallback на OCR
+                else:
+                    if processing_message_id:
+                        await self.delete_message(chat_id, processing_message_id)
                     await self.send_message(
                         chat_id,
-                        "⚠️ Gemini Vision временно недоступен.\n\n"
-                        "Отправьте изображение как документ для обработки через OCR."
+                        "❌ Не удалось проанализировать изображение!\n\n"
+                        "Попробуйте позже или отправьте другое фото."
                     )
 
             except (sqlite3.Error, ValueError) as e:
@@ -199,12 +184,42 @@ class PhotoHandler(BaseHandler):
                 "❌ Произошла ошибка!\n\nПожалуйста, попробуйте позже."
             )
 
-        finally:
-            # Удаляем пользователя из списка обрабатываемых
-            self.processing_users.discard(user_id)
-
     # ============ Вспомогательные методы ============
 
+    async def _download_photo(
+        self,
+        photo: dict,
+        user_id: int,
+        chat_id: int,
+        processing_message_id: Optional[int]
+    ) -> Optional[bytes]:
+        """Скачивание фото в память; None - ошибка (пользователь уже уведомлен)"""
+        # Получаем информацию о файле от Telegram
+        file_info_response = await self.get_file_info(photo["file_id"])
+        if not file_info_response or not file_info_response.get("ok"):
+            await self.send_message(chat_id, "❌ Не удалось получить информацию о фото")
+            return None
+
+        file_info = file_info_response["result"]
+        file_path = f"https://api.telegram.org/file/bot{self.base_url.split('/bot')[1].split('/')[0]}/{file_info['file_path']}"
+
+        # Обновляем сообщение о прогрессе
+        if processing_message_id:
+            await self.edit_message_text(
+                chat_id,
+                processing_message_id,
+                "🖼️ Анализирую изображение...\n\n📥 Скачиваю фото..."
+            )
+
+        # Скачиваем изображение в память через общий пул соединений
+        try:
+            download = await download_service.download(file_path, max_bytes=PHOTO_MAX_BYTES)
+        except (aiohttp.ClientError, DownloadTooLarge) as e:
+            logger.warning(f"Не удалось скачать фото пользователя {user_id}: {e}")
+            await self.send_message(chat_id, "❌ Не удалось скачать изображение")
+            return None
+        return download.data
+
     async def get_file_info(self, file_id: str):
         """Получает информацию о файле от Telegram API"""
         try:
@@ -217,26 +232,6 @@ class PhotoHandler(BaseHandler):
             logger.error(f"Ошибка получения информации о файле: {e}")
             return None
 
-    def check_user_rate_limit(self, user_id: int) -> bool:
-        """Проверка лимита запросов пользователя (10 запросов в минуту)"""
-        now = time.time()
-        if user_id not in self.user_requests:
-            self.user_requests[user_id] = []
-
-        # Удаляем запросы старше 1 минуты
-        self.user_requests[user_id] = [
-            req_time
-            for req_time in self.user_requests[user_id]
-            if now - req_time < 60
-        ]
-
-        # Проверяем лимит (10 запросов в минуту)
-        if len(self.user_requests[user_id]) >= 10:
-            return False
-
-        self.user_requests[user_id].append(now)
-        return True
-
     async def _run_in_executor(self, func, *args):
         """Запуск синхронной функции в executor"""
         import asyncio
@@ -265,7 +260,6 @@ class PhotoHandler(BaseHandler):
     ):
         """Редактирование текста сообщения"""
         try:
-            url = f"{self.base_url}/editMessageText"
             data = {
                 "chat_id": chat_id,
                 "message_id": message_id,
@@ -274,8 +268,7 @@ class PhotoHandler(BaseHandler):
             if parse_mode:
                 data["parse_mode"] = parse_mode
 
-            async with self.session.post(url, json=data) as response:
-                return await response.json()
+            return await self.call_api('editMessageText', data, chat_id=chat_id, coalesce=True)
         except Exception as e:
             logger.error(f"Ошибка редактирования сообщения: {e}")
             return None
@@ -1,13 +1,20 @@
 """Обработчик текстовых сообщений"""
 
+import asyncio
 import logging
 import time
 import sqlite3
-from typing import Dict, Set, Optional
+from typing import Dict, Optional
 from datetime import datetime
 from .base import BaseHandler
-from llm.provider_router import generate_completion
+from bot.rate_limiter import SlidingWindowRateLimiter
+from llm.provider_router import generate_completion, stream_completion_async
+from config import config
 from bot.ui_components import UIComponents
+from bot.state_store import create_store
+from summarizers.fast_path import assess_llm_benefit, extractive_summary, fast_path_stats
+from summarization.pipeline import SummarizationPipeline
+from utils.language_detect import detect_language_simple
 
 logger = logging.getLogger(__name__)
 
@@ -24,8 +31,7 @@ class TextHandler(BaseHandler):
         groq_client,
         openrouter_client,
         smart_summarizer,
-        user_requests: Dict,
-        processing_users: Set,
+        rate_limiter: SlidingWindowRateLimiter,
         user_states: Dict,
         user_settings: Dict,
         user_messages_buffer: Dict,
@@ -36,8 +42,7 @@ class TextHandler(BaseHandler):
         self.groq_client = groq_client
         self.openrouter_client = openrouter_client
         self.smart_summarizer = smart_summarizer
-        self.user_requests = user_requests
-        self.processing_users = processing_users
+        self.rate_limiter = rate_limiter
         self.user_states = user_states
         self.user_settings = user_settings
         self.user_messages_buffer = user_messages_buffer
@@ -45,9 +50,23 @@ class TextHandler(BaseHandler):
         self.url_processor = url_processor
 
         # Кэш последних текстов пользователей для пересоздания саммари
-        self.user_last_texts: Dict[int, str] = {}
+        # (ограничен по объему: исходные тексты бывают мегабайтными)
+        text_cache_ttl = getattr(config, 'TEXT_CACHE_TTL_SECONDS', 21600)
+        self.user_last_texts = create_store(
+            'user_last_texts', config, ttl=text_cache_ttl,
+            max_bytes=getattr(config, 'TEXT_CACHE_MAX_MB', 64) * 1024 * 1024
+        )
         # Кэш message_id последних саммари
-        self.user_summary_messages: Dict[int, int] = {}
+        self.user_summary_messages = create_store('user_summary_messages', config, ttl=text_cache_ttl)
+        # Данные фазы A (bullets, key_facts, entities) последнего текста для быстрого пересжатия
+        self.user_phase_a = create_store('user_phase_a', config, ttl=text_cache_ttl)
+        # Идущие построения фазы A (повторные нажатия ждут одну задачу)
+        self._phase_a_tasks: Dict[int, asyncio.Task] = {}
+        self.summarization_pipeline = SummarizationPipeline(groq_client, use_router=True)
+
+    def state_stores(self) -> list:
+        """Хранилища состояния обработчика (для периодической очистки)"""
+        return [self.user_last_texts, self.user_summary_messages, self.user_phase_a]
 
     async def handle_text_message(self, update: dict, message_text: Optional[str] = None):
         """Обработка текстовых сообщений"""
@@ -89,17 +108,7 @@ class TextHandler(BaseHandler):
         if not self.check_user_rate_limit(user_id):
             await self.send_message(
                 chat_id,
-                "⏰ Превышен лимит запросов!\n\n"
-                "Пожалуйста, подождите минуту перед отправкой нового текста. Лимит: 10 запросов в минуту."
-            )
-            return
-
-        # Проверка на повторную обработку
-        if user_id in self.processing_users:
-            await self.send_message(
-                chat_id,
-                "⚠️ Обработка в процессе!\n\n"
-                "Пожалуйста, дождитесь завершения предыдущего запроса."
+                self.rate_limit_message("нового текста")
             )
             return
 
@@ -113,29 +122,37 @@ class TextHandler(BaseHandler):
             )
             return
 
-        # Добавляем пользователя в список обрабатываемых
-        self.processing_users.add(user_id)
-
         try:
-            # Отправляем сообщение о начале обработки
-            processing_response = await self.send_message(
-                chat_id,
-                "🤖 Обрабатываю ваш текст...\n\nЭто может занять несколько секунд."
-            )
-            processing_message_id = (
-                processing_response.get("result", {}).get("message_id")
-                if processing_response
-                else None
-            )
-
             start_time = time.time()
 
             # Получаем уровень сжатия пользователя из базы данных
             user_compression_level = await self.get_user_compression_level(user_id)
             target_ratio = user_compression_level / 100.0
 
-            # Выполняем суммаризацию с пользовательскими настройками
-            summary = await self.summarize_text(text, target_ratio=target_ratio)
+            # Короткие и избыточные тексты обрабатываем локально без LLM
+            summary = await self._fast_path_summary(text, target_ratio)
+            extractive = summary is not None
+            processing_message_id = None
+
+            if not extractive:
+                # Отправляем сообщение о начале обработки
+                processing_response = await self.send_message(
+                    chat_id,
+                    "🤖 Обрабатываю ваш текст...\n\nЭто может занять несколько секунд."
+                )
+                processing_message_id = (
+                    processing_response.get("result", {}).get("message_id")
+                    if processing_response
+                    else None
+                )
+
+                # Выполняем суммаризацию с пользовательскими настройками
+                summary = await self.summarize_text(
+                    text,
+                    target_ratio=target_ratio,
+                    chat_id=chat_id,
+                    stream_message_id=processing_message_id,
+                )
 
             processing_time = time.time() - start_time
 
@@ -149,7 +166,7 @@ class TextHandler(BaseHandler):
                         len(text),
                         len(summary),
                         processing_time,
-                        "groq",
+                        "extractive" if extractive else "groq",
                     )
                 except (OSError, sqlite3.Error) as save_error:
                     logger.error(f"Ошибка сохранения запроса в БД: {save_error}")
@@ -167,20 +184,28 @@ class TextHandler(BaseHandler):
 • Саммари: {len(summary):,} символов
 • Сжатие: {compression_ratio:.1%}
 • Время обработки: {processing_time:.1f}с"""
-
-                # Удаляем сообщение о обработке
-                if processing_message_id:
-                    await self.delete_message(chat_id, processing_message_id)
+                if extractive:
+                    response_text += "\n\n⚡ Быстрое саммари без ИИ - нажмите «Улучшить через ИИ» для полной версии"
 
                 # Создаем inline клавиатуру с быстрыми действиями
-                keyboard = UIComponents.summary_actions(user_id, summary_id=str(user_id))
+                keyboard = UIComponents.summary_actions(
+                    user_id, summary_id=str(user_id), llm_upgrade=extractive
+                )
 
-                # Отправляем саммари и сохраняем message_id
-                result = await self.send_message(chat_id, response_text, reply_markup=keyboard)
+                # Финальная версия заменяет потоковое сообщение на месте
+                result = None
+                if processing_message_id and len(response_text) <= 4096:
+                    result = await self.edit_message_text(
+                        chat_id, processing_message_id, response_text, reply_markup=keyboard
+                    )
+                if not result:
+                    if processing_message_id:
+                        await self.delete_message(chat_id, processing_message_id)
+                    result = await self.send_message(chat_id, response_text, reply_markup=keyboard)
                 if result and "result" in result:
                     summary_message_id = result["result"]["message_id"]
                     # Сохраняем текст и message_id для пересоздания при нажатии кнопок
-                    self.user_last_texts[user_id] = text
+                    self._remember_text(user_id, text)
                     self.user_summary_messages[user_id] = summary_message_id
 
                 logger.info(
@@ -207,18 +232,16 @@ class TextHandler(BaseHandler):
                 chat_id, f"❌ Произошла ошибка!\n\nПожалуйста, попробуйте позже."
             )
 
-        finally:
-            # Удаляем пользователя из списка обрабатываемых
-            self.processing_users.discard(user_id)
-
     async def handle_custom_summarize_text(self, update: dict, text: str):
         """Обработка текста в режиме настраиваемой суммаризации"""
         chat_id = update["message"]["chat"]["id"]
         user_id = update["message"]["from"]["id"]
 
         try:
-            # Добавляем текст в буфер сообщений пользователя
-            self.user_messages_buffer[user_id].append(
+            # Добавляем текст в буфер сообщений пользователя (присваиваем заново,
+            # чтобы изменение попало и в общий бэкенд хранилища)
+            buffer = self.user_messages_buffer[user_id]
+            buffer.append(
                 {
                     "text": text,
                     "timestamp": datetime.now(),
@@ -226,18 +249,19 @@ class TextHandler(BaseHandler):
                     or "forward_from_chat" in update["message"],
                 }
             )
+            self.user_messages_buffer[user_id] = buffer
 
             # Проверяем, нужно ли ждать еще сообщений
-            total_chars = sum(len(msg["text"]) for msg in self.user_messages_buffer[user_id])
+            total_chars = sum(len(msg["text"]) for msg in buffer)
 
-            if len(self.user_messages_buffer[user_id]) == 1 and total_chars >= 100:
+            if len(buffer) == 1 and total_chars >= 100:
                 # Если это первое сообщение и оно достаточно длинное - обрабатываем сразу
                 await self.process_custom_summarization(chat_id, user_id)
-            elif len(self.user_messages_buffer[user_id]) > 1:
+            elif len(buffer) > 1:
                 # Если уже есть несколько сообщений - спрашиваем, продолжать ли сбор
                 await self.send_message(
                     chat_id,
-                    f"📝 Собрано сообщений: {len(self.user_messages_buffer[user_id])}\n"
+                    f"📝 Собрано сообщений: {len(buffer)}\n"
                     f"📊 Общий объем: {total_chars:,} символов\n\n"
                     f"Отправьте текст: 'ok' для обработки или еще текст для добавления",
                 )
@@ -332,12 +356,9 @@ class TextHandler(BaseHandler):
                 logger.error(f"Ошибка сохранения запроса в БД: {save_error}")
 
             # Очищаем состояние пользователя
-            if user_id in self.user_states:
-                del self.user_states[user_id]
-            if user_id in self.user_settings:
-                del self.user_settings[user_id]
-            if user_id in self.user_messages_buffer:
-                del self.user_messages_buffer[user_id]
+            self.user_states.pop(user_id, None)
+            self.user_settings.pop(user_id, None)
+            self.user_messages_buffer.pop(user_id, None)
 
         except (sqlite3.Error, ValueError) as e:
             logger.error(f"Ошибка выполнения настраиваемой суммаризации: {e}")
@@ -347,8 +368,19 @@ class TextHandler(BaseHandler):
 
     # ============ Вспомогательные методы ============
 
-    async def summarize_text(self, text: str, target_ratio: float = 0.3) -> str:
-        """Суммаризация текста с помощью LLM API"""
+    async def summarize_text(
+        self,
+        text: str,
+        target_ratio: float = 0.3,
+        chat_id: Optional[int] = None,
+        stream_message_id: Optional[int] = None
+    ) -> str:
+        """
+        Суммаризация текста с помощью LLM API
+
+        Если передан stream_message_id и включен LLM_STREAMING, ответ
+        генерируется потоково и постепенно показывается в этом сообщении.
+        """
         if not self.groq_client and not self.openrouter_client:
             return "❌ LLM API недоступен. Пожалуйста, проверьте настройки."
 
@@ -408,18 +440,42 @@ class TextHandler(BaseHandler):
 
             # Используем LLM Provider Router (Gemini → OpenRouter → Groq)
             summary = None
-            try:
-                logger.info("🤖 Генерация суммаризации через LLM Provider Router")
-                summary = generate_completion(
-                    prompt=prompt,
-                    system=None,
-                    temperature=0.3,
-                    max_tokens=2000
-                )
-                if summary:
-                    summary = summary.strip()
-            except Exception as e:
-                logger.error(f"❌ Ошибка LLM Provider Router: {e}")
+            if stream_message_id and chat_id and getattr(config, 'LLM_STREAMING', True):
+                try:
+                    logger.info("🤖 Потоковая генерация суммаризации через LLM Provider Router")
+                    summary = await self.edit_message_progressively(
+                        chat_id,
+                        stream_message_id,
+                        stream_completion_async(
+                            prompt=prompt,
+                            system=None,
+                            temperature=0.3,
+                            max_tokens=2000
+                        ),
+                        prefix="📋 Саммари:\n\n",
+                        interval=getattr(config, 'STREAM_EDIT_INTERVAL', 1.0)
+                    )
+                except Exception as e:
+                    logger.error(f"❌ Ошибка потоковой генерации, пробуем без стриминга: {e}")
+                    summary = None
+
+            if not summary:
+                try:
+                    logger.info("🤖 Генерация суммаризации через LLM Provider Router")
+                    summary = await asyncio.get_running_loop().run_in_executor(
+                        None,
+                        lambda: generate_completion(
+                            prompt=prompt,
+                            system=None,
+                            temperature=0.3,
+                            max_tokens=2000
+                        )
+                    )
+                except Exception as e:
+                    logger.error(f"❌ Ошибка LLM Provider Router: {e}")
+
+            if summary:
+                summary = summary.strip()
 
             return summary if summary else "❌ Не удалось получить ответ от модели"
 
@@ -427,6 +483,95 @@ class TextHandler(BaseHandler):
             logger.error(f"Ошибка при суммаризации: {e}")
             return f"❌ Ошибка при обработке текста: {str(e)[:100]}"
 
+    async def _fast_path_summary(self, text: str, target_ratio: float) -> Optional[str]:
+        """
+        Экстрактивное саммари без LLM, если политика считает LLM лишним
+
+        Оценка политики и TextRank - CPU-работа по всему тексту, поэтому
+        выполняются в executor, не блокируя event loop.
+
+        Returns:
+            Готовое саммари или None, если текст нужно отправить в LLM
+        """
+        if not getattr(config, 'FAST_PATH_ENABLED', True):
+            return None
+
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self._fast_path_summary_sync, text, target_ratio
+        )
+
+    def _fast_path_summary_sync(self, text: str, target_ratio: float) -> Optional[str]:
+        decision = assess_llm_benefit(
+            text,
+            max_tokens=getattr(config, 'FAST_PATH_MAX_TOKENS', 150),
+            min_redundancy=getattr(config, 'FAST_PATH_MIN_REDUNDANCY', 0.5),
+        )
+        fast_path_stats.record(decision)
+        if not decision.use_extractive:
+            return None
+        return extractive_summary(text, target_ratio, decision.lang)
+
+    def _remember_text(self, user_id: int, text: str):
+        """Сохраняет текст для пересоздания саммари и сбрасывает фазу A прежнего текста"""
+        self.user_last_texts[user_id] = text
+        self.user_phase_a.pop(user_id, None)
+        previous = self._phase_a_tasks.pop(user_id, None)
+        if previous and not previous.done():
+            previous.cancel()
+
+    def _forget_phase_a_task(self, user_id: int, task: asyncio.Task):
+        if self._phase_a_tasks.get(user_id) is task:
+            del self._phase_a_tasks[user_id]
+
+    async def _build_phase_a(self, user_id: int, text: str) -> Optional[Dict]:
+        """Фаза A текста; сохраняется, только если текст пользователя не сменился"""
+        try:
+            phase_a = await self.summarization_pipeline.extract_phase_a(
+                text, detect_language_simple(text)
+            )
+        except Exception as e:
+            logger.error(f"Ошибка извлечения фазы A: {e}")
+            return None
+        if phase_a and self.user_last_texts.get(user_id) == text:
+            self.user_phase_a[user_id] = phase_a
+        return phase_a
+
+    async def _recompress_summary(self, user_id: int, text: str, target_ratio: float) -> Optional[str]:
+        """
+        Саммари другого уровня сжатия из сохраненных данных фазы A
+
+        Фаза A строится лениво при первом пересжатии и кешируется: тексты,
+        которые не пересжимают, не тратят лишних вызовов LLM. Дальше все
+        уровни строятся из компактного JSON: локально или коротким промптом
+        фазы B, без повторной отправки исходного текста.
+        """
+        if not getattr(config, 'RECOMPRESS_FROM_PHASE_A', True):
+            return None
+
+        try:
+            lang = detect_language_simple(text)
+            phase_a = self.user_phase_a.get(user_id)
+            if phase_a is None:
+                task = self._phase_a_tasks.get(user_id)
+                if task is None:
+                    task = asyncio.create_task(self._build_phase_a(user_id, text))
+                    self._phase_a_tasks[user_id] = task
+                    task.add_done_callback(lambda done: self._forget_phase_a_task(user_id, done))
+                # shield: отмена одного пересоздания не отменяет общую задачу
+                phase_a = await asyncio.shield(task)
+                if not phase_a:
+                    return None
+
+            result = await self.summarization_pipeline.recompress(
+                phase_a, lang, "bullets", int(len(text) * target_ratio)
+            )
+            logger.info(f"Пересжатие из фазы A для пользователя {user_id}: {result['method']}")
+            return result['summary'] or None
+
+        except Exception as e:
+            logger.error(f"Ошибка пересжатия из фазы A: {e}")
+            return None
+
     async def custom_summarize_text(
         self, text: str, compression_ratio: float, format_type: str
     ) -> str:
@@ -484,24 +629,6 @@ class TextHandler(BaseHandler):
             logger.error(f"Ошибка при настраиваемой суммаризации: {e}")
             return f"❌ Ошибка при обработке текста: {str(e)[:100]}"
 
-    def check_user_rate_limit(self, user_id: int) -> bool:
-        """Проверка лимита запросов пользователя"""
-        now = time.time()
-        if user_id not in self.user_requests:
-            self.user_requests[user_id] = []
-
-        # Удаляем запросы старше 1 минуты
-        self.user_requests[user_id] = [
-            req_time for req_time in self.user_requests[user_id] if now - req_time < 60
-        ]
-
-        # Проверяем лимит (10 запросов в минуту)
-        if len(self.user_requests[user_id]) >= 10:
-            return False
-
-        self.user_requests[user_id].append(now)
-        return True
-
     async def get_user_compression_level(self, user_id: int) -> int:
         """Получение уровня сжатия пользователя из базы данных"""
         try:
@@ -531,7 +658,10 @@ class TextHandler(BaseHandler):
             logger.error(f"Ошибка удаления сообщения: {e}")
             return False
 
-    async def recreate_summary(self, user_id: int, chat_id: int, message_id: int, compression_level: int):
+    async def recreate_summary(
+        self, user_id: int, chat_id: int, message_id: int, compression_level: int,
+        allow_fast_path: bool = True
+    ):
         """
         Пересоздает саммари с новым уровнем сжатия
 
@@ -540,6 +670,7 @@ class TextHandler(BaseHandler):
             chat_id: ID чата
             message_id: ID сообщения для редактирования
             compression_level: Новый уровень сжатия (10, 30, 50)
+            allow_fast_path: False - всегда через LLM (кнопка «Улучшить через ИИ»)
         """
         try:
             # Проверяем наличие сохраненного текста
@@ -558,7 +689,12 @@ class TextHandler(BaseHandler):
             # Пересоздаем саммари
             import time
             start_time = time.time()
-            summary = await self.summarize_text(text, target_ratio=target_ratio)
+            summary = await self._fast_path_summary(text, target_ratio) if allow_fast_path else None
+            extractive = summary is not None
+            if not extractive:
+                summary = await self._recompress_summary(user_id, text, target_ratio)
+            if not summary:
+                summary = await self.summarize_text(text, target_ratio=target_ratio)
             processing_time = time.time() - start_time
 
             if summary and not summary.startswith("❌"):
@@ -577,6 +713,8 @@ class TextHandler(BaseHandler):
 
                 # Создаем обновленную клавиатуру с новым выбранным уровнем
                 keyboard = self._get_compression_keyboard(compression_level)
+                if extractive:
+                    keyboard["inline_keyboard"].insert(0, UIComponents.llm_upgrade_row(str(user_id)))
 
                 # Редактируем сообщение
                 await self.edit_message_text(chat_id, message_id, response_text, reply_markup=keyboard)
@@ -642,26 +780,13 @@ class TextHandler(BaseHandler):
         logger.info(f"Обработка {len(urls)} URL от пользователя {user_id}")
 
         # Проверка лимита запросов
-        if not self.check_user_rate_limit(user_id):
-            await self.send_message(
-                chat_id,
-                "⏰ Превышен лимит запросов!\n\n"
-                "Пожалуйста, подождите минуту перед отправкой нового запроса. Лимит: 10 запросов в минуту."
-            )
-            return
-
-        # Проверка на повторную обработку
-        if user_id in self.processing_users:
+        if not self.check_user_rate_limit(user_id, 'url'):
             await self.send_message(
                 chat_id,
-                "⚠️ Обработка в процессе!\n\n"
-                "Пожалуйста, дождитесь завершения предыдущего запроса."
+                self.rate_limit_message("нового запроса")
             )
             return
 
-        # Добавляем пользователя в список обрабатываемых
-        self.processing_users.add(user_id)
-
         try:
             # Отправляем сообщение о начале обработки
             processing_msg = await self.send_message(
@@ -786,7 +911,7 @@ class TextHandler(BaseHandler):
                 if result and "result" in result:
                     summary_message_id = result["result"]["message_id"]
                     # Сохраняем текст и message_id для пересоздания при нажатии кнопок
-                    self.user_last_texts[user_id] = combined_text
+                    self._remember_text(user_id, combined_text)
                     self.user_summary_messages[user_id] = summary_message_id
 
                 logger.info(
@@ -807,6 +932,3 @@ class TextHandler(BaseHandler):
                 chat_id, f"❌ Произошла ошибка!\n\nПожалуйста, попробуйте позже."
             )
 
-        finally:
-            # Удаляем пользователя из списка обрабатываемых
-            self.processing_users.discard(user_id)
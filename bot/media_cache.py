@@ -0,0 +1,74 @@
+"""
+Кэш результатов обработки медиа по file_unique_id
+
+Пересланные голосовые, документы и фото сохраняют file_unique_id, поэтому
+повтор можно обслужить без скачивания и повторной обработки: в кэше лежат
+транскрипты (AudioHandler), извлеченный текст (DocumentHandler) и ответы
+vision-модели (PhotoHandler). Ключ - тип медиа, file_unique_id и параметры,
+от которых зависит результат (движок ASR, языки OCR, промпт). Хранение -
+BoundedStore: LRU по числу записей и объему, TTL, учет размера; при
+STATE_BACKEND=sqlite/redis кэш общий для реплик.
+"""
+
+import hashlib
+import logging
+from typing import Any, Dict, Optional
+
+from bot.state_store import BoundedStore, create_store
+
+logger = logging.getLogger(__name__)
+
+
+def media_cache_key(kind: str, file_unique_id: str, **params: Any) -> str:
+    """Ключ вида 'photo:AQAD...:prompt=3f2a...' (параметры по алфавиту)"""
+    parts = [kind, file_unique_id]
+    parts.extend(f"{name}={params[name]}" for name in sorted(params))
+    return ":".join(parts)
+
+
+def params_digest(text: str) -> str:
+    """Короткий отпечаток длинного параметра (промпт, подпись)"""
+    return hashlib.sha1(text.encode()).hexdigest()[:16]
+
+
+class MediaResultCache:
+    """Результаты обработки медиа (JSON-совместимые dict) поверх BoundedStore"""
+
+    def __init__(self, store: BoundedStore):
+        self.store = store
+
+    def get(self, kind: str, file_unique_id: Optional[str], **params: Any) -> Optional[Dict[str, Any]]:
+        if not file_unique_id:
+            return None
+        try:
+            result = self.store.get(media_cache_key(kind, file_unique_id, **params))
+        except Exception as e:
+            logger.warning(f"Ошибка чтения кэша медиа: {e}")
+            return None
+        if result is not None:
+            logger.info(f"Результат {kind} из кэша: {file_unique_id}")
+        return result
+
+    def put(self, kind: str, file_unique_id: Optional[str], result: Dict[str, Any], **params: Any):
+        if not file_unique_id:
+            return
+        try:
+            self.store[media_cache_key(kind, file_unique_id, **params)] = result
+        except Exception as e:
+            logger.warning(f"Не удалось сохранить результат {kind} в кэш: {e}")
+
+    def sweep(self) -> int:
+        return self.store.sweep()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return self.store.get_stats()
+
+
+def create_media_cache(config=None) -> MediaResultCache:
+    """Кэш по MEDIA_CACHE_MAX_ENTRIES, MEDIA_CACHE_MAX_MB, MEDIA_CACHE_TTL_SECONDS"""
+    return MediaResultCache(create_store(
+        'media_results', config,
+        max_entries=getattr(config, 'MEDIA_CACHE_MAX_ENTRIES', 2000),
+        ttl=getattr(config, 'MEDIA_CACHE_TTL_SECONDS', 7 * 86400),
+        max_bytes=getattr(config, 'MEDIA_CACHE_MAX_MB', 128) * 1024 * 1024,
+    ))
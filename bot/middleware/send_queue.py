@@ -0,0 +1,316 @@
+"""Очередь исходящих сообщений с ограничением скорости Telegram Bot API"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+# Приоритетные полосы: интерактивные ответы уходят раньше дайджестов
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 1
+
+
+class TokenBucket:
+    """Token bucket с поддержкой принудительной паузы (retry_after)"""
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        Args:
+            rate: Скорость пополнения (токенов в секунду)
+            capacity: Максимальный размер всплеска
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float):
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated = now
+
+    def wait_time(self, now: Optional[float] = None) -> float:
+        """Сколько секунд ждать до появления токена (0 - можно отправлять)"""
+        now = time.monotonic() if now is None else now
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self, now: Optional[float] = None):
+        """Списать один токен"""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        self.tokens -= 1
+
+    def block(self, seconds: float):
+        """Приостановить выдачу токенов (ответ 429 с retry_after)"""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+    def is_idle(self, now: float) -> bool:
+        """Bucket полон и не заблокирован - его можно удалить"""
+        self._refill(now)
+        return self.tokens >= self.capacity and now >= self.blocked_until
+
+
+@dataclass
+class OutboundJob:
+    """Один запрос к Bot API, ожидающий отправки"""
+    method: str
+    payload: Dict[str, Any]
+    chat_id: Optional[int]
+    priority: int
+    coalesce_key: Optional[Tuple[int, int]] = None
+    waiters: List[asyncio.Future] = field(default_factory=list)
+    attempts: int = 0
+
+
+class OutboundMessageQueue:
+    """
+    Планировщик исходящих запросов к Telegram.
+
+    Глобальный token bucket (~30 сообщений/сек) и bucket на каждый чат
+    (~1 сообщение/сек), приоритетные полосы, автоматическая обработка
+    retry_after и склейка последовательных редактирований одного сообщения.
+    """
+
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        base_url: str,
+        global_rate: float = 30.0,
+        chat_rate: float = 1.0,
+        chat_burst: float = 3.0,
+        max_retries: int = 3,
+    ):
+        self.session = session
+        self.base_url = base_url
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+
+        self._lanes: List[List[OutboundJob]] = [[], []]
+        self._chat_buckets: Dict[int, TokenBucket] = {}
+        self._pending_edits: Dict[Tuple[int, int], OutboundJob] = {}
+        self._wakeup = asyncio.Event()
+        self._worker: Optional[asyncio.Task] = None
+        self._inflight: set = set()
+
+        self.stats = {'sent': 0, 'coalesced': 0, 'rate_limited': 0, 'failed': 0}
+
+    def start(self):
+        """Запуск фонового воркера"""
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._run())
+            logger.info("Очередь исходящих сообщений запущена")
+
+    async def stop(self, drain_timeout: float = 5.0):
+        """Остановка воркера с попыткой досылки очереди"""
+        deadline = time.monotonic() + drain_timeout
+        while self.pending_count() and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+
+        if self._worker:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+        if self._inflight:
+            await asyncio.wait(self._inflight, timeout=max(0.1, deadline - time.monotonic()))
+
+        # Всем, кто еще ждет, возвращаем None
+        for lane in self._lanes:
+            for job in lane:
+                self._resolve(job, None)
+            lane.clear()
+        self._pending_edits.clear()
+
+    def pending_count(self) -> int:
+        return sum(len(lane) for lane in self._lanes)
+
+    async def request(
+        self,
+        method: str,
+        payload: Dict[str, Any],
+        chat_id: Optional[int] = None,
+        priority: int = PRIORITY_INTERACTIVE,
+        coalesce: bool = False,
+    ) -> Optional[dict]:
+        """
+        Поставить запрос в очередь и дождаться ответа Bot API.
+
+        Args:
+            method: Метод Bot API (sendMessage, editMessageText, ...)
+            payload: Тело запроса
+            chat_id: Чат для per-chat лимита (None - только глобальный лимит)
+            priority: PRIORITY_INTERACTIVE или PRIORITY_BULK
+            coalesce: Склеивать с ожидающим редактированием того же сообщения
+
+        Returns:
+            JSON ответа Telegram или None при сетевой ошибке
+        """
+        future = asyncio.get_running_loop().create_future()
+
+        key = None
+        if coalesce and chat_id is not None and 'message_id' in payload:
+            key = (chat_id, payload['message_id'])
+            pending = self._pending_edits.get(key)
+            if pending is not None:
+                # Предыдущее редактирование еще не отправлено - заменяем текст
+                pending.payload = payload
+                pending.waiters.append(future)
+                self.stats['coalesced'] += 1
+                return await future
+
+        job = OutboundJob(
+            method=method,
+            payload=payload,
+            chat_id=chat_id,
+            priority=min(max(priority, 0), len(self._lanes) - 1),
+            coalesce_key=key,
+            waiters=[future],
+        )
+        if key:
+            self._pending_edits[key] = job
+        self._lanes[job.priority].append(job)
+
+        self.start()
+        self._wakeup.set()
+        return await future
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = TokenBucket(self.chat_rate, self.chat_burst)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    def _evict_idle_buckets(self, now: float):
+        """Удаление buckets чатов без активности"""
+        busy = {job.chat_id for lane in self._lanes for job in lane}
+        for chat_id in [c for c, b in self._chat_buckets.items() if c not in busy and b.is_idle(now)]:
+            del self._chat_buckets[chat_id]
+
+    def _next_job(self) -> Tuple[Optional[OutboundJob], Optional[float]]:
+        """
+        Выбрать следующий запрос для отправки.
+
+        Returns:
+            (job, None) если можно отправлять, иначе (None, секунд до следующей попытки)
+        """
+        if not self.pending_count():
+            return None, None
+
+        now = time.monotonic()
+        global_wait = self.global_bucket.wait_time(now)
+        if global_wait > 0:
+            return None, global_wait
+
+        if len(self._chat_buckets) > 1000:
+            self._evict_idle_buckets(now)
+
+        min_wait = None
+        for lane in self._lanes:
+            throttled = set()
+            for index, job in enumerate(lane):
+                if job.chat_id is not None:
+                    if job.chat_id in throttled:
+                        continue
+                    wait = self._chat_bucket(job.chat_id).wait_time(now)
+                    if wait > 0:
+                        throttled.add(job.chat_id)
+                        min_wait = wait if min_wait is None else min(min_wait, wait)
+                        continue
+                    self._chat_bucket(job.chat_id).consume(now)
+
+                del lane[index]
+                self.global_bucket.consume(now)
+                if job.coalesce_key and self._pending_edits.get(job.coalesce_key) is job:
+                    del self._pending_edits[job.coalesce_key]
+                return job, None
+
+        return None, min_wait
+
+    async def _run(self):
+        """Основной цикл планировщика"""
+        while True:
+            self._wakeup.clear()
+            job, delay = self._next_job()
+
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            task = asyncio.create_task(self._deliver(job))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _deliver(self, job: OutboundJob):
+        """Отправка запроса с обработкой 429"""
+        url = f"{self.base_url}/{job.method}"
+
+        try:
+            async with self.session.post(url, json=job.payload) as response:
+                result = await response.json(content_type=None)
+        except Exception as e:
+            logger.error(f"Исключение при запросе {job.method}: {e}")
+            self.stats['failed'] += 1
+            self._resolve(job, None)
+            return
+
+        if not result.get('ok') and result.get('error_code') == 429:
+            retry_after = result.get('parameters', {}).get('retry_after', 1)
+            self.stats['rate_limited'] += 1
+            job.attempts += 1
+
+            if job.attempts <= self.max_retries:
+                logger.warning(
+                    f"429 от Telegram для чата {job.chat_id}, повтор через {retry_after}s "
+                    f"(попытка {job.attempts}/{self.max_retries})"
+                )
+                if job.chat_id is not None:
+                    self._chat_bucket(job.chat_id).block(retry_after)
+                else:
+                    self.global_bucket.block(retry_after)
+                self._lanes[job.priority].insert(0, job)
+                self._wakeup.set()
+                return
+
+        if result.get('ok'):
+            self.stats['sent'] += 1
+        else:
+            self.stats['failed'] += 1
+        self._resolve(job, result)
+
+    @staticmethod
+    def _resolve(job: OutboundJob, result: Optional[dict]):
+        for waiter in job.waiters:
+            if not waiter.done():
+                waiter.set_result(result)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика очереди"""
+        return {
+            **self.stats,
+            'pending_interactive': len(self._lanes[PRIORITY_INTERACTIVE]),
+            'pending_bulk': len(self._lanes[PRIORITY_BULK]),
+            'in_flight': len(self._inflight),
+            'tracked_chats': len(self._chat_buckets),
+        }
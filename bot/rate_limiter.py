@@ -0,0 +1,160 @@
+"""
+Общий лимитер запросов со скользящим окном
+
+Один экземпляр на бота для всех обработчиков. Каждый запрос имеет вес:
+аудио дороже текста и дорожает с длительностью. На пользователя хранится
+deque событий окна и текущая сумма весов, поэтому проверка - O(1)
+амортизированно (истекшие события снимаются с головы очереди), без
+пересборки списков на каждый вызов. Опционально действует глобальный лимит
+на все запросы бота; окна ушедших пользователей удаляет evict_idle.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Вес запроса по типу (лимит пользователя задается в тех же единицах)
+FEATURE_COSTS: Dict[str, float] = {
+    'text': 1.0,
+    'url': 1.0,
+    'photo': 2.0,
+    'document': 2.0,
+    'audio': 1.0,
+}
+# Надбавка за минуту аудио: час записи весит 1 + 6 = 7 текстов
+AUDIO_COST_PER_MINUTE = 0.1
+# Названия типов запросов в сообщениях пользователю
+FEATURE_NAMES: Dict[str, str] = {
+    'text': 'текст',
+    'url': 'ссылка',
+    'photo': 'фото',
+    'document': 'документ',
+    'audio': 'аудио',
+}
+
+
+class _Window:
+    """События окна (время, вес) и их сумма"""
+    __slots__ = ('events', 'used')
+
+    def __init__(self):
+        self.events: Deque[Tuple[float, float]] = deque()
+        self.used = 0.0
+
+    def expire(self, cutoff: float):
+        events = self.events
+        while events and events[0][0] <= cutoff:
+            self.used -= events.popleft()[1]
+        if not events:
+            # Сбрасываем накопленную ошибку округления
+            self.used = 0.0
+
+    def add(self, now: float, cost: float):
+        self.events.append((now, cost))
+        self.used += cost
+
+
+class SlidingWindowRateLimiter:
+    """
+    Лимит суммарного веса запросов за скользящее окно
+
+    Args:
+        capacity: Вес, доступный пользователю за окно
+        window: Длина окна в секундах
+        global_capacity: Вес за окно на весь бот (0 - без глобального лимита)
+        costs: Веса по типам запросов (по умолчанию FEATURE_COSTS)
+    """
+
+    def __init__(self, capacity: float = 10, window: float = 60.0,
+                 global_capacity: float = 0, costs: Optional[Dict[str, float]] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.capacity = capacity
+        self.window = window
+        self.global_capacity = global_capacity
+        self.costs = dict(FEATURE_COSTS, **(costs or {}))
+        self._clock = clock
+        self._users: Dict[int, _Window] = {}
+        self._global = _Window()
+        self._lock = threading.Lock()
+        self._allowed = 0
+        self._rejected_user = 0
+        self._rejected_global = 0
+
+    def describe(self) -> str:
+        """Лимит для сообщения пользователю: бюджет окна и веса запросов"""
+        weights = ', '.join(
+            f"{FEATURE_NAMES.get(feature, feature)} — {cost:g}"
+            + (f" + {AUDIO_COST_PER_MINUTE:g} за минуту записи" if feature == 'audio' else '')
+            for feature, cost in self.costs.items()
+        )
+        return f"Лимит: {self.capacity:g} единиц за {self.window:g} с ({weights})."
+
+    def cost(self, feature: str, duration_sec: float = 0) -> float:
+        """Вес запроса; не больше лимита пользователя, иначе он не пройдет никогда"""
+        cost = self.costs.get(feature, 1.0)
+        if feature == 'audio' and duration_sec:
+            cost += duration_sec / 60 * AUDIO_COST_PER_MINUTE
+        return min(cost, self.capacity)
+
+    def try_acquire(self, user_id: int, feature: str = 'text', duration_sec: float = 0) -> bool:
+        """Учесть запрос, если он укладывается в лимиты; иначе вернуть False"""
+        cost = self.cost(feature, duration_sec)
+        with self._lock:
+            now = self._clock()
+            cutoff = now - self.window
+            window = self._users.get(user_id)
+            if window is None:
+                window = self._users[user_id] = _Window()
+            window.expire(cutoff)
+
+            if window.used + cost > self.capacity:
+                self._rejected_user += 1
+                return False
+
+            if self.global_capacity:
+                self._global.expire(cutoff)
+                if self._global.used + cost > self.global_capacity:
+                    self._rejected_global += 1
+                    logger.warning(f"Глобальный лимит запросов исчерпан ({self._global.used:.1f})")
+                    return False
+                self._global.add(now, cost)
+
+            window.add(now, cost)
+            self._allowed += 1
+            return True
+
+    def evict_idle(self) -> int:
+        """Удалить окна пользователей без событий в текущем окне"""
+        with self._lock:
+            cutoff = self._clock() - self.window
+            idle = []
+            for user_id, window in self._users.items():
+                window.expire(cutoff)
+                if not window.events:
+                    idle.append(user_id)
+            for user_id in idle:
+                del self._users[user_id]
+            return len(idle)
+
+    def get_stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                'users': len(self._users),
+                'allowed': self._allowed,
+                'rejected_user': self._rejected_user,
+                'rejected_global': self._rejected_global,
+                'global_used': round(self._global.used, 2),
+            }
+
+
+def create_rate_limiter(config=None) -> SlidingWindowRateLimiter:
+    """Лимитер по настройкам MAX_REQUESTS_PER_MINUTE, RATE_LIMIT_WINDOW_SECONDS, GLOBAL_REQUESTS_PER_MINUTE"""
+    return SlidingWindowRateLimiter(
+        capacity=getattr(config, 'MAX_REQUESTS_PER_MINUTE', 10),
+        window=getattr(config, 'RATE_LIMIT_WINDOW_SECONDS', 60),
+        global_capacity=getattr(config, 'GLOBAL_REQUESTS_PER_MINUTE', 0),
+    )
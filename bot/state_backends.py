@@ -0,0 +1,260 @@
+"""
+Бэкенды StateManager: версионированные записи состояния пользователей.
+
+Каждая запись - (version, payload, last_activity). Запись выполняется
+через compare_and_set: новая версия сохраняется, только если версия
+в хранилище не изменилась с момента чтения (оптимистичная блокировка),
+поэтому параллельные реплики не затирают изменения друг друга.
+"""
+
+import logging
+import sqlite3
+import threading
+from typing import Iterator, List, Optional, Tuple
+
+from bot.state_store import BoundedStore
+
+logger = logging.getLogger(__name__)
+
+# (version, payload, last_activity)
+StateRecord = Tuple[int, bytes, float]
+
+
+class StateBackend:
+    """
+    Интерфейс хранилища состояний.
+
+    Версия отсутствующей записи - 0; каждая успешная запись увеличивает ее на 1.
+    """
+
+    def load(self, user_id: int) -> Optional[StateRecord]:
+        raise NotImplementedError
+
+    def compare_and_set(self, user_id: int, expected_version: int, payload: bytes,
+                        last_activity: float) -> Optional[int]:
+        """Записать, если версия совпадает. Возвращает новую версию или None при конфликте."""
+        raise NotImplementedError
+
+    def delete(self, user_id: int) -> bool:
+        raise NotImplementedError
+
+    def user_ids(self) -> List[int]:
+        raise NotImplementedError
+
+    def iter_batches(self, batch_size: int = 500) -> Iterator[List[Tuple[int, bytes]]]:
+        """Все записи пачками (user_id, payload)"""
+        raise NotImplementedError
+
+    def delete_inactive(self, cutoff: float, batch_size: int = 500) -> int:
+        """Удалить записи с last_activity < cutoff пачками по batch_size"""
+        raise NotImplementedError
+
+
+class MemoryStateBackend(StateBackend):
+    """Хранение в процессе поверх BoundedStore (LRU + TTL)"""
+
+    def __init__(self, max_users: int = 10000, ttl_seconds: Optional[float] = 86400):
+        self._records = BoundedStore('user_state', max_entries=max_users, ttl=ttl_seconds)
+        self._lock = threading.Lock()
+
+    def load(self, user_id: int) -> Optional[StateRecord]:
+        return self._records.get(user_id)
+
+    def compare_and_set(self, user_id: int, expected_version: int, payload: bytes,
+                        last_activity: float) -> Optional[int]:
+        with self._lock:
+            current = self._records.get(user_id)
+            if (current[0] if current else 0) != expected_version:
+                return None
+            self._records[user_id] = (expected_version + 1, payload, last_activity)
+            return expected_version + 1
+
+    def delete(self, user_id: int) -> bool:
+        return self._records.pop(user_id, None) is not None
+
+    def user_ids(self) -> List[int]:
+        return list(self._records)
+
+    def iter_batches(self, batch_size: int = 500) -> Iterator[List[Tuple[int, bytes]]]:
+        items = [(user_id, record[1]) for user_id, record in self._records.items()]
+        for start in range(0, len(items), batch_size):
+            yield items[start:start + batch_size]
+
+    def delete_inactive(self, cutoff: float, batch_size: int = 500) -> int:
+        stale = [user_id for user_id, record in self._records.items() if record[2] < cutoff]
+        with self._lock:
+            for user_id in stale:
+                self._records.pop(user_id, None)
+        return len(stale)
+
+
+class SQLiteStateBackend(StateBackend):
+    """Общий файл SQLite для нескольких процессов на одной машине/томе"""
+
+    def __init__(self, db_path: str = "bot_state.db"):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS user_state (
+                user_id INTEGER PRIMARY KEY,
+                version INTEGER NOT NULL,
+                payload BLOB NOT NULL,
+                last_activity REAL NOT NULL
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_user_state_activity ON user_state(last_activity)"
+        )
+
+    def load(self, user_id: int) -> Optional[StateRecord]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT version, payload, last_activity FROM user_state WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        return (row[0], bytes(row[1]), row[2]) if row else None
+
+    def compare_and_set(self, user_id: int, expected_version: int, payload: bytes,
+                        last_activity: float) -> Optional[int]:
+        with self._lock:
+            if expected_version == 0:
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO user_state (user_id, version, payload, last_activity) "
+                    "VALUES (?, 1, ?, ?)",
+                    (user_id, payload, last_activity)
+                )
+            else:
+                cursor = self._conn.execute(
+                    "UPDATE user_state SET version = version + 1, payload = ?, last_activity = ? "
+                    "WHERE user_id = ? AND version = ?",
+                    (payload, last_activity, user_id, expected_version)
+                )
+        return expected_version + 1 if cursor.rowcount == 1 else None
+
+    def delete(self, user_id: int) -> bool:
+        with self._lock:
+            return self._conn.execute(
+                "DELETE FROM user_state WHERE user_id = ?", (user_id,)
+            ).rowcount > 0
+
+    def user_ids(self) -> List[int]:
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT user_id FROM user_state")]
+
+    def iter_batches(self, batch_size: int = 500) -> Iterator[List[Tuple[int, bytes]]]:
+        last_id = None
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT user_id, payload FROM user_state WHERE ? IS NULL OR user_id > ? "
+                    "ORDER BY user_id LIMIT ?",
+                    (last_id, last_id, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            yield [(row[0], bytes(row[1])) for row in rows]
+            last_id = rows[-1][0]
+
+    def delete_inactive(self, cutoff: float, batch_size: int = 500) -> int:
+        removed = 0
+        while True:
+            # Короткие транзакции: блокировка файла не держится на всей очистке
+            with self._lock:
+                deleted = self._conn.execute(
+                    "DELETE FROM user_state WHERE user_id IN ("
+                    "SELECT user_id FROM user_state WHERE last_activity < ? LIMIT ?)",
+                    (cutoff, batch_size)
+                ).rowcount
+            removed += deleted
+            if deleted < batch_size:
+                return removed
+
+
+class RedisStateBackend(StateBackend):
+    """
+    Redis-совместимый сервер: запись - хеш {v, p}, время активности -
+    в отсортированном множестве (для очистки пачками без SCAN по всем ключам).
+    """
+
+    def __init__(self, url: str = "redis://localhost:6379/0", prefix: str = "bot"):
+        import redis  # Опциональная зависимость: нужна только для STATE_BACKEND=redis
+
+        self._watch_error = redis.WatchError
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.activity_key = f"{prefix}:user_state:activity"
+
+    def _key(self, user_id: int) -> str:
+        return f"{self.prefix}:user_state:{user_id}"
+
+    def load(self, user_id: int) -> Optional[StateRecord]:
+        pipe = self.client.pipeline()
+        pipe.hmget(self._key(user_id), 'v', 'p')
+        pipe.zscore(self.activity_key, user_id)
+        (version, payload), last_activity = pipe.execute()
+        if version is None:
+            return None
+        return int(version), payload, last_activity or 0.0
+
+    def compare_and_set(self, user_id: int, expected_version: int, payload: bytes,
+                        last_activity: float) -> Optional[int]:
+        key = self._key(user_id)
+        with self.client.pipeline() as pipe:
+            try:
+                pipe.watch(key)
+                current = pipe.hget(key, 'v')
+                if (int(current) if current is not None else 0) != expected_version:
+                    pipe.unwatch()
+                    return None
+                pipe.multi()
+                pipe.hset(key, mapping={'v': expected_version + 1, 'p': payload})
+                pipe.zadd(self.activity_key, {user_id: last_activity})
+                pipe.execute()
+                return expected_version + 1
+            except self._watch_error:
+                return None
+
+    def delete(self, user_id: int) -> bool:
+        pipe = self.client.pipeline()
+        pipe.delete(self._key(user_id))
+        pipe.zrem(self.activity_key, user_id)
+        return bool(pipe.execute()[0])
+
+    def user_ids(self) -> List[int]:
+        return [int(user_id) for user_id in self.client.zrange(self.activity_key, 0, -1)]
+
+    def iter_batches(self, batch_size: int = 500) -> Iterator[List[Tuple[int, bytes]]]:
+        user_ids = self.user_ids()
+        for start in range(0, len(user_ids), batch_size):
+            batch = user_ids[start:start + batch_size]
+            pipe = self.client.pipeline()
+            for user_id in batch:
+                pipe.hget(self._key(user_id), 'p')
+            yield [(uid, payload) for uid, payload in zip(batch, pipe.execute()) if payload is not None]
+
+    def delete_inactive(self, cutoff: float, batch_size: int = 500) -> int:
+        removed = 0
+        while True:
+            stale = self.client.zrangebyscore(self.activity_key, '-inf', f"({cutoff}", start=0, num=batch_size)
+            if not stale:
+                return removed
+            pipe = self.client.pipeline()
+            pipe.delete(*[self._key(int(user_id)) for user_id in stale])
+            pipe.zrem(self.activity_key, *stale)
+            pipe.execute()
+            removed += len(stale)
+
+
+def create_state_backend(config=None) -> StateBackend:
+    """Бэкенд StateManager по STATE_BACKEND (memory | sqlite | redis)"""
+    kind = getattr(config, 'STATE_BACKEND', 'memory')
+    if kind == 'sqlite':
+        return SQLiteStateBackend(getattr(config, 'STATE_SQLITE_PATH', 'bot_state.db'))
+    if kind == 'redis':
+        return RedisStateBackend(getattr(config, 'STATE_REDIS_URL', 'redis://localhost:6379/0'))
+    return MemoryStateBackend(
+        max_users=getattr(config, 'STATE_MAX_USERS', 10000),
+        ttl_seconds=getattr(config, 'STATE_TTL_SECONDS', 86400),
+    )
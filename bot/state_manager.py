@@ -3,13 +3,24 @@
 
 Централизованное хранение и управление состояниями пользователей,
 заменяет разрозненные словари user_states, user_settings, user_messages_buffer.
+
+Состояния хранятся в StateBackend (память, SQLite или Redis) в компактном
+позиционном JSON и пишутся с оптимистичной проверкой версии, поэтому
+несколько реплик бота могут работать с общим хранилищем.
 """
 
+import json
+import logging
+import time
 from dataclasses import dataclass, field
 from enum import Enum
-from typing import Dict, Optional, List, Any
+from typing import Callable, Dict, Optional, List, Any
 from datetime import datetime
 
+from bot.state_backends import MemoryStateBackend, StateBackend
+
+logger = logging.getLogger(__name__)
+
 
 class UserStep(Enum):
     """Перечисление шагов пользовательского взаимодействия."""
@@ -19,7 +30,7 @@ class UserStep(Enum):
     FORMAT_SELECTION = "format_selection"
 
 
-@dataclass
+@dataclass(slots=True)
 class UserState:
     """
     Состояние одного пользователя.
@@ -31,6 +42,7 @@ class UserState:
         smart_mode: Включен ли режим умной суммаризации
         messages_buffer: Буфер сообщений для объединения
         last_activity: Время последней активности
+        version: Версия записи в хранилище (для оптимистичной блокировки)
     """
     step: UserStep = UserStep.IDLE
     compression: Optional[str] = "30"
@@ -38,6 +50,7 @@ class UserState:
     smart_mode: bool = True
     messages_buffer: List[Dict[str, Any]] = field(default_factory=list)
     last_activity: datetime = field(default_factory=datetime.now)
+    version: int = field(default=0, compare=False, repr=False)
 
     def reset(self):
         """Сброс состояния пользователя к начальному."""
@@ -53,17 +66,63 @@ class UserState:
         self.last_activity = datetime.now()
 
 
+
+class StateConflict(Exception):
+    """Состояние изменено другим процессом после чтения"""
+
+
+def dump_state(state: UserState) -> bytes:
+    """Компактная сериализация: позиционный JSON без имен полей"""
+    return json.dumps(
+        [state.step.value, state.compression, state.format, int(state.smart_mode),
+         state.messages_buffer, round(state.last_activity.timestamp(), 3)],
+        ensure_ascii=False, separators=(',', ':'), default=str
+    ).encode('utf-8')
+
+
+def load_state(payload: bytes, version: int = 0) -> UserState:
+    """Обратная операция к dump_state"""
+    step, compression, format_type, smart_mode, buffer, last_activity = json.loads(payload)
+    return UserState(
+        step=UserStep(step),
+        compression=compression,
+        format=format_type,
+        smart_mode=bool(smart_mode),
+        messages_buffer=buffer,
+        last_activity=datetime.fromtimestamp(last_activity),
+        version=version,
+    )
+
+
 class StateManager:
     """
     Менеджер состояний пользователей.
 
     Централизованное управление состояниями всех пользователей бота.
     Заменяет три разных словаря на один унифицированный интерфейс.
+
+    get_state возвращает копию из хранилища; изменения сохраняются через
+    save_state (с проверкой версии) или update_state (с повтором при конфликте).
     """
 
-    def __init__(self):
-        """Инициализация менеджера состояний."""
-        self._states: Dict[int, UserState] = {}
+    def __init__(self, backend: Optional[StateBackend] = None,
+                 max_users: int = 10000, ttl_seconds: Optional[float] = 86400):
+        """
+        Инициализация менеджера состояний.
+
+        Args:
+            backend: Хранилище состояний (по умолчанию - в памяти процесса)
+            max_users: Максимум хранимых состояний для бэкенда в памяти
+            ttl_seconds: Время жизни состояния без обращений для бэкенда в памяти
+        """
+        self.backend = backend or MemoryStateBackend(max_users=max_users, ttl_seconds=ttl_seconds)
+
+    def _load(self, user_id: int) -> Optional[UserState]:
+        record = self.backend.load(user_id)
+        if record is None:
+            return None
+        version, payload, _ = record
+        return load_state(payload, version)
 
     def get_state(self, user_id: int) -> UserState:
         """
@@ -77,12 +136,49 @@ class StateManager:
         Returns:
             Объект UserState с текущим состоянием пользователя
         """
-        if user_id not in self._states:
-            self._states[user_id] = UserState()
-
         # Обновляем время активности
-        self._states[user_id].update_activity()
-        return self._states[user_id]
+        return self.update_state(user_id, lambda state: None)
+
+    def save_state(self, user_id: int, state: UserState) -> UserState:
+        """
+        Сохранить состояние, прочитанное через get_state.
+
+        Raises:
+            StateConflict: если состояние успели изменить после чтения
+        """
+        state.update_activity()
+        version = self.backend.compare_and_set(
+            user_id, state.version, dump_state(state), state.last_activity.timestamp()
+        )
+        if version is None:
+            raise StateConflict(f"Состояние пользователя {user_id} изменено параллельно")
+        state.version = version
+        return state
+
+    def update_state(self, user_id: int, mutator: Callable[[UserState], Any],
+                     retries: int = 3) -> UserState:
+        """
+        Прочитать, изменить и сохранить состояние.
+
+        При конфликте версий mutator применяется заново к свежему состоянию.
+
+        Args:
+            user_id: ID пользователя в Telegram
+            mutator: Функция, изменяющая UserState на месте
+            retries: Число повторов при конфликте
+
+        Returns:
+            Сохраненное состояние
+        """
+        for attempt in range(retries + 1):
+            state = self._load(user_id) or UserState()
+            mutator(state)
+            try:
+                return self.save_state(user_id, state)
+            except StateConflict:
+                if attempt == retries:
+                    raise
+                logger.debug(f"Конфликт версий состояния {user_id}, повтор {attempt + 1}")
 
     def clear_state(self, user_id: int) -> bool:
         """
@@ -94,10 +190,7 @@ class StateManager:
         Returns:
             True если состояние было удалено, False если его не было
         """
-        if user_id in self._states:
-            del self._states[user_id]
-            return True
-        return False
+        return self.backend.delete(user_id)
 
     def reset_state(self, user_id: int):
         """
@@ -109,10 +202,7 @@ class StateManager:
         Args:
             user_id: ID пользователя в Telegram
         """
-        if user_id in self._states:
-            self._states[user_id].reset()
-        else:
-            self._states[user_id] = UserState()
+        self.update_state(user_id, UserState.reset)
 
     def has_state(self, user_id: int) -> bool:
         """
@@ -124,7 +214,7 @@ class StateManager:
         Returns:
             True если состояние существует
         """
-        return user_id in self._states
+        return self.backend.load(user_id) is not None
 
     def get_all_user_ids(self) -> List[int]:
         """
@@ -133,34 +223,25 @@ class StateManager:
         Returns:
             Список ID пользователей
         """
-        return list(self._states.keys())
+        return self.backend.user_ids()
 
-    def cleanup_inactive(self, max_age_hours: int = 24) -> int:
+    def cleanup_inactive(self, max_age_hours: float = 24, batch_size: int = 500) -> int:
         """
         Очистить неактивные состояния.
 
         Удаляет состояния пользователей, которые не проявляли
-        активность более max_age_hours часов.
+        активность более max_age_hours часов. Удаление идет пачками
+        по batch_size, не блокируя хранилище на всю очистку.
 
         Args:
             max_age_hours: Максимальный возраст неактивных состояний в часах
+            batch_size: Размер пачки удаления
 
         Returns:
             Количество удаленных состояний
         """
-        from datetime import timedelta
-
-        now = datetime.now()
-        to_remove = []
-
-        for user_id, state in self._states.items():
-            if (now - state.last_activity) > timedelta(hours=max_age_hours):
-                to_remove.append(user_id)
-
-        for user_id in to_remove:
-            del self._states[user_id]
-
-        return len(to_remove)
+        cutoff = time.time() - max_age_hours * 3600
+        return self.backend.delete_inactive(cutoff, batch_size=batch_size)
 
     def get_stats(self) -> Dict[str, Any]:
         """
@@ -169,14 +250,17 @@ class StateManager:
         Returns:
             Словарь со статистикой
         """
-        total_users = len(self._states)
-
+        total_users = 0
         step_counts = {}
-        for state in self._states.values():
-            step_name = state.step.value
-            step_counts[step_name] = step_counts.get(step_name, 0) + 1
-
-        smart_mode_count = sum(1 for s in self._states.values() if s.smart_mode)
+        smart_mode_count = 0
+
+        for batch in self.backend.iter_batches():
+            for _, payload in batch:
+                # Позиционный формат dump_state: [step, compression, format, smart_mode, ...]
+                record = json.loads(payload)
+                total_users += 1
+                step_counts[record[0]] = step_counts.get(record[0], 0) + 1
+                smart_mode_count += record[3]
 
         return {
             'total_users': total_users,
@@ -0,0 +1,471 @@
+"""
+Ограниченные хранилища состояния пользователей.
+
+Заменяют неограниченные словари вида {user_id: ...}: размер ограничен
+числом записей и объемом (LRU вытеснение), записи истекают по TTL,
+для каждой записи ведется приблизительный учет памяти. Хранилище может
+работать в процессе (живые объекты) или поверх общего бэкенда (SQLite,
+Redis-совместимый сервер), чтобы несколько реплик видели одно состояние.
+"""
+
+import json
+import logging
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_size(value: Any, _depth: int = 0) -> int:
+    """Приблизительный размер значения в байтах (контейнеры - рекурсивно)"""
+    size = sys.getsizeof(value)
+    if _depth >= 4:
+        return size
+    if isinstance(value, dict):
+        size += sum(estimate_size(k, _depth + 1) + estimate_size(v, _depth + 1) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(v, _depth + 1) for v in value)
+    elif hasattr(value, '__dict__'):
+        size += estimate_size(vars(value), _depth + 1)
+    elif hasattr(value, '__slots__'):
+        size += sum(estimate_size(getattr(value, name, None), _depth + 1) for name in value.__slots__)
+    return size
+
+
+class StoreBackend:
+    """
+    Общий бэкенд хранилищ: значения - сериализованные байты.
+
+    Реализации обязаны соблюдать TTL при чтении (get с ttl продлевает его);
+    sweep удаляет истекшие записи и урезает пространство имен до лимитов
+    по давности доступа.
+    """
+
+    def get(self, namespace: str, key: str, ttl: Optional[float] = None) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def set(self, namespace: str, key: str, value: bytes, ttl: Optional[float]):
+        raise NotImplementedError
+
+    def delete(self, namespace: str, key: str) -> bool:
+        raise NotImplementedError
+
+    def keys(self, namespace: str) -> List[str]:
+        raise NotImplementedError
+
+    def sweep(self, namespace: str, max_entries: Optional[int] = None,
+              max_bytes: Optional[int] = None) -> int:
+        raise NotImplementedError
+
+    def usage(self, namespace: str) -> Dict[str, int]:
+        raise NotImplementedError
+
+
+class SQLiteStoreBackend(StoreBackend):
+    """Бэкенд на общем файле SQLite (несколько процессов на одной машине/томе)"""
+
+    def __init__(self, db_path: str = "bot_state.db"):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS state_store (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_state_store_access ON state_store(namespace, accessed_at)"
+        )
+
+    def get(self, namespace: str, key: str, ttl: Optional[float] = None) -> Optional[bytes]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM state_store WHERE namespace = ? AND key = ?",
+                (namespace, key)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] is not None and row[1] <= now:
+                self._conn.execute(
+                    "DELETE FROM state_store WHERE namespace = ? AND key = ?", (namespace, key)
+                )
+                return None
+            self._conn.execute(
+                "UPDATE state_store SET accessed_at = ?, expires_at = COALESCE(?, expires_at) "
+                "WHERE namespace = ? AND key = ?",
+                (now, now + ttl if ttl else None, namespace, key)
+            )
+            return row[0]
+
+    def set(self, namespace: str, key: str, value: bytes, ttl: Optional[float]):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO state_store (namespace, key, value, size, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (namespace, key, value, len(value), now + ttl if ttl else None, now)
+            )
+
+    def delete(self, namespace: str, key: str) -> bool:
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM state_store WHERE namespace = ? AND key = ?", (namespace, key)
+            )
+            return cursor.rowcount > 0
+
+    def keys(self, namespace: str) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key FROM state_store WHERE namespace = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (namespace, time.time())
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def sweep(self, namespace: str, max_entries: Optional[int] = None,
+              max_bytes: Optional[int] = None) -> int:
+        with self._lock:
+            removed = self._conn.execute(
+                "DELETE FROM state_store WHERE namespace = ? AND expires_at <= ?",
+                (namespace, time.time())
+            ).rowcount
+
+            if not max_entries and not max_bytes:
+                return removed
+
+            # Оставляем самые свежие записи в пределах лимитов
+            rows = self._conn.execute(
+                "SELECT key, size FROM state_store WHERE namespace = ? ORDER BY accessed_at DESC",
+                (namespace,)
+            ).fetchall()
+            total = 0
+            stale = []
+            for i, (key, size) in enumerate(rows):
+                total += size
+                if (max_entries and i >= max_entries) or (max_bytes and total > max_bytes and i > 0):
+                    stale.append((namespace, key))
+            if stale:
+                self._conn.executemany(
+                    "DELETE FROM state_store WHERE namespace = ? AND key = ?", stale
+                )
+            return removed + len(stale)
+
+    def usage(self, namespace: str) -> Dict[str, int]:
+        with self._lock:
+            count, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM state_store WHERE namespace = ?",
+                (namespace,)
+            ).fetchone()
+        return {'entries': count, 'bytes': size}
+
+
+class RedisStoreBackend(StoreBackend):
+    """
+    Бэкенд на Redis-совместимом сервере (Redis, KeyDB, Dragonfly и т.п.).
+
+    TTL выполняет сам сервер; лимит объема задается политикой сервера
+    (maxmemory + allkeys-lru), sweep урезает только число записей.
+    """
+
+    def __init__(self, url: str = "redis://localhost:6379/0", prefix: str = "bot"):
+        import redis  # Опциональная зависимость: нужна только для STATE_BACKEND=redis
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def _key(self, namespace: str, key: str) -> str:
+        return f"{self.prefix}:{namespace}:{key}"
+
+    def get(self, namespace: str, key: str, ttl: Optional[float] = None) -> Optional[bytes]:
+        if not ttl:
+            return self.client.get(self._key(namespace, key))
+        pipe = self.client.pipeline()
+        pipe.get(self._key(namespace, key))
+        pipe.pexpire(self._key(namespace, key), int(ttl * 1000))
+        return pipe.execute()[0]
+
+    def set(self, namespace: str, key: str, value: bytes, ttl: Optional[float]):
+        self.client.set(self._key(namespace, key), value, px=int(ttl * 1000) if ttl else None)
+
+    def delete(self, namespace: str, key: str) -> bool:
+        return bool(self.client.delete(self._key(namespace, key)))
+
+    def keys(self, namespace: str) -> List[str]:
+        start = len(self._key(namespace, ""))
+        return [
+            raw.decode()[start:]
+            for raw in self.client.scan_iter(match=self._key(namespace, "*"), count=500)
+        ]
+
+    def sweep(self, namespace: str, max_entries: Optional[int] = None,
+              max_bytes: Optional[int] = None) -> int:
+        if not max_entries:
+            return 0
+        keys = [self._key(namespace, key) for key in self.keys(namespace)]
+        if len(keys) <= max_entries:
+            return 0
+        pipe = self.client.pipeline()
+        for key in keys:
+            pipe.object("idletime", key)
+        idle = pipe.execute()
+        # Удаляем самые давно не использованные записи сверх лимита
+        stale = [key for _, key in sorted(zip(idle, keys), key=lambda item: item[0] or 0)[max_entries:]]
+        return self.client.delete(*stale) if stale else 0
+
+    def usage(self, namespace: str) -> Dict[str, int]:
+        keys = [self._key(namespace, key) for key in self.keys(namespace)]
+        pipe = self.client.pipeline()
+        for key in keys:
+            pipe.strlen(key)
+        return {'entries': len(keys), 'bytes': sum(pipe.execute()) if keys else 0}
+
+
+class _Entry:
+    __slots__ = ('value', 'expires_at', 'size')
+
+    def __init__(self, value: Any, expires_at: Optional[float], size: int):
+        self.value = value
+        self.expires_at = expires_at
+        self.size = size
+
+
+class BoundedStore(MutableMapping):
+    """
+    Словарь с ограничением размера (LRU), TTL и учетом памяти.
+
+    Без бэкенда значения хранятся в процессе как живые объекты: изменения
+    вложенных структур видны сразу. С общим бэкендом значения хранятся
+    в JSON, поэтому после изменения вложенного значения его нужно
+    присвоить заново (store[key] = value).
+
+    TTL скользящий: чтение и запись продлевают жизнь записи.
+    """
+
+    def __init__(self, namespace: str, max_entries: int = 10000, ttl: Optional[float] = None,
+                 max_bytes: Optional[int] = None, backend: Optional[StoreBackend] = None):
+        """
+        Args:
+            namespace: Имя хранилища (префикс ключей в общем бэкенде)
+            max_entries: Максимум записей, лишние вытесняются по давности доступа
+            ttl: Время жизни записи без обращений, секунд (None - без истечения)
+            max_bytes: Лимит приблизительного объема значений
+            backend: Общий бэкенд; None - хранение в процессе
+        """
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.backend = backend
+
+        self._entries: "OrderedDict[Any, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self._counters = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0}
+
+    # ---- сериализация для общего бэкенда ----
+
+    @staticmethod
+    def _encode_key(key: Any) -> str:
+        return json.dumps(key)
+
+    @staticmethod
+    def _decode_key(raw: str) -> Any:
+        return json.loads(raw)
+
+    @staticmethod
+    def _encode_value(value: Any) -> bytes:
+        # Не-JSON значения (например, datetime) сохраняются строкой
+        return json.dumps(value, ensure_ascii=False, separators=(',', ':'), default=str).encode()
+
+    # ---- локальное хранение ----
+
+    def _expires_at(self) -> Optional[float]:
+        return time.monotonic() + self.ttl if self.ttl else None
+
+    def _drop(self, key: Any, counter: Optional[str] = None):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        if counter:
+            self._counters[counter] += 1
+
+    def _live_entry(self, key: Any) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at is not None and entry.expires_at <= time.monotonic():
+            self._drop(key, 'expirations')
+            return None
+        return entry
+
+    def _evict(self):
+        # Самую свежую запись не вытесняем, даже если она одна больше лимита
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_entries
+            or (self.max_bytes is not None and self._bytes > self.max_bytes)
+        ):
+            self._drop(next(iter(self._entries)), 'evictions')
+
+    # ---- MutableMapping ----
+
+    def __getitem__(self, key: Any) -> Any:
+        if self.backend is not None:
+            raw = self.backend.get(self.namespace, self._encode_key(key), self.ttl)
+            if raw is None:
+                self._counters['misses'] += 1
+                raise KeyError(key)
+            self._counters['hits'] += 1
+            return json.loads(raw)
+
+        with self._lock:
+            entry = self._live_entry(key)
+            if entry is None:
+                self._counters['misses'] += 1
+                raise KeyError(key)
+            self._counters['hits'] += 1
+            entry.expires_at = self._expires_at()
+            self._entries.move_to_end(key)
+            return entry.value
+
+    def __setitem__(self, key: Any, value: Any):
+        if self.backend is not None:
+            self.backend.set(self.namespace, self._encode_key(key), self._encode_value(value), self.ttl)
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            entry = _Entry(value, self._expires_at(), estimate_size(value))
+            self._entries[key] = entry
+            self._bytes += entry.size
+            self._evict()
+
+    def __delitem__(self, key: Any):
+        if self.backend is not None:
+            if not self.backend.delete(self.namespace, self._encode_key(key)):
+                raise KeyError(key)
+            return
+
+        with self._lock:
+            if self._live_entry(key) is None:
+                raise KeyError(key)
+            self._drop(key)
+
+    def __contains__(self, key: Any) -> bool:
+        if self.backend is not None:
+            return self.backend.get(self.namespace, self._encode_key(key)) is not None
+        with self._lock:
+            return self._live_entry(key) is not None
+
+    def __iter__(self) -> Iterator[Any]:
+        if self.backend is not None:
+            return iter([self._decode_key(raw) for raw in self.backend.keys(self.namespace)])
+        with self._lock:
+            self.sweep()
+            return iter(list(self._entries))
+
+    def __len__(self) -> int:
+        if self.backend is not None:
+            return len(self.backend.keys(self.namespace))
+        with self._lock:
+            self.sweep()
+            return len(self._entries)
+
+    def items(self) -> List[tuple]:
+        """Снимок пар (ключ, значение) без продления TTL и изменения порядка LRU"""
+        if self.backend is not None:
+            pairs = []
+            for raw_key in self.backend.keys(self.namespace):
+                raw = self.backend.get(self.namespace, raw_key)
+                if raw is not None:
+                    pairs.append((self._decode_key(raw_key), json.loads(raw)))
+            return pairs
+        with self._lock:
+            self.sweep()
+            return [(key, entry.value) for key, entry in self._entries.items()]
+
+    def values(self) -> List[Any]:
+        return [value for _, value in self.items()]
+
+    # ---- обслуживание ----
+
+    def sweep(self) -> int:
+        """Удалить истекшие записи и урезать хранилище до лимитов"""
+        if self.backend is not None:
+            removed = self.backend.sweep(self.namespace, self.max_entries, self.max_bytes)
+            self._counters['expirations'] += removed
+            return removed
+
+        with self._lock:
+            now = time.monotonic()
+            expired = [k for k, e in self._entries.items() if e.expires_at is not None and e.expires_at <= now]
+            for key in expired:
+                self._drop(key, 'expirations')
+            self._evict()
+            return len(expired)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Размер, объем и счетчики попаданий/вытеснений"""
+        if self.backend is not None:
+            usage = self.backend.usage(self.namespace)
+        else:
+            with self._lock:
+                usage = {'entries': len(self._entries), 'bytes': self._bytes}
+        return {
+            'namespace': self.namespace,
+            'backend': type(self.backend).__name__ if self.backend else 'memory',
+            **usage,
+            'max_entries': self.max_entries,
+            'max_bytes': self.max_bytes,
+            **self._counters,
+        }
+
+
+_backends: Dict[str, StoreBackend] = {}
+_backends_lock = threading.Lock()
+
+
+def get_store_backend(config=None) -> Optional[StoreBackend]:
+    """Общий бэкенд процесса по STATE_BACKEND (memory | sqlite | redis)"""
+    kind = getattr(config, 'STATE_BACKEND', 'memory')
+    if kind not in ('sqlite', 'redis'):
+        return None
+
+    with _backends_lock:
+        if kind not in _backends:
+            if kind == 'sqlite':
+                _backends[kind] = SQLiteStoreBackend(getattr(config, 'STATE_SQLITE_PATH', 'bot_state.db'))
+            else:
+                _backends[kind] = RedisStoreBackend(getattr(config, 'STATE_REDIS_URL', 'redis://localhost:6379/0'))
+            logger.info(f"Хранилище состояния: {kind}")
+        return _backends[kind]
+
+
+def create_store(namespace: str, config=None, max_entries: Optional[int] = None,
+                 ttl: Optional[float] = None, max_bytes: Optional[int] = None,
+                 shared: bool = True) -> BoundedStore:
+    """
+    Создать хранилище с лимитами из конфигурации
+
+    Args:
+        shared: False - всегда в процессе (живые объекты, без общего бэкенда)
+    """
+    return BoundedStore(
+        namespace,
+        max_entries=max_entries or getattr(config, 'STATE_MAX_USERS', 10000),
+        ttl=ttl if ttl is not None else getattr(config, 'STATE_TTL_SECONDS', 86400),
+        max_bytes=max_bytes,
+        backend=get_store_backend(config) if shared else None,
+    )
@@ -80,7 +80,7 @@ class UIComponents:
         return {"inline_keyboard": buttons}
 
     @staticmethod
-    def summary_actions(user_id: int, summary_id: Optional[str] = None) -> Dict:
+    def summary_actions(user_id: int, summary_id: Optional[str] = None, llm_upgrade: bool = False) -> Dict:
         """Панель быстрых действий после саммари"""
         sid = summary_id or "current"
 
@@ -100,8 +100,15 @@ class UIComponents:
                 ]
             ]
         }
+        if llm_upgrade:
+            keyboard["inline_keyboard"].insert(0, UIComponents.llm_upgrade_row(sid))
         return keyboard
 
+    @staticmethod
+    def llm_upgrade_row(summary_id: str) -> List[Dict]:
+        """Кнопка пересоздания быстрого экстрактивного саммари через LLM"""
+        return [{"text": "🤖 Улучшить через ИИ", "callback_data": f"action_llm_{summary_id}"}]
+
     @staticmethod
     def compression_levels(current_level: int = 30, message_id: Optional[int] = None) -> Dict:
         """Кнопки выбора уровня сжатия (используется в текущей версии)"""
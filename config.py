@@ -26,6 +26,27 @@ class Config:
         # Fallback: Groq with Llama 3.3 70B (fast, free, good quality)
         self.GROQ_API_KEY = os.getenv('GROQ_API_KEY', '')
         self.GROQ_LLM_MODEL = os.getenv('GROQ_LLM_MODEL', 'llama-3.3-70b-versatile')
+
+        # Потоковая генерация: ответ появляется постепенно через редактирование сообщения
+        self.LLM_STREAMING = os.getenv('LLM_STREAMING', 'true').lower() == 'true'
+        self.STREAM_EDIT_INTERVAL = float(os.getenv('STREAM_EDIT_INTERVAL', '1.0'))
+
+        # Маршрутизация LLM по задержке: скользящие p50/p95 и hedged-запросы
+        self.LLM_HEDGING = os.getenv('LLM_HEDGING', 'true').lower() == 'true'
+        self.LLM_HEDGE_DELAY = float(os.getenv('LLM_HEDGE_DELAY', '8.0'))  # пока нет статистики p95
+        self.LLM_HEDGE_MIN_DELAY = float(os.getenv('LLM_HEDGE_MIN_DELAY', '1.0'))
+        self.LLM_HEDGE_WORKERS = int(os.getenv('LLM_HEDGE_WORKERS', '8'))  # потоки для основного и резервного запросов
+        self.LLM_LATENCY_WINDOW = int(os.getenv('LLM_LATENCY_WINDOW', '50'))
+        self.LLM_LATENCY_MIN_SAMPLES = int(os.getenv('LLM_LATENCY_MIN_SAMPLES', '5'))
+
+        # Circuit breaker и бюджет квот провайдеров (общие для всех пользователей)
+        self.LLM_BREAKER_FAILURES = int(os.getenv('LLM_BREAKER_FAILURES', '5'))
+        self.LLM_BREAKER_COOLDOWN = float(os.getenv('LLM_BREAKER_COOLDOWN', '30'))
+        self.LLM_BUDGET_WAIT = float(os.getenv('LLM_BUDGET_WAIT', '20'))  # макс. ожидание в очереди квоты
+        self.GEMINI_RPM = int(os.getenv('GEMINI_RPM', '10'))
+        self.GEMINI_TPM = int(os.getenv('GEMINI_TPM', '250000'))
+        self.GROQ_RPM = int(os.getenv('GROQ_RPM', '30'))
+        self.GROQ_TPM = int(os.getenv('GROQ_TPM', '12000'))
         
         # База данных - приоритет Railway PostgreSQL
         self.DATABASE_URL = os.getenv('RAILWAY_DATABASE_URL') or os.getenv('DATABASE_URL', 'sqlite:///bot_database.db')
@@ -49,7 +70,34 @@ class Config:
         self.MAX_TEXT_LENGTH = 10000  # Максимальная длина текста
         self.MIN_TEXT_LENGTH = 50     # Минимальная длина текста
         self.MAX_REQUESTS_PER_MINUTE = 10  # Лимит запросов на пользователя в минуту
-        self.MAX_CHUNK_SIZE = 4000    # Размер чанка для длинных текстов
+        # Окно лимитера и общий лимит бота в тех же весах (0 - без общего лимита)
+        self.RATE_LIMIT_WINDOW_SECONDS = int(os.getenv('RATE_LIMIT_WINDOW_SECONDS', '60'))
+        self.GLOBAL_REQUESTS_PER_MINUTE = int(os.getenv('GLOBAL_REQUESTS_PER_MINUTE', '0'))
+        self.MAX_CHUNK_SIZE = 4000    # Размер чанка для длинных текстов (символы, устаревшее - см. get_chunk_size)
+
+        # Лимиты исходящих сообщений Telegram Bot API
+        self.TG_GLOBAL_MSG_PER_SEC = float(os.getenv('TG_GLOBAL_MSG_PER_SEC', '30'))
+        self.TG_CHAT_MSG_PER_SEC = float(os.getenv('TG_CHAT_MSG_PER_SEC', '1'))
+        self.TG_CHAT_MSG_BURST = float(os.getenv('TG_CHAT_MSG_BURST', '3'))
+
+        # Режим приема обновлений: polling (по умолчанию) или webhook
+        self.BOT_MODE = os.getenv('BOT_MODE', 'polling').lower()
+        self.WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')
+        self.WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')
+        self.WEBHOOK_HOST = os.getenv('WEBHOOK_HOST', '0.0.0.0')
+        self.WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', os.getenv('PORT', '8080')))
+        self.WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/webhook')
+        self.WEBHOOK_MAX_CONNECTIONS = int(os.getenv('WEBHOOK_MAX_CONNECTIONS', '40'))
+
+        # Пул обработки обновлений и сброс нагрузки
+        self.UPDATE_WORKERS = int(os.getenv('UPDATE_WORKERS', '8'))
+        self.UPDATE_QUEUE_LIMIT = int(os.getenv('UPDATE_QUEUE_LIMIT', '500'))
+        # Глубина FIFO очереди одного пользователя
+        self.UPDATE_CHAT_QUEUE_LIMIT = int(os.getenv('UPDATE_CHAT_QUEUE_LIMIT', '20'))
+        # Текстовые сообщения, пришедшие с таким интервалом, пока предыдущие ждут в очереди, объединяются (0 - выкл.)
+        self.TEXT_COALESCE_SECONDS = int(os.getenv('TEXT_COALESCE_SECONDS', '10'))
+        self.UPDATE_LEDGER_PATH = os.getenv('UPDATE_LEDGER_PATH', 'bot_updates.db')
+        self.UPDATE_MAX_ATTEMPTS = int(os.getenv('UPDATE_MAX_ATTEMPTS', '3'))
         
         # Промпт для суммаризации (улучшенный с few-shot примерами)
         self.SUMMARIZATION_PROMPT = """Ты - эксперт по суммаризации текстов. Создай краткое саммари следующего текста на том же языке, что и исходный текст.
@@ -121,6 +169,13 @@ class Config:
         self.ASR_ENGINE = os.getenv('ASR_ENGINE', 'faster_whisper')
         self.FASTER_WHISPER_MODEL = os.getenv('FASTER_WHISPER_MODEL', 'large-v3')
         self.FASTER_WHISPER_COMPUTE = os.getenv('FASTER_WHISPER_COMPUTE', 'float16')
+        # Локальный ASR: окна 30-60 с по паузам (VAD) распознаются параллельно; 0 воркеров - по числу ядер
+        self.ASR_WORKERS = int(os.getenv('ASR_WORKERS', '0'))
+        self.ASR_WINDOW_MIN_SECONDS = float(os.getenv('ASR_WINDOW_MIN_SECONDS', '30'))
+        self.ASR_WINDOW_MAX_SECONDS = float(os.getenv('ASR_WINDOW_MAX_SECONDS', '60'))
+        # Кэш транскриптов по SHA-256 аудио (SQLite с индексом); 0 МБ - отключен
+        self.ASR_CACHE_PATH = os.getenv('ASR_CACHE_PATH', 'asr_cache/transcripts.db')
+        self.ASR_CACHE_MAX_MB = int(os.getenv('ASR_CACHE_MAX_MB', '256'))
         
         # OCR Configuration
         self.OCR_USE_TESSERACT = os.getenv('OCR_USE_TESSERACT', 'true').lower() == 'true'
@@ -133,6 +188,33 @@ class Config:
         self.SUM_MAX_SENTENCES = int(os.getenv('SUM_MAX_SENTENCES', '10'))
         self.SUM_CHUNK_TOKENS = int(os.getenv('SUM_CHUNK_TOKENS', '3000'))
         self.SUM_OVERLAP_TOKENS = int(os.getenv('SUM_OVERLAP_TOKENS', '300'))
+        self.PHASE_A_CHUNK_TOKENS = int(os.getenv('PHASE_A_CHUNK_TOKENS', '1000'))
+        # Бюджет чанка книги; книга покрывается 5 чанками (~37k токенов, ~75k символов кириллицы)
+        self.BOOK_CHUNK_TOKENS = int(os.getenv('BOOK_CHUNK_TOKENS', '7500'))
+        # Прогрев NER моделей (Natasha/spaCy) при старте бота вместо загрузки при первом запросе
+        self.NER_WARMUP = os.getenv('NER_WARMUP', 'false').lower() == 'true'
+        # Быстрый путь без LLM: короткие/избыточные тексты получают экстрактивное саммари
+        self.FAST_PATH_ENABLED = os.getenv('FAST_PATH_ENABLED', 'true').lower() == 'true'
+        self.FAST_PATH_MAX_TOKENS = int(os.getenv('FAST_PATH_MAX_TOKENS', '150'))
+        self.FAST_PATH_MIN_REDUNDANCY = float(os.getenv('FAST_PATH_MIN_REDUNDANCY', '0.5'))
+        # Смена уровня сжатия строится из сохраненного JSON фазы A, а не из исходного текста
+        self.RECOMPRESS_FROM_PHASE_A = os.getenv('RECOMPRESS_FROM_PHASE_A', 'true').lower() == 'true'
+
+        # Хранилища состояния пользователей: LRU + TTL; memory | sqlite | redis (общие для реплик)
+        self.STATE_BACKEND = os.getenv('STATE_BACKEND', 'memory').lower()
+        self.STATE_SQLITE_PATH = os.getenv('STATE_SQLITE_PATH', 'bot_state.db')
+        self.STATE_REDIS_URL = os.getenv('STATE_REDIS_URL', 'redis://localhost:6379/0')
+        self.STATE_MAX_USERS = int(os.getenv('STATE_MAX_USERS', '10000'))
+        self.STATE_TTL_SECONDS = int(os.getenv('STATE_TTL_SECONDS', '86400'))
+        self.STATE_SWEEP_INTERVAL = int(os.getenv('STATE_SWEEP_INTERVAL', '300'))
+        self.STATE_CLEANUP_BATCH = int(os.getenv('STATE_CLEANUP_BATCH', '500'))
+        # Кэш исходных текстов для пересоздания саммари
+        self.TEXT_CACHE_MAX_MB = int(os.getenv('TEXT_CACHE_MAX_MB', '64'))
+        self.TEXT_CACHE_TTL_SECONDS = int(os.getenv('TEXT_CACHE_TTL_SECONDS', '21600'))
+        # Кэш результатов обработки медиа (транскрипты, текст документов, анализ фото) по file_unique_id
+        self.MEDIA_CACHE_MAX_ENTRIES = int(os.getenv('MEDIA_CACHE_MAX_ENTRIES', '2000'))
+        self.MEDIA_CACHE_MAX_MB = int(os.getenv('MEDIA_CACHE_MAX_MB', '128'))
+        self.MEDIA_CACHE_TTL_SECONDS = int(os.getenv('MEDIA_CACHE_TTL_SECONDS', '604800'))
         
         # Новые флаги для улучшенной суммаризации
         self.ENABLE_LOCAL_FALLBACK = os.getenv('ENABLE_LOCAL_FALLBACK', 'false').lower() == 'true'
@@ -166,6 +248,12 @@ class Config:
         if self.MAX_REQUESTS_PER_MINUTE <= 0:
             raise ValueError("MAX_REQUESTS_PER_MINUTE должен быть больше 0")
 
+        if self.BOT_MODE not in ('polling', 'webhook'):
+            raise ValueError("BOT_MODE должен быть 'polling' или 'webhook'")
+
+        if self.BOT_MODE == 'webhook' and not self.WEBHOOK_URL:
+            raise ValueError("Для BOT_MODE=webhook необходимо задать WEBHOOK_URL")
+
         if self.MIN_TEXT_LENGTH >= self.MAX_TEXT_LENGTH:
             raise ValueError("MIN_TEXT_LENGTH должен быть меньше MAX_TEXT_LENGTH")
     
@@ -184,7 +272,13 @@ class Config:
         return self.SUMMARIZATION_PARAMS.copy()
     
     def get_chunk_size(self, text_length: int) -> int:
-        """Вычислить размер чанка в зависимости от длины текста"""
+        """
+        Вычислить размер чанка в символах (устаревшее)
+
+        Новый код должен использовать utils.chunking с бюджетом токенов
+        SUM_CHUNK_TOKENS - символьные лимиты не учитывают, что русский
+        текст занимает примерно вдвое больше токенов на символ.
+        """
         if text_length <= self.MAX_CHUNK_SIZE:
             return text_length
         
@@ -10,6 +10,7 @@ from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 from sklearn.cluster import DBSCAN
 from .preprocess import prepare_for_clustering, detect_language
+from .vectors import VECTORIZER_MODE, get_hashing_vectorizer
 
 logger = logging.getLogger(__name__)
 
@@ -17,8 +18,10 @@ logger = logging.getLogger(__name__)
 CLUSTER_THRESHOLD = float(os.getenv('DIGEST_MIN_CLUSTER_SIM', '0.62'))
 
 class MessageClusterer:
-    def __init__(self, similarity_threshold: float = CLUSTER_THRESHOLD):
+    def __init__(self, similarity_threshold: float = CLUSTER_THRESHOLD,
+                 vectorizer_mode: str = VECTORIZER_MODE):
         self.similarity_threshold = similarity_threshold
+        self.vectorizer_mode = vectorizer_mode
         self.vectorizer = None
         
     def _create_vectorizer(self, lang: str = 'ru') -> TfidfVectorizer:
@@ -61,11 +64,14 @@ class MessageClusterer:
         
         valid_texts, valid_messages = zip(*valid_pairs)
         
-        # Create TF-IDF vectors
-        self.vectorizer = self._create_vectorizer(lang)
-        
         try:
-            tfidf_matrix = self.vectorizer.fit_transform(valid_texts)
+            if self.vectorizer_mode == 'hashing':
+                # Reuse stored per-message vectors with shared IDF statistics
+                tfidf_matrix = get_hashing_vectorizer().transform_messages(list(valid_messages))
+            else:
+                # Create TF-IDF vectors
+                self.vectorizer = self._create_vectorizer(lang)
+                tfidf_matrix = self.vectorizer.fit_transform(valid_texts)
             
             if tfidf_matrix.shape[0] == 1:
                 return [list(valid_messages)]
@@ -135,7 +141,8 @@ class MessageClusterer:
         
         cluster_summaries = []
         for i, cluster in enumerate(clusters):
-            representative = self.find_cluster_representatives(cluster)
+            # Editable copy: messages are immutable records
+            representative = dict(self.find_cluster_representatives(cluster))
             
             # Add cluster metadata
             representative['cluster_id'] = i
@@ -193,6 +200,9 @@ def calculate_cluster_similarity(cluster1: List[Dict], cluster2: List[Dict]) ->
     
     # Use TF-IDF similarity
     try:
+        if VECTORIZER_MODE == 'hashing':
+            return get_hashing_vectorizer().similarity(rep1, rep2)
+        
         vectorizer = TfidfVectorizer(max_features=500, ngram_range=(1, 2))
         tfidf_matrix = vectorizer.fit_transform([text1, text2])
         similarity = cosine_similarity(tfidf_matrix)[0][1]
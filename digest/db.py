@@ -9,6 +9,8 @@ from typing import List, Dict, Optional, Tuple
 import json
 from datetime import datetime
 
+from digest.records import DIGEST_MESSAGE_COLUMNS, DigestMessage
+
 logger = logging.getLogger(__name__)
 
 class DigestDB:
@@ -174,12 +176,12 @@ class DigestDB:
             logger.error(f"Error saving message {channel_id}/{tg_message_id}: {e}")
             return False
     
-    def get_messages_in_period(self, user_id: int, from_ts: int, to_ts: int) -> List[Dict]:
+    def get_messages_in_period(self, user_id: int, from_ts: int, to_ts: int) -> List[DigestMessage]:
         """Get all messages from user's channels in time period"""
         try:
             with self.get_connection() as conn:
                 rows = conn.execute(
-                    """SELECT m.*, c.username, c.title, c.tg_chat_id 
+                    f"""SELECT {DIGEST_MESSAGE_COLUMNS}
                        FROM messages m 
                        JOIN channels c ON m.channel_id = c.id 
                        JOIN user_channels uc ON c.id = uc.channel_id 
@@ -188,11 +190,92 @@ class DigestDB:
                        ORDER BY m.posted_at DESC""",
                     (user_id, from_ts, to_ts)
                 ).fetchall()
-                return [dict(row) for row in rows]
+                return [DigestMessage.from_row(row) for row in rows]
         except Exception as e:
             logger.error(f"Error getting messages for period {user_id}: {e}")
             return []
     
+    def get_message_id(self, channel_id: int, tg_message_id: int) -> Optional[int]:
+        """Get internal message ID by channel and Telegram message ID"""
+        try:
+            with self.get_connection() as conn:
+                row = conn.execute(
+                    "SELECT id FROM messages WHERE channel_id = ? AND tg_message_id = ?",
+                    (channel_id, tg_message_id)
+                ).fetchone()
+                return row[0] if row else None
+        except Exception as e:
+            logger.error(f"Error getting message id {channel_id}/{tg_message_id}: {e}")
+            return None
+
+    # Vector operations
+    def save_message_vector(self, message_id: int, indices: bytes, vals: bytes,
+                            new_features: List[int]) -> bool:
+        """
+        Save message vector and update document frequencies in one transaction.
+        Returns False if the vector already exists (DF is not counted twice).
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.execute(
+                    """INSERT OR IGNORE INTO message_vectors
+                       (message_id, indices, vals, created_at) VALUES (?, ?, ?, ?)""",
+                    (message_id, indices, vals, int(datetime.now().timestamp()))
+                )
+                if cursor.rowcount == 0:
+                    return False
+
+                conn.executemany(
+                    """INSERT INTO term_df (feature, df) VALUES (?, 1)
+                       ON CONFLICT(feature) DO UPDATE SET df = df + 1""",
+                    [(feature,) for feature in new_features]
+                )
+                conn.execute(
+                    """INSERT INTO vector_stats (key, value) VALUES ('n_docs', 1)
+                       ON CONFLICT(key) DO UPDATE SET value = value + 1"""
+                )
+                return True
+        except Exception as e:
+            logger.error(f"Error saving vector for message {message_id}: {e}")
+            return False
+
+    def get_message_vectors(self, message_ids: List[int]) -> Dict[int, Tuple[bytes, bytes]]:
+        """Get stored vectors by message IDs"""
+        if not message_ids:
+            return {}
+
+        try:
+            result = {}
+            with self.get_connection() as conn:
+                # Stay below SQLite host parameter limit
+                for start in range(0, len(message_ids), 500):
+                    batch = message_ids[start:start + 500]
+                    placeholders = ','.join('?' * len(batch))
+                    rows = conn.execute(
+                        f"SELECT message_id, indices, vals FROM message_vectors "
+                        f"WHERE message_id IN ({placeholders})",
+                        batch
+                    ).fetchall()
+                    for row in rows:
+                        result[row['message_id']] = (row['indices'], row['vals'])
+            return result
+        except Exception as e:
+            logger.error(f"Error getting message vectors: {e}")
+            return {}
+
+    def get_term_df(self) -> Tuple[List[Tuple[int, int]], int]:
+        """Get document frequencies for all features and total document count"""
+        try:
+            with self.get_connection() as conn:
+                rows = conn.execute("SELECT feature, df FROM term_df").fetchall()
+                n_docs = conn.execute(
+                    "SELECT value FROM vector_stats WHERE key = 'n_docs'"
+                ).fetchone()
+                return [(row[0], row[1]) for row in rows], (n_docs[0] if n_docs else 0)
+        except Exception as e:
+            logger.error(f"Error getting term document frequencies: {e}")
+            return [], 0
+
     # Keyword operations
     def save_keyword(self, user_id: int, pattern: str, is_regex: bool = False) -> Optional[int]:
         """Save keyword pattern"""
@@ -67,5 +67,24 @@ CREATE TABLE IF NOT EXISTS schedules (
   is_active INTEGER DEFAULT 1
 );
 
+-- Hashed message vectors (sparse, float16) for the hashing vectorizer mode
+CREATE TABLE IF NOT EXISTS message_vectors (
+  message_id INTEGER PRIMARY KEY,
+  indices BLOB,            -- int32 feature indices
+  vals BLOB,               -- float16 l2-normalized term frequencies
+  created_at INTEGER
+);
+
+-- Document frequency per hashed feature, learned incrementally on ingest
+CREATE TABLE IF NOT EXISTS term_df (
+  feature INTEGER PRIMARY KEY,
+  df INTEGER DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS vector_stats (
+  key TEXT PRIMARY KEY,    -- 'n_docs'
+  value INTEGER
+);
+
 CREATE INDEX IF NOT EXISTS idx_messages_channel_time ON messages(channel_id, posted_at);
 CREATE INDEX IF NOT EXISTS idx_messages_text ON messages(id);
\ No newline at end of file
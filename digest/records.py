@@ -0,0 +1,66 @@
+"""
+Compact record types for messages flowing through the digest pipeline
+"""
+
+import sys
+from dataclasses import dataclass, fields
+from typing import Any, Iterator, Optional
+
+
+@dataclass(slots=True, frozen=True)
+class DigestMessage:
+    """
+    Channel message joined with its channel, as read by get_messages_in_period.
+
+    Slotted and immutable: no per-instance __dict__, so a period with tens of
+    thousands of messages costs a fraction of the equivalent dict rows.
+    Supports the read-only mapping protocol (get, [], in, keys) used by
+    dedup/cluster/trends code, and dict(msg) for an editable copy.
+    """
+    id: int
+    channel_id: int
+    tg_message_id: int
+    message_url: Optional[str]
+    posted_at: int
+    text: str
+    username: Optional[str]
+    title: Optional[str]
+    tg_chat_id: Optional[int]
+
+    @classmethod
+    def from_row(cls, row) -> 'DigestMessage':
+        """Build from a sqlite3.Row; channel names repeat across rows, so intern them"""
+        username, title = row['username'], row['title']
+        return cls(
+            id=row['id'],
+            channel_id=row['channel_id'],
+            tg_message_id=row['tg_message_id'],
+            message_url=row['message_url'],
+            posted_at=row['posted_at'] or 0,
+            text=row['text'] or '',
+            username=sys.intern(username) if username else username,
+            title=sys.intern(title) if title else title,
+            tg_chat_id=row['tg_chat_id'],
+        )
+
+    def keys(self) -> Iterator[str]:
+        return iter(self.__slots__)
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return getattr(self, key)
+        except (AttributeError, TypeError):
+            raise KeyError(key) from None
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.__slots__
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key, default) if key in self.__slots__ else default
+
+
+# Column list matching DigestMessage (raw_json is never needed by the pipeline)
+DIGEST_MESSAGE_COLUMNS = ", ".join(
+    f"c.{f.name}" if f.name in ('username', 'title', 'tg_chat_id') else f"m.{f.name}"
+    for f in fields(DigestMessage)
+)
@@ -16,6 +16,7 @@ from .dedup import deduplicate_messages
 from .cluster import MessageClusterer
 from .trends import analyze_trends_for_period
 from .renderer import render_digest
+from bot.middleware.send_queue import PRIORITY_BULK
 
 logger = logging.getLogger(__name__)
 
@@ -278,10 +279,12 @@ class DigestScheduler:
             chat_id = user['chat_id']
             
             # Send digest
+            # Bulk lane: interactive replies are delivered before digests
             await self.bot_instance.send_message(
                 chat_id, 
                 digest_text, 
-                parse_mode='HTML'
+                parse_mode='HTML',
+                priority=PRIORITY_BULK
             )
             
             # If there are more items, could add pagination buttons here
@@ -8,6 +8,7 @@ from typing import Dict, Optional, List
 from datetime import datetime
 from .db import get_digest_db
 from .keywords import check_keywords_and_alert
+from .vectors import VECTORIZER_MODE, get_hashing_vectorizer
 
 logger = logging.getLogger(__name__)
 
@@ -72,6 +73,10 @@ class ChannelSourcesHandler:
             if success:
                 logger.info(f"Saved channel message: {username or title}/{message_id}")
                 
+                # Vectorize once on ingest for the hashing clustering mode
+                if VECTORIZER_MODE == 'hashing' and text:
+                    self._ingest_vector(channel_id, message_id, text)
+                
                 # Check for keyword alerts
                 await self._check_keyword_alerts(post, bot_instance)
                 
@@ -99,6 +104,15 @@ class ChannelSourcesHandler:
             logger.error(f"Error handling edited channel post: {e}")
             return False
     
+    def _ingest_vector(self, channel_id: int, tg_message_id: int, text: str):
+        """Store message vector and update document frequency statistics"""
+        try:
+            db_message_id = self.db.get_message_id(channel_id, tg_message_id)
+            if db_message_id:
+                get_hashing_vectorizer().ingest(db_message_id, text)
+        except Exception as e:
+            logger.error(f"Error vectorizing message {channel_id}/{tg_message_id}: {e}")
+    
     async def _check_keyword_alerts(self, post: Dict, bot_instance):
         """Check message against user keywords and send alerts"""
         try:
@@ -0,0 +1,138 @@
+"""
+Stateless hashing vectorization with persisted document frequencies
+
+Message vectors are computed once on ingest with a HashingVectorizer (no fit),
+stored as float16 sparse rows and reused across digests. IDF weights are
+applied at query time from document frequencies learned incrementally.
+"""
+
+import logging
+import os
+import threading
+from typing import List, Dict, Optional
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+from .db import get_digest_db
+from .preprocess import for_vectorizer, detect_language
+
+logger = logging.getLogger(__name__)
+
+# Vectorizer mode for clustering: 'tfidf' (fit per run) or 'hashing' (shared vocabulary)
+VECTORIZER_MODE = os.getenv('DIGEST_VECTORIZER', 'tfidf').lower()
+HASH_FEATURES = int(os.getenv('DIGEST_HASH_FEATURES', str(2 ** 18)))
+
+class HashingMessageVectorizer:
+    def __init__(self, db=None, n_features: int = HASH_FEATURES):
+        self.db = db or get_digest_db()
+        self.n_features = n_features
+        self.hasher = HashingVectorizer(
+            n_features=n_features,
+            ngram_range=(1, 2),  # unigrams and bigrams, same as TF-IDF mode
+            alternate_sign=False,
+            norm=None
+        )
+        self._lock = threading.Lock()
+        self._df = np.zeros(n_features, dtype=np.int32)
+        self._n_docs = 0
+        self._load_df()
+
+    def _load_df(self):
+        """Load persisted document frequencies into memory"""
+        rows, n_docs = self.db.get_term_df()
+        for feature, df in rows:
+            if 0 <= feature < self.n_features:
+                self._df[feature] = df
+        self._n_docs = n_docs
+        logger.info(f"Loaded document frequencies: {len(rows)} features, {n_docs} documents")
+
+    def _tf_row(self, text: str, lang: Optional[str] = None) -> sparse.csr_matrix:
+        """Hash text into a sublinear, l2-normalized term frequency row"""
+        lang = lang or detect_language(text)
+        row = self.hasher.transform([for_vectorizer(text, lang)])
+        if row.nnz:
+            row.data = 1.0 + np.log(row.data)  # sublinear tf scaling
+        return normalize(row, norm='l2')
+
+    @staticmethod
+    def _encode(row: sparse.csr_matrix) -> tuple:
+        """Pack sparse row into compact (int32 indices, float16 values) blobs"""
+        return (row.indices.astype(np.int32).tobytes(),
+                row.data.astype(np.float16).tobytes())
+
+    def _decode(self, indices: bytes, vals: bytes) -> sparse.csr_matrix:
+        """Unpack stored blobs into a sparse row"""
+        idx = np.frombuffer(indices, dtype=np.int32)
+        data = np.frombuffer(vals, dtype=np.float16).astype(np.float32)
+        return sparse.csr_matrix(
+            (data, idx, np.array([0, len(idx)])), shape=(1, self.n_features)
+        )
+
+    def ingest(self, message_id: int, text: str) -> bool:
+        """Vectorize message once, persist it and update document frequencies"""
+        if not text or not text.strip():
+            return False
+
+        return self._store(message_id, self._tf_row(text))
+
+    def _store(self, message_id: int, row: sparse.csr_matrix) -> bool:
+        """Persist vector row and count its features towards document frequencies"""
+        if not row.nnz:
+            return False
+
+        indices, vals = self._encode(row)
+        features = row.indices.tolist()
+
+        with self._lock:
+            if not self.db.save_message_vector(message_id, indices, vals, features):
+                return False
+            self._df[row.indices] += 1
+            self._n_docs += 1
+
+        return True
+
+    def idf(self) -> np.ndarray:
+        """Smoothed IDF weights from current document frequencies"""
+        return np.log((1.0 + self._n_docs) / (1.0 + self._df)) + 1.0
+
+    def transform_messages(self, messages: List[Dict]) -> sparse.csr_matrix:
+        """
+        Build TF-IDF matrix for messages, reusing stored vectors where available.
+        Messages without a stored vector are ingested on the fly.
+        """
+        ids = [msg['id'] for msg in messages if msg.get('id') is not None]
+        stored = self.db.get_message_vectors(ids)
+
+        rows = []
+        for msg in messages:
+            message_id = msg.get('id')
+            if message_id in stored:
+                rows.append(self._decode(*stored[message_id]))
+                continue
+
+            row = self._tf_row(msg.get('text', ''))
+            if message_id is not None:
+                self._store(message_id, row)
+            rows.append(row)
+
+        if not rows:
+            return sparse.csr_matrix((0, self.n_features), dtype=np.float32)
+
+        matrix = sparse.vstack(rows, format='csr')
+        return normalize(matrix @ sparse.diags(self.idf().astype(np.float32)), norm='l2')
+
+    def similarity(self, msg1: Dict, msg2: Dict) -> float:
+        """Cosine similarity between two messages using stored vectors"""
+        matrix = self.transform_messages([msg1, msg2])
+        return float(matrix[0].multiply(matrix[1]).sum())
+
+# Global instance
+_hashing_vectorizer = None
+
+def get_hashing_vectorizer() -> HashingMessageVectorizer:
+    """Get global hashing vectorizer instance"""
+    global _hashing_vectorizer
+    if _hashing_vectorizer is None:
+        _hashing_vectorizer = HashingMessageVectorizer()
+    return _hashing_vectorizer
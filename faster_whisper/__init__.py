@@ -3,10 +3,12 @@ import tempfile
 import os
 
 class WhisperModel:
-    def __init__(self, model_size, device='cpu', compute_type='int8'):
+    def __init__(self, model_size, device='cpu', compute_type='int8', cpu_threads=0, num_workers=1):
         self.model_size = model_size
         self.device = device
         self.compute_type = compute_type
+        self.cpu_threads = cpu_threads
+        self.num_workers = num_workers
         
     def transcribe(self, audio_path, language=None, **kwargs):
         # Simple mock transcription - in production this would be real ASR
@@ -1,12 +1,13 @@
 import os
 import tempfile
 import logging
-import aiofiles
 import aiohttp
 from typing import Dict, Any, Optional
 import chardet
 import re
 
+from utils.downloads import DownloadTooLarge, download_service
+
 # Импорты для работы с разными форматами файлов
 try:
     import PyPDF2
@@ -73,14 +74,13 @@ class FileProcessor:
         self.supported_extensions = base_formats
         self.max_file_size = 20 * 1024 * 1024  # 20MB - лимит Telegram
         
-    async def download_telegram_file(self, file_info: Dict[str, Any], file_name: str, file_size: int, session: aiohttp.ClientSession = None) -> Dict[str, Any]:
-        """Скачивает файл от Telegram бота
+    async def download_telegram_file(self, file_info: Dict[str, Any], file_name: str, file_size: int) -> Dict[str, Any]:
+        """Скачивает файл от Telegram бота через общий сервис скачивания
 
         Args:
             file_info: Информация о файле с ключом 'file_path'
             file_name: Имя файла
             file_size: Размер файла в байтах
-            session: Опциональная aiohttp сессия (если None - создается новая)
         """
         try:
             # Проверяем размер файла
@@ -102,40 +102,29 @@ class FileProcessor:
             temp_dir = tempfile.mkdtemp()
             local_file_path = os.path.join(temp_dir, file_name)
 
-            # Используем переданную сессию или создаем новую
-            if session:
-                # Используем переданную сессию
-                async with session.get(file_info['file_path']) as response:
-                    if response.status == 200:
-                        async with aiofiles.open(local_file_path, 'wb') as f:
-                            async for chunk in response.content.iter_chunked(8192):
-                                await f.write(chunk)
-                    else:
-                        return {
-                            'success': False,
-                            'error': f'Ошибка скачивания файла: HTTP {response.status}'
-                        }
-            else:
-                # Создаем новую сессию если не передана
-                async with aiohttp.ClientSession() as new_session:
-                    async with new_session.get(file_info['file_path']) as response:
-                        if response.status == 200:
-                            async with aiofiles.open(local_file_path, 'wb') as f:
-                                async for chunk in response.content.iter_chunked(8192):
-                                    await f.write(chunk)
-                        else:
-                            return {
-                                'success': False,
-                                'error': f'Ошибка скачивания файла: HTTP {response.status}'
-                            }
+            try:
+                download = await download_service.download(
+                    file_info['file_path'], local_file_path, max_bytes=self.max_file_size
+                )
+            except DownloadTooLarge:
+                return {
+                    'success': False,
+                    'error': 'Файл слишком большой (максимум 20MB)'
+                }
+            except aiohttp.ClientResponseError as e:
+                return {
+                    'success': False,
+                    'error': f'Ошибка скачивания файла: HTTP {e.status}'
+                }
 
             return {
                 'success': True,
                 'file_path': local_file_path,
                 'file_name': file_name,
-                'file_size': file_size,
+                'file_size': download.size,
                 'file_extension': file_extension,
-                'temp_dir': temp_dir
+                'temp_dir': temp_dir,
+                'sha256': download.sha256
             }
             
         except Exception as e:
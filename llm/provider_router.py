@@ -3,11 +3,22 @@ LLM Provider Router - Manages multiple LLM providers with fallback support
 Simplified version: Google Gemini (primary) → Groq (fallback)
 """
 
+import asyncio
 import logging
+import re
+import threading
 import time
-from typing import Optional, Tuple, Dict, Any
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Optional, Tuple, Dict, Any, Callable, Iterator, AsyncIterator, List
 from groq import Groq
 from config import config
+from llm.routing import (
+    BudgetExceeded,
+    CircuitBreaker,
+    CircuitOpen,
+    LatencyTracker,
+    ProviderBudget,
+)
 
 # Google Gemini support
 try:
@@ -19,16 +30,50 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# Quota errors by SDK exception name (groq.RateLimitError, google.api_core ResourceExhausted)
+RATE_LIMIT_ERRORS = frozenset({'RateLimitError', 'ResourceExhausted', 'TooManyRequests'})
+# Whole phrases only: a bare "rate" also matches "generateContent" or "separate"
+RATE_LIMIT_PHRASES = (
+    'rate limit', 'rate_limit', 'ratelimit', 'too many requests',
+    'quota', 'resource has been exhausted', 'resource_exhausted',
+)
+_HTTP_429 = re.compile(r'\b429\b')
+# How often the hedge loop checks whether the primary call has left the queue
+HEDGE_POLL_INTERVAL = 0.05
+
 class LLMProviderRouter:
-    """Routes LLM requests through Gemini and Groq with fallback support"""
+    """Routes LLM requests through Gemini and Groq by observed latency with fallback support"""
 
     def __init__(self):
         self.gemini_client = None
         self.groq_client = None
         self.current_model = None
         self.current_provider = None  # 'gemini' or 'groq'
-        self.retry_count = 0
-        self.max_retries = 2
+
+        self.latency = LatencyTracker(
+            window=getattr(config, 'LLM_LATENCY_WINDOW', 50),
+            min_samples=getattr(config, 'LLM_LATENCY_MIN_SAMPLES', 5),
+        )
+        self.hedging_enabled = getattr(config, 'LLM_HEDGING', True)
+        self.hedge_default_delay = getattr(config, 'LLM_HEDGE_DELAY', 8.0)
+        self.hedge_min_delay = getattr(config, 'LLM_HEDGE_MIN_DELAY', 1.0)
+        self._hedge_executor = ThreadPoolExecutor(
+            max_workers=getattr(config, 'LLM_HEDGE_WORKERS', 8), thread_name_prefix="llm-hedge"
+        )
+
+        # Per-provider state shared by all concurrent requests
+        self.budget_wait = getattr(config, 'LLM_BUDGET_WAIT', 20.0)
+        self.breakers: Dict[str, CircuitBreaker] = {
+            provider: CircuitBreaker(
+                failure_threshold=getattr(config, 'LLM_BREAKER_FAILURES', 5),
+                reset_timeout=getattr(config, 'LLM_BREAKER_COOLDOWN', 30.0),
+            )
+            for provider in ('gemini', 'groq')
+        }
+        self.budgets: Dict[str, ProviderBudget] = {
+            'gemini': ProviderBudget(getattr(config, 'GEMINI_RPM', 10), getattr(config, 'GEMINI_TPM', 250000)),
+            'groq': ProviderBudget(getattr(config, 'GROQ_RPM', 30), getattr(config, 'GROQ_TPM', 12000)),
+        }
 
         self._initialize_clients()
     
@@ -49,54 +94,267 @@ class LLMProviderRouter:
             self.groq_client = Groq(api_key=config.GROQ_API_KEY)
             logger.info(f"✅ Groq fallback client initialized: {config.GROQ_LLM_MODEL}")
     
-    def get_llm_client_and_model(self) -> Tuple[Any, str, str]:
-        """
-        Get the appropriate LLM client and model
-        Returns: (client, model_name, provider)
-        """
+    def _available_providers(self) -> List[Tuple[Any, str, str]]:
+        """Configured providers in default priority order: (client, model, provider)"""
+        providers = []
         # Primary: Google Gemini 2.5 Flash (free, fast, 2M context, excellent Russian)
         if self.gemini_client:
-            self.current_provider = 'gemini'
-            return self.gemini_client, config.GEMINI_MODEL, 'gemini'
-
+            providers.append((self.gemini_client, config.GEMINI_MODEL, 'gemini'))
         # Fallback: Groq with Llama 3.3 70B
         if self.groq_client and config.GROQ_LLM_MODEL:
-            self.current_provider = 'groq'
-            return self.groq_client, config.GROQ_LLM_MODEL, 'groq'
+            providers.append((self.groq_client, config.GROQ_LLM_MODEL, 'groq'))
+        return providers
 
-        raise ValueError("Нет доступных LLM провайдеров. Проверьте конфигурацию.")
-    
-    def _handle_rate_limit(self, error) -> bool:
-        """Handle rate limiting with retry logic"""
-        if "429" in str(error) or "rate" in str(error).lower():
-            self.retry_count += 1
-            if self.retry_count < self.max_retries:
-                wait_time = min(2 ** self.retry_count, 60)  # Exponential backoff, max 60s
-                logger.warning(f"Rate limited. Retrying in {wait_time}s (attempt {self.retry_count})")
-                time.sleep(wait_time)
+    def ranked_providers(self) -> List[Tuple[Any, str, str]]:
+        """Available providers with closed circuits, ordered by health and rolling p50 latency"""
+        providers = self._available_providers()
+        if not providers:
+            raise ValueError("Нет доступных LLM провайдеров. Проверьте конфигурацию.")
+
+        providers = [p for p in providers if self.breakers[p[2]].available()]
+        if not providers:
+            raise CircuitOpen("Все LLM провайдеры временно отключены после ошибок. Попробуйте позже.")
+
+        by_key = {LatencyTracker.key(provider, model): (client, model, provider)
+                  for client, model, provider in providers}
+        return [by_key[key] for key in self.latency.rank(list(by_key))]
+
+    def get_llm_client_and_model(self) -> Tuple[Any, str, str]:
+        """
+        Get the fastest healthy LLM client and model
+        Returns: (client, model_name, provider)
+        """
+        client, model, provider = self.ranked_providers()[0]
+        self.current_provider = provider
+        return client, model, provider
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Rolling latency/error statistics, breaker states and remaining budgets"""
+        return {
+            'latency': self.latency.snapshot(),
+            'breakers': {name: breaker.state for name, breaker in self.breakers.items()},
+            'budgets': {name: budget.snapshot() for name, budget in self.budgets.items()},
+        }
+
+    @staticmethod
+    def _is_rate_limit(error: Exception) -> bool:
+        """Quota/429 errors only; other failures (bad model, invalid argument) are not rate limits"""
+        if any(cls.__name__ in RATE_LIMIT_ERRORS for cls in type(error).__mro__):
+            return True
+        for attr in ('status_code', 'code'):
+            if getattr(error, attr, None) == 429:
                 return True
-        return False
-    
-    def _switch_to_fallback(self) -> Tuple[Any, str, str]:
-        """Switch to fallback provider (Gemini → Groq)"""
-        logger.info("🔄 Switching to fallback provider")
-
-        # If Gemini failed, try Groq
-        if self.current_provider == 'gemini':
-            if self.groq_client and config.GROQ_LLM_MODEL:
-                self.current_provider = 'groq'
-                logger.info(f"🔄 Switching from Gemini to Groq ({config.GROQ_LLM_MODEL})")
-                return self.groq_client, config.GROQ_LLM_MODEL, 'groq'
-
-        raise ValueError("Все провайдеры недоступны")
-    
+        message = str(error).lower()
+        return bool(_HTTP_429.search(message)) or any(phrase in message for phrase in RATE_LIMIT_PHRASES)
+
+    @staticmethod
+    def _retry_after(error: Exception) -> Optional[float]:
+        """Retry delay suggested by the provider error (Groq / Gemini formats)"""
+        match = re.search(r"try again in (?:(\d+)m)?([\d.]+)s", str(error))
+        if match:
+            return int(match.group(1) or 0) * 60 + float(match.group(2))
+        match = re.search(r"retry_delay\s*\{\s*seconds:\s*(\d+)", str(error))
+        if match:
+            return float(match.group(1))
+        return None
+
+    @staticmethod
+    def _estimate_tokens(prompt: str, system: Optional[str], max_tokens: int) -> int:
+        """Rough request cost for the TPM budget: ~4 chars per token plus the completion"""
+        return (len(prompt) + len(system or "")) // 4 + max_tokens
+
+    def _reserve(self, provider: str, prompt: str, system: Optional[str], max_tokens: int):
+        """Pass the circuit breaker and wait for the quota budget, or raise"""
+        breaker = self.breakers[provider]
+        if not breaker.allow():
+            raise CircuitOpen(f"Circuit for {provider} is {breaker.state}")
+
+        tokens = self._estimate_tokens(prompt, system, max_tokens)
+        if not self.budgets[provider].acquire(tokens, timeout=self.budget_wait):
+            # The probe slot (half-open) was reserved but not used
+            breaker.release_probe()
+            raise BudgetExceeded(f"{provider} quota budget exhausted ({tokens} tokens requested)")
+
+    def _record_failure(self, provider: str, error: Exception):
+        """Feed an error into the provider circuit breaker"""
+        if isinstance(error, (CircuitOpen, BudgetExceeded)):
+            return
+        rate_limited = self._is_rate_limit(error)
+        if rate_limited:
+            self.budgets[provider].drain()
+        self.breakers[provider].record_failure(rate_limited, self._retry_after(error))
+        if self.breakers[provider].state == CircuitBreaker.OPEN:
+            logger.warning(f"⛔ Circuit for {provider} opened for {self.breakers[provider].open_for:.0f}s")
+
+    def _call_provider(self,
+                       client: Any,
+                       model: str,
+                       provider: str,
+                       prompt: str,
+                       system: Optional[str],
+                       temperature: float,
+                       max_tokens: int,
+                       on_start: Optional[Callable[[], None]] = None) -> str:
+        """
+        Single non-streaming request; latency and outcome are recorded
+
+        on_start is called once the quota budget is reserved, right before
+        the provider request goes out.
+        """
+        self._reserve(provider, prompt, system, max_tokens)
+        if on_start is not None:
+            on_start()
+
+        key = LatencyTracker.key(provider, model)
+        started = time.monotonic()
+
+        try:
+            if provider == 'gemini':
+                # Gemini API format
+                full_prompt = prompt
+                if system:
+                    full_prompt = f"{system}\n\n{prompt}"
+
+                generation_config = {
+                    "temperature": temperature,
+                    "max_output_tokens": max_tokens,
+                }
+
+                response = client.generate_content(
+                    full_prompt,
+                    generation_config=generation_config
+                )
+                result = response.text
+
+            else:
+                # OpenAI-compatible API (OpenRouter, Groq)
+                messages = []
+                if system:
+                    messages.append({"role": "system", "content": system})
+                messages.append({"role": "user", "content": prompt})
+
+                response = client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens
+                )
+                result = response.choices[0].message.content
+
+        except Exception as e:
+            self.latency.record(key, time.monotonic() - started, ok=False)
+            self._record_failure(provider, e)
+            raise
+
+        self.latency.record(key, time.monotonic() - started, ok=True)
+        self.breakers[provider].record_success()
+        return result
+
+    def _hedge_delay(self, provider: str, model: str) -> float:
+        """How long to wait for the primary before firing the backup (its p95)"""
+        p95 = self.latency.p95(LatencyTracker.key(provider, model))
+        if p95 is None:
+            return self.hedge_default_delay
+        return max(self.hedge_min_delay, p95)
+
+    def _hedge_deadline(self, primary: Tuple[Any, str, str], started: float) -> float:
+        return started + self._hedge_delay(primary[2], primary[1])
+
+    def _quota_contended(self) -> bool:
+        """Callers are queued for provider quota: a backup request would only add to the queue"""
+        return any(budget.waiting > 0 for budget in self.budgets.values())
+
+    def _generate_hedged(self,
+                         candidates: List[Tuple[Any, str, str]],
+                         prompt: str,
+                         system: Optional[str],
+                         temperature: float,
+                         max_tokens: int) -> str:
+        """
+        Hedged request: start the backup if the primary is slower than its p95
+
+        The hedge clock starts when the primary request actually goes out,
+        not while it waits for a pool thread or for its quota budget, and no
+        backup is fired while other callers are queued for quota. The first
+        successful answer wins. Provider SDK calls cannot be interrupted, so
+        the loser is cancelled if it has not started yet and otherwise its
+        result is discarded (its latency is still recorded).
+        """
+        primary, backup = candidates[0], candidates[1]
+        args = (prompt, system, temperature, max_tokens)
+
+        primary_started: List[float] = []
+        futures = {
+            self._hedge_executor.submit(
+                self._call_provider, *primary, *args,
+                on_start=lambda: primary_started.append(time.monotonic())
+            ): primary
+        }
+        pending = set(futures)
+        hedged = False
+        hedge_allowed = True
+        last_error = None
+
+        while pending:
+            if hedged or not hedge_allowed:
+                timeout = None
+            elif not primary_started:
+                # Primary is still queued for a thread or for quota
+                timeout = HEDGE_POLL_INTERVAL
+            else:
+                timeout = max(0.0, self._hedge_deadline(primary, primary_started[0]) - time.monotonic())
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            if not done:
+                if not primary_started or time.monotonic() < self._hedge_deadline(primary, primary_started[0]):
+                    continue
+                if self._quota_contended():
+                    # Quota is scarce: doubling traffic would only lengthen the queue
+                    hedge_allowed = False
+                    logger.info(f"⏱️ {primary[2]} медленнее p95, но квота занята - без hedge")
+                    continue
+                # Primary is slower than usual - fire the backup
+                hedged = True
+                logger.info(f"⏱️ {primary[2]} не ответил за p95, запускаем hedge на {backup[2]}/{backup[1]}")
+                future = self._hedge_executor.submit(self._call_provider, *backup, *args)
+                futures[future] = backup
+                pending.add(future)
+                continue
+
+            for future in done:
+                client, model, provider = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    last_error = e
+                    logger.error(f"❌ Error with {provider}/{model}: {e}")
+                    continue
+
+                for loser in pending:
+                    loser.cancel()
+                self.current_provider = provider
+                self.current_model = model
+                logger.info(f"✅ Successfully generated completion using {provider}/{model}"
+                            f"{' (hedged)' if hedged else ''}")
+                return result
+
+            if not hedged and not pending:
+                # Primary failed fast - go straight to the backup
+                hedged = True
+                logger.info(f"🔄 Trying fallback: {backup[2]}/{backup[1]}")
+                future = self._hedge_executor.submit(self._call_provider, *backup, *args)
+                futures[future] = backup
+                pending.add(future)
+
+        raise Exception(f"Все провайдеры недоступны: {last_error}")
+
     def generate_completion(self,
                           prompt: str,
                           system: Optional[str] = None,
                           temperature: float = 0.2,
                           max_tokens: int = 2000) -> str:
         """
-        Generate completion using available providers with fallback
+        Generate completion using the fastest healthy provider with fallback
 
         Args:
             prompt: User prompt
@@ -107,105 +365,151 @@ class LLMProviderRouter:
         Returns:
             Generated text completion
         """
-        self.retry_count = 0
-
-        while self.retry_count < self.max_retries:
-            try:
-                client, model, provider = self.get_llm_client_and_model()
-                self.current_model = model
+        candidates = self.ranked_providers()
 
-                logger.info(f"🤖 Using {provider}: {model} (attempt {self.retry_count + 1})")
+        if self.hedging_enabled and len(candidates) > 1:
+            return self._generate_hedged(candidates, prompt, system, temperature, max_tokens)
 
-                # Generate completion based on provider
-                if provider == 'gemini':
-                    # Gemini API format
-                    full_prompt = prompt
-                    if system:
-                        full_prompt = f"{system}\n\n{prompt}"
-
-                    generation_config = {
-                        "temperature": temperature,
-                        "max_output_tokens": max_tokens,
-                    }
-
-                    response = client.generate_content(
-                        full_prompt,
-                        generation_config=generation_config
-                    )
-                    result = response.text
-
-                else:
-                    # OpenAI-compatible API (OpenRouter, Groq)
-                    messages = []
-                    if system:
-                        messages.append({"role": "system", "content": system})
-                    messages.append({"role": "user", "content": prompt})
-
-                    response = client.chat.completions.create(
-                        model=model,
-                        messages=messages,
-                        temperature=temperature,
-                        max_tokens=max_tokens
-                    )
-                    result = response.choices[0].message.content
+        last_error = None
+        for client, model, provider in candidates:
+            self.current_provider = provider
+            self.current_model = model
+            logger.info(f"🤖 Using {provider}: {model}")
 
+            try:
+                result = self._call_provider(
+                    client, model, provider, prompt, system, temperature, max_tokens
+                )
                 logger.info(f"✅ Successfully generated completion using {provider}/{model}")
                 return result
 
             except Exception as e:
-                error_str = str(e)
-                logger.error(f"❌ Error with {self.current_provider}/{self.current_model}: {error_str}")
-
-                # Handle rate limiting
-                if self._handle_rate_limit(e):
+                last_error = e
+                if self._is_rate_limit(e):
+                    logger.warning(f"Rate limited by {provider}/{model}, trying next provider")
+                else:
+                    logger.error(f"❌ Error with {provider}/{model}: {e}")
+
+        raise Exception(f"Все провайдеры недоступны: {last_error}. Попробуйте позже.")
+
+    def _stream_from_provider(self,
+                              client: Any,
+                              model: str,
+                              provider: str,
+                              prompt: str,
+                              system: Optional[str],
+                              temperature: float,
+                              max_tokens: int) -> Iterator[str]:
+        """Yield text deltas from a single provider's streaming API"""
+        if provider == 'gemini':
+            full_prompt = prompt
+            if system:
+                full_prompt = f"{system}\n\n{prompt}"
+
+            generation_config = {
+                "temperature": temperature,
+                "max_output_tokens": max_tokens,
+            }
+
+            response = client.generate_content(
+                full_prompt,
+                generation_config=generation_config,
+                stream=True
+            )
+            for chunk in response:
+                try:
+                    text = chunk.text
+                except ValueError:
+                    # Chunk without text parts (e.g. safety metadata only)
                     continue
+                if text:
+                    yield text
+        else:
+            messages = []
+            if system:
+                messages.append({"role": "system", "content": system})
+            messages.append({"role": "user", "content": prompt})
+
+            response = client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stream=True
+            )
+            for chunk in response:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+
+    def generate_completion_stream(self,
+                                   prompt: str,
+                                   system: Optional[str] = None,
+                                   temperature: float = 0.2,
+                                   max_tokens: int = 2000) -> Iterator[str]:
+        """
+        Stream completion as text deltas with fallback support
 
-                # Try fallback provider
-                try:
-                    client, model, provider = self._switch_to_fallback()
-                    self.current_model = model
-
-                    logger.info(f"🔄 Trying fallback: {provider}/{model}")
-
-                    # Generate with fallback
-                    if provider == 'gemini':
-                        full_prompt = prompt
-                        if system:
-                            full_prompt = f"{system}\n\n{prompt}"
-
-                        generation_config = {
-                            "temperature": temperature,
-                            "max_output_tokens": max_tokens,
-                        }
-
-                        response = client.generate_content(
-                            full_prompt,
-                            generation_config=generation_config
-                        )
-                        result = response.text
-                    else:
-                        messages = []
-                        if system:
-                            messages.append({"role": "system", "content": system})
-                        messages.append({"role": "user", "content": prompt})
-
-                        response = client.chat.completions.create(
-                            model=model,
-                            messages=messages,
-                            temperature=temperature,
-                            max_tokens=max_tokens
-                        )
-                        result = response.choices[0].message.content
-
-                    logger.info(f"✅ Successfully generated completion using fallback {provider}/{model}")
-                    return result
-
-                except Exception as fallback_error:
-                    logger.error(f"❌ Fallback also failed: {fallback_error}")
-                    break
+        Fallback to the next provider is only possible before the first delta
+        was yielded; a failure mid-stream is raised to the caller.
+
+        Args:
+            prompt: User prompt
+            system: System message (optional)
+            temperature: Temperature for generation
+            max_tokens: Maximum tokens to generate
+
+        Yields:
+            Generated text fragments
+        """
+        last_error = None
+        for client, model, provider in self.ranked_providers():
+            self.current_provider = provider
+            self.current_model = model
+            logger.info(f"🤖 Streaming with {provider}: {model}")
+            key = LatencyTracker.key(provider, model)
+            started = False
+            # Breaker passed but no outcome recorded yet (holds the half-open probe)
+            unsettled = False
+            started_at = time.monotonic()
 
-        raise Exception(f"Все провайдеры недоступны после {self.max_retries} попыток. Попробуйте позже.")
+            try:
+                self._reserve(provider, prompt, system, max_tokens)
+                unsettled = True
+                started_at = time.monotonic()
+
+                for delta in self._stream_from_provider(
+                    client, model, provider, prompt, system, temperature, max_tokens
+                ):
+                    started = True
+                    yield delta
+
+                unsettled = False
+                self.latency.record(key, time.monotonic() - started_at, ok=True)
+                self.breakers[provider].record_success()
+                logger.info(f"✅ Successfully streamed completion using {provider}/{model}")
+                return
+
+            except (CircuitOpen, BudgetExceeded) as e:
+                logger.warning(f"⏭️ Skipping {provider}/{model}: {e}")
+                last_error = e
+                continue
 
+            except Exception as e:
+                unsettled = False
+                self.latency.record(key, time.monotonic() - started_at, ok=False)
+                self._record_failure(provider, e)
+                logger.error(f"❌ Streaming error with {provider}/{model}: {e}")
+                if started:
+                    raise
+                last_error = e
+
+            finally:
+                # Consumer closed the stream early (GeneratorExit): the provider
+                # was neither proven healthy nor failed, so free the probe slot
+                if unsettled:
+                    self.breakers[provider].release_probe()
+
+        raise Exception(f"Все провайдеры недоступны: {last_error}")
 
     def analyze_image(self,
                      image_data: bytes,
@@ -275,6 +579,53 @@ def generate_completion(prompt: str,
     return llm_router.generate_completion(prompt, system, temperature, max_tokens)
 
 
+def generate_completion_stream(prompt: str,
+                               system: Optional[str] = None,
+                               temperature: float = 0.2,
+                               max_tokens: int = 2000) -> Iterator[str]:
+    """Convenience function for streaming completions"""
+    return llm_router.generate_completion_stream(prompt, system, temperature, max_tokens)
+
+
+async def stream_completion_async(prompt: str,
+                                  system: Optional[str] = None,
+                                  temperature: float = 0.2,
+                                  max_tokens: int = 2000) -> AsyncIterator[str]:
+    """
+    Async wrapper over the blocking streaming SDKs
+
+    The provider stream is consumed in a worker thread and deltas are handed
+    to the event loop through a queue, so the loop is never blocked.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    done = object()
+    cancelled = threading.Event()
+
+    def produce():
+        try:
+            for delta in generate_completion_stream(prompt, system, temperature, max_tokens):
+                if cancelled.is_set():
+                    break
+                loop.call_soon_threadsafe(queue.put_nowait, delta)
+            loop.call_soon_threadsafe(queue.put_nowait, done)
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, e)
+
+    worker = loop.run_in_executor(None, produce)
+    try:
+        while True:
+            item = await queue.get()
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        cancelled.set()
+        await asyncio.shield(worker)
+
+
 def analyze_image(image_data: bytes,
                  prompt: str,
                  temperature: float = 0.3,
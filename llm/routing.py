@@ -0,0 +1,269 @@
+"""
+Routing primitives for LLM providers
+Rolling latency/error statistics, circuit breakers and RPM/TPM budgets
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+class LatencyTracker:
+    """
+    Rolling window of request outcomes per provider/model
+
+    Thread-safe: completions run in executor threads, so samples may be
+    recorded concurrently.
+    """
+
+    def __init__(self,
+                 window: int = 50,
+                 min_samples: int = 5,
+                 max_error_rate: float = 0.5,
+                 max_age: float = 600.0):
+        """
+        Args:
+            window: Samples kept per provider/model
+            min_samples: Samples needed before latency is trusted for ranking
+            max_error_rate: Error rate above which a provider is considered unhealthy
+            max_age: Samples older than this (seconds) are ignored
+        """
+        self.window = window
+        self.min_samples = min_samples
+        self.max_error_rate = max_error_rate
+        self.max_age = max_age
+        self._samples: Dict[str, Deque[Tuple[float, float, bool]]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(provider: str, model: str) -> str:
+        return f"{provider}/{model}"
+
+    def record(self, key: str, latency: float, ok: bool):
+        """Record one request outcome (latency in seconds)"""
+        with self._lock:
+            samples = self._samples.setdefault(key, deque(maxlen=self.window))
+            samples.append((time.monotonic(), latency, ok))
+
+    def _recent(self, key: str) -> List[Tuple[float, float, bool]]:
+        cutoff = time.monotonic() - self.max_age
+        with self._lock:
+            return [s for s in self._samples.get(key, ()) if s[0] >= cutoff]
+
+    def stats(self, key: str) -> Dict[str, float]:
+        """p50/p95 latency of successful requests and error rate"""
+        recent = self._recent(key)
+        latencies = sorted(latency for _, latency, ok in recent if ok)
+        errors = sum(1 for _, _, ok in recent if not ok)
+        return {
+            'samples': len(recent),
+            'p50': _percentile(latencies, 0.5),
+            'p95': _percentile(latencies, 0.95),
+            'error_rate': errors / len(recent) if recent else 0.0,
+        }
+
+    def is_healthy(self, key: str) -> bool:
+        stats = self.stats(key)
+        return stats['samples'] < self.min_samples or stats['error_rate'] <= self.max_error_rate
+
+    def p95(self, key: str) -> Optional[float]:
+        """p95 latency, or None while there are too few successful samples"""
+        recent = self._recent(key)
+        latencies = sorted(latency for _, latency, ok in recent if ok)
+        if len(latencies) < self.min_samples:
+            return None
+        return _percentile(latencies, 0.95)
+
+    def rank(self, keys: List[str]) -> List[str]:
+        """
+        Order keys: healthy before unhealthy, then by p50 latency
+
+        Keys without enough samples keep their configured order and are
+        placed ahead of measured ones, so every provider gets sampled.
+        """
+        def sort_key(item):
+            position, key = item
+            stats = self.stats(key)
+            healthy = self.is_healthy(key)
+            if stats['samples'] < self.min_samples:
+                return (0 if healthy else 1, 0, 0.0, position)
+            # Penalise error-prone providers proportionally to their error rate
+            score = stats['p50'] * (1 + stats['error_rate'] * 4)
+            return (0 if healthy else 1, 1, score, position)
+
+        return [key for _, key in sorted(enumerate(keys), key=sort_key)]
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            keys = list(self._samples)
+        return {key: self.stats(key) for key in keys}
+
+
+class BudgetExceeded(Exception):
+    """Provider quota budget could not be acquired within the wait limit"""
+
+
+class CircuitOpen(Exception):
+    """Provider circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """
+    Per-provider circuit breaker: closed → open → half-open → closed
+
+    A rate-limit response opens the circuit immediately; other errors open
+    it after failure_threshold consecutive failures. After reset_timeout a
+    single probe request is let through (half-open).
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.open_for = reset_timeout
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def _current_state(self, now: float) -> str:
+        if self.state == self.OPEN and now - self.opened_at >= self.open_for:
+            self.state = self.HALF_OPEN
+            self._probe_in_flight = False
+        return self.state
+
+    def available(self) -> bool:
+        """Could a request be sent now (does not reserve the probe)"""
+        with self._lock:
+            state = self._current_state(time.monotonic())
+            return state == self.CLOSED or (state == self.HALF_OPEN and not self._probe_in_flight)
+
+    def allow(self) -> bool:
+        """Reserve permission to send a request"""
+        with self._lock:
+            state = self._current_state(time.monotonic())
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def release_probe(self):
+        """Return an unused half-open probe slot"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self, rate_limited: bool = False, retry_after: Optional[float] = None):
+        with self._lock:
+            self.failures += 1
+            if rate_limited or self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self.open_for = max(self.reset_timeout, retry_after or 0.0)
+                self._probe_in_flight = False
+
+
+class ProviderBudget:
+    """
+    Token buckets mirroring a provider's requests-per-minute and
+    tokens-per-minute quotas, shared by all threads
+
+    acquire() queues the caller until both buckets have capacity, so
+    parallel users wait their turn instead of producing 429 storms.
+    """
+
+    def __init__(self, rpm: float, tpm: float):
+        """
+        Args:
+            rpm: Requests per minute (0 - unlimited)
+            tpm: Tokens per minute (0 - unlimited)
+        """
+        self.rpm = rpm
+        self.tpm = tpm
+        self._requests = float(rpm)
+        self._tokens = float(tpm)
+        self._updated = time.monotonic()
+        self._cond = threading.Condition()
+        self.waiting = 0
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        if elapsed > 0:
+            if self.rpm:
+                self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60)
+            if self.tpm:
+                self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60)
+            self._updated = now
+
+    def _wait_time(self, cost: float) -> float:
+        wait_requests = 0.0
+        wait_tokens = 0.0
+        if self.rpm and self._requests < 1:
+            wait_requests = (1 - self._requests) * 60 / self.rpm
+        if self.tpm and self._tokens < cost:
+            wait_tokens = (cost - self._tokens) * 60 / self.tpm
+        return max(wait_requests, wait_tokens)
+
+    def acquire(self, tokens: int, timeout: float) -> bool:
+        """
+        Wait (blocking the calling worker thread) until the request fits the budget
+
+        Returns:
+            False if the budget did not free up within timeout
+        """
+        cost = min(tokens, self.tpm) if self.tpm else 0
+        deadline = time.monotonic() + timeout
+
+        with self._cond:
+            self.waiting += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    wait_for = self._wait_time(cost)
+                    if wait_for <= 0:
+                        if self.rpm:
+                            self._requests -= 1
+                        if self.tpm:
+                            self._tokens -= cost
+                        return True
+                    if now + wait_for > deadline:
+                        return False
+                    self._cond.wait(wait_for)
+            finally:
+                self.waiting -= 1
+
+    def drain(self):
+        """Provider answered 429: assume the remote quota is exhausted"""
+        with self._cond:
+            self._refill(time.monotonic())
+            self._requests = min(self._requests, 0.0)
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._cond:
+            self._refill(time.monotonic())
+            return {
+                'requests_left': round(self._requests, 1),
+                'tokens_left': round(self._tokens),
+                'waiting': self.waiting,
+            }
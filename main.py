@@ -9,9 +9,11 @@ from pathlib import Path
 
 from bot.core.bot import RefactoredBot
 from bot.state_manager import StateManager
+from bot.state_backends import create_state_backend
 from config import config
 from database import Database
 from audio_processor import AudioProcessor
+from asr.cache import create_transcript_cache
 from file_processor import FileProcessor
 from youtube_processor import YouTubeProcessor
 from url_processor import URLProcessor
@@ -38,7 +40,11 @@ async def main():
 
     # Инициализация state manager
     logger.info("Инициализация state manager...")
-    state_manager = StateManager()
+    state_manager = StateManager(
+        backend=create_state_backend(config),
+        max_users=config.STATE_MAX_USERS,
+        ttl_seconds=config.STATE_TTL_SECONDS,
+    )
 
     # Инициализация Groq клиента (если доступен)
     groq_client = None
@@ -61,10 +67,10 @@ async def main():
     # Инициализация процессоров
     logger.info("Инициализация процессоров...")
 
-    # AudioProcessor принимает только groq_client и max_file_size_mb
     audio_processor = AudioProcessor(
         groq_client=groq_client,
-        max_file_size_mb=50
+        max_file_size_mb=50,
+        transcript_cache=create_transcript_cache(config)
     )
 
     # FileProcessor не принимает параметров
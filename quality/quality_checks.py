@@ -3,7 +3,10 @@
 """
 
 import re
+import hashlib
 import logging
+import threading
+from collections import OrderedDict
 from typing import Set, Tuple, List, Dict
 try:
     from lingua import Language, LanguageDetectorBuilder
@@ -16,24 +19,10 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
-def extract_critical_numbers(text: str) -> Set[str]:
-    """
-    Извлекает критически важные числа из текста
-    
-    Returns:
-        Множество строк с критичными числами/фактами
-    """
-    critical_patterns = [
-        # Проценты
-        r'\b\d+(?:[,.]?\d+)?%',
-        # Валюты
-        r'\d+(?:\s?\d{3})*(?:[,.]?\d+)?\s*(?:₽|руб\.?|рублей?)',
-        r'\$\s*\d+(?:\s?\d{3})*(?:[,.]?\d+)?',
-        r'€\s*\d+(?:\s?\d{3})*(?:[,.]?\d+)?',
-        # Большие числа
-        r'\d+(?:[,.]?\d+)?\s*(?:млн\.?|миллион[ов]?|млрд\.?|миллиард[ов]?|тыс\.?|тысяч[и]?)',
-        # Диапазоны
-        r'\d+(?:[,.]?\d+)?\s*[-–—]\s*\d+(?:[,.]?\d+)?',
+# Критичные числа одним регулярным выражением. Альтернативы упорядочены от
+# специфичных к общим: каждое число в тексте попадает ровно в одну из них
+CRITICAL_NUMBER_RE = re.compile(
+    '|'.join([
         # Даты
         r'\b\d{1,2}[./]\d{1,2}[./]\d{2,4}\b',
         r'\b\d{1,2}\s+(?:января|февраля|марта|апреля|мая|июня|июля|августа|сентября|октября|ноября|декабря)\b',
@@ -41,22 +30,70 @@ def extract_critical_numbers(text: str) -> Set[str]:
         r'\b\d{1,2}:\d{2}\b',
         # Базисные пункты
         r'[+-]?\d+(?:[,.]?\d+)?\s*б\.п\.',
-        # Годы
-        r'\b20\d{2}\b',
-        # Номера/коды
-        r'\b\d{3,}\b'
-    ]
-    
-    critical_numbers = set()
-    
-    for pattern in critical_patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
-        for match in matches:
-            # Нормализуем для сравнения
-            normalized = re.sub(r'\s+', ' ', match.strip())
-            critical_numbers.add(normalized)
+        # Валюты
+        r'\$\s*\d+(?:\s?\d{3})*(?:[,.]?\d+)?',
+        r'€\s*\d+(?:\s?\d{3})*(?:[,.]?\d+)?',
+        r'\d+(?:\s?\d{3})*(?:[,.]?\d+)?\s*(?:₽|руб\.?|рублей?)',
+        # Большие числа
+        r'\d+(?:[,.]?\d+)?\s*(?:млн\.?|миллион[ов]?|млрд\.?|миллиард[ов]?|тыс\.?|тысяч[и]?)',
+        # Проценты
+        r'\b\d+(?:[,.]?\d+)?%',
+        # Диапазоны
+        r'\d+(?:[,.]?\d+)?\s*[-–—]\s*\d+(?:[,.]?\d+)?',
+        # Годы, номера/коды
+        r'\b\d{3,}\b',
+    ]),
+    re.IGNORECASE
+)
+
+_WHITESPACE_RE = re.compile(r'\s+')
+_MATCH_KEY_RE = re.compile(r'[^\d,.\-–—%₽$€а-яa-z]')
+
+
+# Индексы последних текстов по их хешу: сами тексты (целые документы) не храним
+_INDEX_CACHE_SIZE = 4
+_index_cache: "OrderedDict[bytes, Dict[str, str]]" = OrderedDict()
+_index_cache_lock = threading.Lock()
+
+
+def _critical_number_index(text: str) -> Dict[str, str]:
+    """
+    Один проход по тексту: ключ сравнения -> число в исходной записи
+
+    Ключ (без пробелов и регистра) вычисляется один раз на число. Индексы
+    нескольких последних текстов кешируются по хешу, поэтому повторные
+    проверки качества одного исходного текста не сканируют его заново.
+    """
+    if not any(ch.isdigit() for ch in text):
+        return {}
+
+    digest = hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+    with _index_cache_lock:
+        index = _index_cache.get(digest)
+        if index is not None:
+            _index_cache.move_to_end(digest)
+            return index
+
+    index = {}
+    for match in CRITICAL_NUMBER_RE.finditer(text):
+        normalized = _WHITESPACE_RE.sub(' ', match.group().strip())
+        index.setdefault(_MATCH_KEY_RE.sub('', normalized.lower()), normalized)
+
+    with _index_cache_lock:
+        _index_cache[digest] = index
+        while len(_index_cache) > _INDEX_CACHE_SIZE:
+            _index_cache.popitem(last=False)
+    return index
+
+
+def extract_critical_numbers(text: str) -> Set[str]:
+    """
+    Извлекает критически важные числа из текста
     
-    return critical_numbers
+    Returns:
+        Множество строк с критичными числами/фактами
+    """
+    return set(_critical_number_index(text).values())
 
 
 def validate_numbers_preserved(source_text: str, summary_text: str) -> Tuple[bool, List[str]]:
@@ -66,29 +103,11 @@ def validate_numbers_preserved(source_text: str, summary_text: str) -> Tuple[boo
     Returns:
         Tuple[bool, List[str]]: (все_числа_сохранены, список_потерянных_чисел)
     """
-    source_numbers = extract_critical_numbers(source_text)
-    summary_numbers = extract_critical_numbers(summary_text)
-    
-    missing_numbers = []
+    source_index = _critical_number_index(source_text)
+    summary_keys = _critical_number_index(summary_text).keys()
     
-    for source_num in source_numbers:
-        found = False
-        
-        # Прямое совпадение
-        if source_num in summary_numbers:
-            found = True
-        else:
-            # Нечеткое совпадение (игнорируем пробелы и регистр)
-            source_normalized = re.sub(r'[^\d,.\-–—%₽$€а-яa-z]', '', source_num.lower())
-            
-            for summary_num in summary_numbers:
-                summary_normalized = re.sub(r'[^\d,.\-–—%₽$€а-яa-z]', '', summary_num.lower())
-                if source_normalized == summary_normalized:
-                    found = True
-                    break
-        
-        if not found:
-            missing_numbers.append(source_num)
+    # Сравнение по ключам без пробелов и регистра - поиск в словаре вместо вложенного цикла
+    missing_numbers = [raw for key, raw in source_index.items() if key not in summary_keys]
     
     all_preserved = len(missing_numbers) == 0
     return all_preserved, missing_numbers
@@ -11,6 +11,7 @@ from bot.core.bot import RefactoredBot
 from config import config
 from database import Database
 from state_manager import StateManager
+from bot.state_backends import create_state_backend
 from smart_summarizer import SmartSummarizer
 from audio_processor import AudioProcessor
 from file_processor import FileProcessor
@@ -39,7 +40,11 @@ async def main():
 
     # Инициализация state manager
     logger.info("Инициализация state manager...")
-    state_manager = StateManager()
+    state_manager = StateManager(
+        backend=create_state_backend(config),
+        max_users=config.STATE_MAX_USERS,
+        ttl_seconds=config.STATE_TTL_SECONDS,
+    )
 
     # Инициализация Groq клиента (если доступен)
     groq_client = None
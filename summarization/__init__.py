@@ -4,11 +4,14 @@
 
 from .pipeline import SummarizationPipeline, summarize_text_pipeline
 from .fact_extractor import FactExtractor, extract_key_facts, select_must_keep_sentences
+from .ner_registry import ner_registry, extract_entities_many
 
 __all__ = [
     'SummarizationPipeline',
     'summarize_text_pipeline', 
     'FactExtractor',
     'extract_key_facts',
-    'select_must_keep_sentences'
+    'select_must_keep_sentences',
+    'ner_registry',
+    'extract_entities_many'
 ]
\ No newline at end of file
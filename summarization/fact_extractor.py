@@ -6,6 +6,10 @@ import re
 import logging
 from typing import Dict, List, Set, Optional, Literal, Union
 from datetime import datetime
+from functools import lru_cache
+
+from utils.segmentation import iter_sentence_spans
+from .ner_registry import NERModelRegistry, ner_registry
 try:
     import dateparser
 except ImportError:
@@ -24,239 +28,144 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
-# Lazy imports for optional dependencies
-natasha = None
-spacy = None
+_NUM = r'\d+(?:[,.]?\d+)?'
+_GROUPED_NUM = r'\d+(?:\s?\d{3})*(?:[,.]?\d+)?'
 
-def _import_natasha():
-    """Lazy import for natasha"""
-    global natasha
-    if natasha is None:
-        try:
-            from natasha import (
-                Segmenter, MorphVocab, NewsEmbedding, NewsMorphTagger,
-                NewsSyntaxParser, NewsNERTagger, PER, LOC, ORG, Doc
-            )
-            natasha = {
-                'Segmenter': Segmenter,
-                'MorphVocab': MorphVocab,
-                'NewsEmbedding': NewsEmbedding,
-                'NewsMorphTagger': NewsMorphTagger,
-                'NewsSyntaxParser': NewsSyntaxParser,
-                'NewsNERTagger': NewsNERTagger,
-                'PER': PER, 'LOC': LOC, 'ORG': ORG,
-                'Doc': Doc
-            }
-        except ImportError:
-            logger.warning("Natasha not available, falling back to regex-only mode")
-            natasha = {}
-    return natasha
+# Все типы чисел одним регулярным выражением: внешняя группа задает тип
+# (match.lastgroup), внутренние - значение. Порядок альтернатив - от
+# более специфичных к общим, поэтому каждое число попадает в один тип.
+NUMBER_RE = re.compile(
+    rf'(?P<currency_usd>(?:\$|USD\s*)(?P<usd_value>{_GROUPED_NUM}))'
+    rf'|(?P<currency_eur>(?:€|EUR\s*)(?P<eur_value>{_GROUPED_NUM}))'
+    rf'|(?P<currency_rub>(?P<rub_value>{_GROUPED_NUM})\s*(?:₽|рубл(?:ей|я|ь)|руб\.?))'
+    rf'|(?P<billions>(?P<bln_value>{_NUM})\s*(?:млрд\.?|миллиард[ов]?))'
+    rf'|(?P<millions>(?P<mln_value>{_NUM})\s*(?:млн\.?|миллион[ов]?))'
+    rf'|(?P<thousands>(?P<ths_value>{_NUM})\s*(?:тыс\.?|тысяч[и]?))'
+    rf'|(?P<basis_points>(?P<bp_value>[+-]?{_NUM})\s*б\.п\.)'
+    rf'|(?P<percentage>\b(?P<pct_value>{_NUM})\s*%)'
+    rf'|(?P<range>(?P<range_start>{_NUM})\s*[-–—]\s*(?P<range_end>{_NUM}))'
+    rf'|(?P<decimal>\b(?P<decimal_value>\d+[,.]?\d+)\b)',
+    re.IGNORECASE
+)
+
+_CURRENCY_UNITS = {
+    'currency_rub': ('rub_value', 'RUB'),
+    'currency_usd': ('usd_value', 'USD'),
+    'currency_eur': ('eur_value', 'EUR'),
+}
+_MULTIPLIERS = {
+    'billions': ('bln_value', 1000000000),
+    'millions': ('mln_value', 1000000),
+    'thousands': ('ths_value', 1000),
+}
+
+_MONTHS_GEN = r'января|февраля|марта|апреля|мая|июня|июля|августа|сентября|октября|ноября|декабря'
+DATE_RE = re.compile(
+    rf'\b(?:к|до)\s+\d{{1,2}}\s+(?:{_MONTHS_GEN})(?:\s+\d{{4}})?\b'
+    rf'|\b\d{{1,2}}\s+(?:{_MONTHS_GEN})\s+(?:\d{{4}})?\b'
+    r'|\b\d{1,2}[./]\d{1,2}[./]\d{2,4}\b'
+    r'|\b(?:январ[ья]|феврал[ья]|март[ае]|апрел[ья]|ма[ея]|июн[ья]|июл[ья]|август[ае]'
+    r'|сентябр[ья]|октябр[ья]|ноябр[ья]|декабр[ья])\s+(?:\d{4})?\b'
+    r'|\b(?:понедельник|вторник|среда|четверг|пятница|суббота|воскресенье)\b'
+    r'|\b(?:завтра|послезавтра|вчера|позавчера|сегодня)\b'
+    r'|\b\d{1,2}:\d{2}\b',
+    re.IGNORECASE
+)
+
+
+def _to_float(raw: str) -> float:
+    return float(raw.replace(' ', '').replace(',', '.'))
+
+
+@lru_cache(maxsize=4096)
+def _parse_date(raw_text: str, languages: tuple) -> Optional[str]:
+    """Нормализация даты через dateparser (результаты кешируются - парсер медленный)"""
+    try:
+        parsed_date = dateparser.parse(raw_text, languages=list(languages))
+        return parsed_date.strftime('%Y-%m-%d') if parsed_date else None
+    except Exception:
+        return None
 
-def _import_spacy():
-    """Lazy import for spacy"""
-    global spacy
-    if spacy is None:
-        try:
-            import spacy as sp
-            spacy = sp
-        except ImportError:
-            logger.warning("spaCy not available, falling back to regex-only mode")
-            spacy = {}
-    return spacy
 
 class FactExtractor:
     """Извлекатель ключевых фактов из текста"""
     
-    def __init__(self):
-        self.natasha_components = None
-        self.spacy_en = None
-        self._init_components()
-    
-    def _init_components(self):
-        """Инициализация компонентов NER"""
-        # Natasha для русского
-        natasha_lib = _import_natasha()
-        if natasha_lib:
-            try:
-                segmenter = natasha_lib['Segmenter']()
-                morph_vocab = natasha_lib['MorphVocab']()
-                emb = natasha_lib['NewsEmbedding']()
-                morph_tagger = natasha_lib['NewsMorphTagger'](emb)
-                syntax_parser = natasha_lib['NewsSyntaxParser'](emb)
-                ner_tagger = natasha_lib['NewsNERTagger'](emb)
-                
-                self.natasha_components = {
-                    'segmenter': segmenter,
-                    'morph_vocab': morph_vocab,
-                    'morph_tagger': morph_tagger,
-                    'syntax_parser': syntax_parser,
-                    'ner_tagger': ner_tagger,
-                    'constants': natasha_lib
-                }
-                logger.info("Natasha components initialized")
-            except Exception as e:
-                logger.warning(f"Failed to initialize Natasha: {e}")
-        
-        # spaCy для английского
-        spacy_lib = _import_spacy()
-        if spacy_lib:
-            try:
-                self.spacy_en = spacy_lib.load("en_core_web_sm")
-                logger.info("spaCy EN model loaded")
-            except Exception as e:
-                logger.warning(f"spaCy EN model not available: {e}")
+    def __init__(self, use_ner: bool = True, registry: Optional[NERModelRegistry] = None):
+        """
+        Args:
+            use_ner: Извлекать именованные сущности (False - только regex)
+            registry: Реестр NER моделей (по умолчанию общий для процесса)
+        """
+        self.use_ner = use_ner
+        self.registry = registry or ner_registry
 
     def extract_numbers(self, text: str) -> List[Dict]:
-        """Извлечение чисел, валют, процентов, диапазонов"""
+        """Извлечение чисел, валют, процентов, диапазонов (один проход по тексту)"""
         numbers = []
         
-        # Паттерны для различных типов чисел
-        patterns = {
-            'percentage': r'\b(\d+(?:[,.]?\d+)?)\s*%',
-            'currency_rub': r'(\d+(?:\s?\d{3})*(?:[,.]?\d+)?)\s*(?:₽|руб\.?|рублей?)',
-            'currency_usd': r'(?:\$|USD\s*)(\d+(?:\s?\d{3})*(?:[,.]?\d+)?)',
-            'currency_eur': r'(?:€|EUR\s*)(\d+(?:\s?\d{3})*(?:[,.]?\d+)?)',
-            'millions': r'(\d+(?:[,.]?\d+)?)\s*(?:млн\.?|миллион[ов]?)',
-            'billions': r'(\d+(?:[,.]?\d+)?)\s*(?:млрд\.?|миллиард[ов]?)',
-            'thousands': r'(\d+(?:[,.]?\d+)?)\s*(?:тыс\.?|тысяч[и]?)',
-            'decimal': r'\b(\d+[,.]?\d+)\b',
-            'range': r'(\d+(?:[,.]?\d+)?)\s*[-–—]\s*(\d+(?:[,.]?\d+)?)',
-            'basis_points': r'([+-]?\d+(?:[,.]?\d+)?)\s*б\.п\.',
-        }
-        
-        for number_type, pattern in patterns.items():
-            for match in re.finditer(pattern, text, re.IGNORECASE):
-                raw_text = match.group(0)
-                
+        for match in NUMBER_RE.finditer(text):
+            number_type = match.lastgroup
+            raw_text = match.group(0)
+            
+            try:
                 if number_type == 'percentage':
-                    norm_value = float(match.group(1).replace(',', '.')) / 100
+                    norm_value = _to_float(match.group('pct_value')) / 100
                     unit = '%'
-                elif 'currency' in number_type:
-                    raw_num = match.group(1).replace(' ', '').replace(',', '.')
-                    norm_value = float(raw_num)
-                    unit = 'RUB' if 'rub' in number_type else ('USD' if 'usd' in number_type else 'EUR')
-                elif number_type in ['millions', 'billions', 'thousands']:
-                    raw_num = match.group(1).replace(',', '.')
-                    multiplier = 1000000 if 'millions' in number_type else (1000000000 if 'billions' in number_type else 1000)
-                    norm_value = float(raw_num) * multiplier
+                elif number_type in _CURRENCY_UNITS:
+                    norm_value = _to_float(match.group(_CURRENCY_UNITS[number_type][0]))
+                    unit = _CURRENCY_UNITS[number_type][1]
+                elif number_type in _MULTIPLIERS:
+                    group, multiplier = _MULTIPLIERS[number_type]
+                    norm_value = _to_float(match.group(group)) * multiplier
                     unit = 'count'
                 elif number_type == 'range':
-                    start = float(match.group(1).replace(',', '.'))
-                    end = float(match.group(2).replace(',', '.'))
-                    norm_value = [start, end]
+                    norm_value = [_to_float(match.group('range_start')), _to_float(match.group('range_end'))]
                     unit = 'range'
                 elif number_type == 'basis_points':
-                    norm_value = float(match.group(1).replace(',', '.')) / 10000
+                    norm_value = _to_float(match.group('bp_value')) / 10000
                     unit = 'bp'
                 else:
-                    norm_value = float(match.group(1).replace(',', '.'))
+                    norm_value = _to_float(match.group('decimal_value'))
                     unit = None
-                
-                numbers.append({
-                    'raw': raw_text,
-                    'norm': norm_value,
-                    'unit': unit,
-                    'type': number_type,
-                    'position': match.span()
-                })
+            except ValueError:
+                continue
+            
+            numbers.append({
+                'raw': raw_text,
+                'norm': norm_value,
+                'unit': unit,
+                'type': number_type,
+                'position': match.span()
+            })
         
         return numbers
 
     def extract_dates(self, text: str, lang: str = 'ru') -> List[Dict]:
-        """Извлечение дат и временных периодов"""
+        """Извлечение дат и временных периодов (один проход по тексту)"""
         dates = []
+        languages = ('ru', 'en') if lang == 'ru' else ('en', 'ru')
         
-        # Паттерны для дат
-        date_patterns = [
-            r'\b(\d{1,2})\s+(января|февраля|марта|апреля|мая|июня|июля|августа|сентября|октября|ноября|декабря)\s+(\d{4})?\b',
-            r'\b(\d{1,2})[./](\d{1,2})[./](\d{2,4})\b',
-            r'\b(к|до)\s+(\d{1,2})\s+(января|февраля|марта|апреля|мая|июня|июля|августа|сентября|октября|ноября|декабря)\b',
-            r'\b(январ[ья]|феврал[ья]|март[ае]|апрел[ья]|ма[ея]|июн[ья]|июл[ья]|август[ае]|сентябр[ья]|октябр[ья]|ноябр[ья]|декабр[ья])\s+(\d{4})?\b',
-            r'\b(понедельник|вторник|среда|четверг|пятница|суббота|воскресенье)\b',
-            r'\b(завтра|послезавтра|вчера|позавчера|сегодня)\b',
-            r'\b(\d{1,2}):(\d{2})\b'
-        ]
-        
-        for pattern in date_patterns:
-            for match in re.finditer(pattern, text, re.IGNORECASE):
-                raw_text = match.group(0)
-                
-                # Пытаемся парсить дату через dateparser
-                try:
-                    parsed_date = dateparser.parse(
-                        raw_text, 
-                        languages=['ru', 'en'] if lang == 'ru' else ['en', 'ru']
-                    )
-                    norm_date = parsed_date.strftime('%Y-%m-%d') if parsed_date else None
-                except:
-                    norm_date = None
-                
-                dates.append({
-                    'raw': raw_text,
-                    'norm': norm_date,
-                    'position': match.span()
-                })
+        for match in DATE_RE.finditer(text):
+            raw_text = match.group(0)
+            dates.append({
+                'raw': raw_text,
+                'norm': _parse_date(raw_text.lower(), languages),
+                'position': match.span()
+            })
         
         return dates
 
     def extract_entities_natasha(self, text: str) -> Dict[str, List[str]]:
         """Извлечение именованных сущностей через Natasha (русский)"""
-        if not self.natasha_components:
-            return {'PERSON': [], 'ORG': [], 'GPE': []}
-        
-        try:
-            doc = self.natasha_components['constants']['Doc'](text)
-            doc.segment(self.natasha_components['segmenter'])
-            doc.tag_morph(self.natasha_components['morph_tagger'])
-            doc.parse_syntax(self.natasha_components['syntax_parser'])
-            doc.tag_ner(self.natasha_components['ner_tagger'])
-            
-            entities = {'PERSON': [], 'ORG': [], 'GPE': []}
-            
-            for span in doc.spans:
-                if span.type == self.natasha_components['constants']['PER'].name:
-                    entities['PERSON'].append(span.text)
-                elif span.type == self.natasha_components['constants']['ORG'].name:
-                    entities['ORG'].append(span.text)
-                elif span.type == self.natasha_components['constants']['LOC'].name:
-                    entities['GPE'].append(span.text)
-            
-            # Убираем дубликаты
-            for key in entities:
-                entities[key] = list(set(entities[key]))
-            
-            return entities
-        
-        except Exception as e:
-            logger.warning(f"Natasha NER failed: {e}")
+        if not self.use_ner:
             return {'PERSON': [], 'ORG': [], 'GPE': []}
+        return self.registry.extract_entities_many([text], 'ru')[0]
 
     def extract_entities_spacy(self, text: str) -> Dict[str, List[str]]:
         """Извлечение именованных сущностей через spaCy (английский)"""
-        if not self.spacy_en:
-            return {'PERSON': [], 'ORG': [], 'GPE': []}
-        
-        try:
-            doc = self.spacy_en(text)
-            entities = {'PERSON': [], 'ORG': [], 'GPE': []}
-            
-            for ent in doc.ents:
-                if ent.label_ == 'PERSON':
-                    entities['PERSON'].append(ent.text)
-                elif ent.label_ == 'ORG':
-                    entities['ORG'].append(ent.text)
-                elif ent.label_ in ['GPE', 'LOC']:
-                    entities['GPE'].append(ent.text)
-            
-            # Убираем дубликаты
-            for key in entities:
-                entities[key] = list(set(entities[key]))
-            
-            return entities
-        
-        except Exception as e:
-            logger.warning(f"spaCy NER failed: {e}")
+        if not self.use_ner:
             return {'PERSON': [], 'ORG': [], 'GPE': []}
+        return self.registry.extract_entities_many([text], 'en')[0]
 
     def extract_key_facts(self, text: str, lang: Literal["ru", "en"] = "ru") -> Dict:
         """
@@ -271,8 +180,7 @@ class FactExtractor:
             }
         """
         # Разбиваем на предложения
-        sentences = re.split(r'[.!?]+', text)
-        sentences = [s.strip() for s in sentences if s.strip()]
+        sentence_spans = list(iter_sentence_spans(text))
         
         # Извлекаем числа и валюты
         numbers = self.extract_numbers(text)
@@ -284,35 +192,39 @@ class FactExtractor:
         else:
             entities = self.extract_entities_spacy(text)
         
-        # Привязываем числа к предложениям
+        # Привязываем числа к предложениям: числа и предложения отсортированы
+        # по смещению, поэтому хватает одного совместного прохода
         sentences_with_numbers = []
         money_facts = []
         
-        for i, sentence in enumerate(sentences):
+        numbers_by_pos = sorted(numbers, key=lambda n: n['position'][0])
+        num_i = 0
+        
+        for i, (start_pos, end_pos) in enumerate(sentence_spans):
             sentence_numbers = []
-            sentence_money = []
             
-            # Ищем числа в этом предложении
-            for num in numbers:
-                start_pos = sum(len(sentences[j]) + 1 for j in range(i))
-                end_pos = start_pos + len(sentence)
+            # Числа вне предложений (в пробелах между ними) пропускаем
+            while num_i < len(numbers_by_pos) and numbers_by_pos[num_i]['position'][0] < start_pos:
+                num_i += 1
+            
+            while num_i < len(numbers_by_pos) and numbers_by_pos[num_i]['position'][0] < end_pos:
+                num = numbers_by_pos[num_i]
+                sentence_numbers.append(num)
                 
-                if start_pos <= num['position'][0] <= end_pos:
-                    sentence_numbers.append(num)
-                    
-                    # Выделяем денежные суммы
-                    if num['unit'] in ['RUB', 'USD', 'EUR']:
-                        money_facts.append({
-                            'raw': num['raw'],
-                            'norm': num['norm'],
-                            'currency': num['unit'],
-                            'sentence_i': i
-                        })
+                # Выделяем денежные суммы
+                if num['unit'] in ['RUB', 'USD', 'EUR']:
+                    money_facts.append({
+                        'raw': num['raw'],
+                        'norm': num['norm'],
+                        'currency': num['unit'],
+                        'sentence_i': i
+                    })
+                num_i += 1
             
             if sentence_numbers:
                 sentences_with_numbers.append({
                     'i': i,
-                    'text': sentence,
+                    'text': text[start_pos:end_pos],
                     'numbers': sentence_numbers
                 })
         
@@ -343,13 +255,15 @@ class FactExtractor:
         return must_keep
 
 
+# Общий экземпляр: модели живут в реестре, сам извлекатель без состояния
+_default_extractor = FactExtractor()
+
+
 def extract_key_facts(text: str, lang: Literal["ru", "en"] = "ru") -> Dict:
     """Функция-обертка для извлечения ключевых фактов"""
-    extractor = FactExtractor()
-    return extractor.extract_key_facts(text, lang)
+    return _default_extractor.extract_key_facts(text, lang)
 
 
 def select_must_keep_sentences(facts: Dict, min_facts_per_sentence: int = 1) -> Set[int]:
     """Функция-обертка для выбора обязательных предложений"""
-    extractor = FactExtractor()
-    return extractor.select_must_keep_sentences(facts, min_facts_per_sentence)
\ No newline at end of file
+    return _default_extractor.select_must_keep_sentences(facts, min_facts_per_sentence)
\ No newline at end of file
@@ -0,0 +1,204 @@
+"""
+Реестр NER моделей процесса: ленивая загрузка, прогрев и учет памяти
+
+Модели Natasha и spaCy загружаются один раз на процесс при первом
+использовании (или заранее через warm_up) и переиспользуются всеми
+экземплярами FactExtractor.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Literal, Optional
+
+logger = logging.getLogger(__name__)
+
+EMPTY_ENTITIES = {'PERSON': [], 'ORG': [], 'GPE': []}
+
+
+def _current_rss_mb() -> Optional[float]:
+    """Текущий RSS процесса в МБ (Linux /proc, иначе psutil, иначе None)"""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        return None
+
+
+class NERModelRegistry:
+    """
+    Потокобезопасный реестр NER моделей.
+
+    Каждая модель загружается не более одного раза; неудачная загрузка
+    запоминается, чтобы не повторять ее на каждом запросе.
+    """
+
+    def __init__(self):
+        self._models: Dict[str, Any] = {}
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, name: str, loader) -> Any:
+        if name in self._models:
+            return self._models[name]
+
+        with self._lock:
+            if name in self._models:
+                return self._models[name]
+
+            rss_before = _current_rss_mb()
+            started = time.monotonic()
+            try:
+                model = loader()
+            except Exception as e:
+                logger.warning(f"NER модель {name} недоступна: {e}")
+                model = None
+            rss_after = _current_rss_mb()
+
+            self._stats[name] = {
+                'loaded': model is not None,
+                'load_seconds': round(time.monotonic() - started, 2),
+                'rss_delta_mb': (
+                    round(rss_after - rss_before, 1)
+                    if rss_before is not None and rss_after is not None else None
+                ),
+            }
+            self._models[name] = model
+            if model is not None:
+                logger.info(f"NER модель {name} загружена за {self._stats[name]['load_seconds']}s "
+                            f"(+{self._stats[name]['rss_delta_mb']} МБ)")
+            return model
+
+    @staticmethod
+    def _load_natasha() -> Optional[Dict[str, Any]]:
+        # Для NER достаточно сегментатора и NER теггера - морфология
+        # и синтаксис не нужны и не загружаются
+        from natasha import Segmenter, NewsEmbedding, NewsNERTagger, PER, LOC, ORG, Doc
+
+        emb = NewsEmbedding()
+        return {
+            'segmenter': Segmenter(),
+            'ner_tagger': NewsNERTagger(emb),
+            'constants': {'PER': PER, 'LOC': LOC, 'ORG': ORG, 'Doc': Doc},
+        }
+
+    @staticmethod
+    def _load_spacy_en():
+        import spacy
+        # Для сущностей нужен только ner - остальные компоненты не запускаем
+        return spacy.load(
+            "en_core_web_sm",
+            disable=["tagger", "parser", "attribute_ruler", "lemmatizer"]
+        )
+
+    def natasha(self) -> Optional[Dict[str, Any]]:
+        """Компоненты Natasha (None если библиотека недоступна)"""
+        return self._get('natasha', self._load_natasha)
+
+    def spacy_en(self):
+        """spaCy en_core_web_sm (None если недоступна)"""
+        return self._get('spacy_en', self._load_spacy_en)
+
+    def warm_up(self, languages: Iterable[str] = ('ru', 'en')):
+        """Заранее загрузить модели (например, при старте бота)"""
+        if 'ru' in languages:
+            self.natasha()
+        if 'en' in languages:
+            self.spacy_en()
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Время загрузки и прирост памяти по каждой модели"""
+        with self._lock:
+            return {name: dict(stats) for name, stats in self._stats.items()}
+
+    def extract_entities_many(
+        self,
+        texts: List[str],
+        lang: Literal["ru", "en"] = "ru",
+        n_process: int = 1,
+        batch_size: int = 32
+    ) -> List[Dict[str, List[str]]]:
+        """
+        Пакетное извлечение сущностей
+
+        Для английского используется nlp.pipe (батчи, опционально несколько
+        процессов), для русского - общий сегментатор и NER теггер Natasha.
+        """
+        if lang == 'en':
+            nlp = self.spacy_en()
+            if nlp is None:
+                return [_empty() for _ in texts]
+            try:
+                docs = nlp.pipe(texts, n_process=n_process, batch_size=batch_size)
+                return [_spacy_entities(doc) for doc in docs]
+            except Exception as e:
+                logger.warning(f"spaCy NER failed: {e}")
+                return [_empty() for _ in texts]
+
+        components = self.natasha()
+        if components is None:
+            return [_empty() for _ in texts]
+        return [_natasha_entities(components, text) for text in texts]
+
+
+def _empty() -> Dict[str, List[str]]:
+    return {key: [] for key in EMPTY_ENTITIES}
+
+
+def _natasha_entities(components: Dict[str, Any], text: str) -> Dict[str, List[str]]:
+    """Сущности одного текста через Natasha"""
+    try:
+        constants = components['constants']
+        doc = constants['Doc'](text)
+        doc.segment(components['segmenter'])
+        doc.tag_ner(components['ner_tagger'])
+
+        entities = _empty()
+        types = {
+            constants['PER'].name: 'PERSON',
+            constants['ORG'].name: 'ORG',
+            constants['LOC'].name: 'GPE',
+        }
+        for span in doc.spans:
+            key = types.get(span.type)
+            if key:
+                entities[key].append(span.text)
+
+        # Убираем дубликаты
+        return {key: list(set(values)) for key, values in entities.items()}
+
+    except Exception as e:
+        logger.warning(f"Natasha NER failed: {e}")
+        return _empty()
+
+
+def _spacy_entities(doc) -> Dict[str, List[str]]:
+    """Сущности из готового spaCy Doc"""
+    entities = _empty()
+    for ent in doc.ents:
+        if ent.label_ == 'PERSON':
+            entities['PERSON'].append(ent.text)
+        elif ent.label_ == 'ORG':
+            entities['ORG'].append(ent.text)
+        elif ent.label_ in ['GPE', 'LOC']:
+            entities['GPE'].append(ent.text)
+
+    # Убираем дубликаты
+    return {key: list(set(values)) for key, values in entities.items()}
+
+
+# Общий реестр процесса
+ner_registry = NERModelRegistry()
+
+
+def extract_entities_many(texts: List[str], lang: Literal["ru", "en"] = "ru",
+                          n_process: int = 1, batch_size: int = 32) -> List[Dict[str, List[str]]]:
+    """Функция-обертка для пакетного извлечения сущностей"""
+    return ner_registry.extract_entities_many(texts, lang, n_process, batch_size)
@@ -2,9 +2,9 @@
 Двухпроходная система суммаризации с гарантированным сохранением фактов
 """
 
+import asyncio
 import json
 import logging
-import re
 from typing import Dict, List, Optional, Literal, Union
 from pathlib import Path
 
@@ -16,7 +16,9 @@ from quality.quality_checks import (
     trim_to_length
 )
 from llm.provider_router import generate_completion
-from utils.language_detect import detect_language_simple, get_language_info, get_chunking_params
+from utils.language_detect import detect_language_simple, get_language_info
+from utils.chunking import chunk_text
+from utils.segmentation import split_sentences
 from config import config
 
 logger = logging.getLogger(__name__)
@@ -24,11 +26,39 @@ logger = logging.getLogger(__name__)
 class SummarizationPipeline:
     """Двухфазная система суммаризации с контролем качества"""
     
-    def __init__(self, groq_client=None, fallback_summarizer=None):
+    def __init__(self, groq_client=None, fallback_summarizer=None, use_router: bool = False):
         # Keep backward compatibility but use new LLM router
         self.groq_client = groq_client  # For backward compatibility
         self.fallback_summarizer = fallback_summarizer
+        # use_router=True: вызовы LLM идут через llm_router (Gemini → Groq), а не groq_client
+        self.use_router = use_router
         self.prompts = self._load_prompts()
+
+    def _llm_available(self) -> bool:
+        return self.use_router or self.groq_client is not None
+
+    async def _complete(self, system_prompt: str, user_prompt: str, temperature: float,
+                        max_tokens: int, json_mode: bool = False) -> str:
+        """Один вызов LLM (groq_client или роутер) вне event loop"""
+        if self.use_router:
+            call = lambda: generate_completion(
+                prompt=user_prompt, system=system_prompt,
+                temperature=temperature, max_tokens=max_tokens
+            )
+        else:
+            extra = {"response_format": {"type": "json_object"}} if json_mode else {}
+            call = lambda: self.groq_client.chat.completions.create(
+                model="llama-3.3-70b-versatile",
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_prompt}
+                ],
+                temperature=temperature,
+                max_tokens=max_tokens,
+                **extra
+            ).choices[0].message.content
+
+        return await asyncio.get_running_loop().run_in_executor(None, call)
     
     def _load_prompts(self) -> Dict[str, str]:
         """Загрузка промптов из файла"""
@@ -72,54 +102,11 @@ class SummarizationPipeline:
             'FALLBACK_PROMPT': """Создай краткое изложение с сохранением всех чисел и дат. В конце блок "🔢 Цифры и факты"."""
         }
     
-    def _split_into_chunks(self, text: str, max_chars: Optional[int] = None) -> List[str]:
-        """Разбивка текста на чанки с сохранением структуры"""
-        if max_chars is None:
-            # Use config-based chunking
-            chunking_params = get_chunking_params(text, config.SUM_CHUNK_TOKENS)
-            max_chars = chunking_params['max_chars']
-        
-        if len(text) <= max_chars:
-            return [text]
-        
-        chunks = []
-        
-        # Сначала пробуем разбить по заголовкам
-        header_pattern = r'\n\n(?=[А-ЯЁA-Z].*:|\d+\.|\*|#)'
-        sections = re.split(header_pattern, text)
-        
-        current_chunk = ""
-        for section in sections:
-            if len(current_chunk + section) <= max_chars:
-                current_chunk += section
-            else:
-                if current_chunk:
-                    chunks.append(current_chunk.strip())
-                current_chunk = section
-        
-        if current_chunk:
-            chunks.append(current_chunk.strip())
-        
-        # Если чанки все еще слишком большие, разбиваем по предложениям
-        final_chunks = []
-        for chunk in chunks:
-            if len(chunk) <= max_chars:
-                final_chunks.append(chunk)
-            else:
-                sentences = re.split(r'[.!?]+', chunk)
-                sub_chunk = ""
-                for sentence in sentences:
-                    if len(sub_chunk + sentence) <= max_chars:
-                        sub_chunk += sentence + ". "
-                    else:
-                        if sub_chunk:
-                            final_chunks.append(sub_chunk.strip())
-                        sub_chunk = sentence + ". "
-                
-                if sub_chunk:
-                    final_chunks.append(sub_chunk.strip())
-        
-        return final_chunks
+    def _split_into_chunks(self, text: str, max_tokens: Optional[int] = None) -> List[str]:
+        """Разбивка текста на чанки по бюджету токенов с сохранением структуры"""
+        if max_tokens is None:
+            max_tokens = config.SUM_CHUNK_TOKENS
+        return chunk_text(text, max_tokens)
     
     async def _llm_phase_a(self, text: str, language: str, format_type: str, 
                           target_chars: int, must_keep_indexes: List[int]) -> Optional[Dict]:
@@ -135,19 +122,10 @@ class SummarizationPipeline:
         )
         
         try:
-            response = self.groq_client.chat.completions.create(
-                model="llama-3.3-70b-versatile",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0.1,
-                max_tokens=2000,
-                response_format={"type": "json_object"}
+            result_text = await self._complete(
+                system_prompt, user_prompt, temperature=0.1, max_tokens=2000, json_mode=True
             )
-            
-            result_text = response.choices[0].message.content
-            json_data = json.loads(result_text)
+            json_data = _parse_json_object(result_text)
             
             # Валидация структуры
             is_valid, errors = validate_json_structure(json_data)
@@ -176,17 +154,7 @@ class SummarizationPipeline:
         )
         
         try:
-            response = self.groq_client.chat.completions.create(
-                model="llama-3.3-70b-versatile",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0.2,
-                max_tokens=3000
-            )
-            
-            return response.choices[0].message.content
+            return await self._complete(system_prompt, user_prompt, temperature=0.2, max_tokens=3000)
         
         except Exception as e:
             logger.error(f"Phase B failed: {e}")
@@ -241,8 +209,7 @@ class SummarizationPipeline:
         facts = extract_key_facts(text, language)
         
         # Создаем простое изложение через TextRank или первые предложения
-        sentences = re.split(r'[.!?]+', text)
-        sentences = [s.strip() for s in sentences if s.strip()]
+        sentences = split_sentences(text)
         
         # Берем первые предложения + обязательные
         must_keep = select_must_keep_sentences(facts)
@@ -315,8 +282,8 @@ class SummarizationPipeline:
         source_facts = extract_key_facts(text, lang)
         must_keep_sentences = list(select_must_keep_sentences(source_facts))
         
-        # Если Groq недоступен, используем fallback
-        if not self.groq_client:
+        # Если LLM недоступен, используем fallback
+        if not self._llm_available():
             summary = self._create_fallback_summary(text, lang, format_type, target_chars)
             quality_report = check_summary_quality(text, summary, lang, target_chars)
             
@@ -328,23 +295,9 @@ class SummarizationPipeline:
             }
         
         try:
-            # Разбиваем на чанки
-            chunks = self._split_into_chunks(text, max_chars=2800)
-            logger.info(f"Split into {len(chunks)} chunks")
-            
-            # Фаза A для каждого чанка
-            json_chunks = []
-            for i, chunk in enumerate(chunks):
-                logger.info(f"Processing chunk {i+1}/{len(chunks)}")
-                
-                chunk_json = await self._llm_phase_a(
-                    chunk, lang, format_type, target_chars // len(chunks), must_keep_sentences
-                )
-                
-                if chunk_json:
-                    json_chunks.append(chunk_json)
-                else:
-                    logger.warning(f"Chunk {i+1} failed, skipping")
+            json_chunks = await self._run_phase_a(
+                text, lang, format_type, target_chars, must_keep_sentences
+            )
             
             if not json_chunks:
                 logger.error("All chunks failed, falling back")
@@ -386,7 +339,9 @@ class SummarizationPipeline:
                 'quality_report': quality_report,
                 'method': 'llm_two_phase',
                 'chunks_processed': len(json_chunks),
-                'source_facts': len(source_facts.get('all_numbers', []))
+                'source_facts': len(source_facts.get('all_numbers', [])),
+                # Компактное представление для пересжатия без исходного текста
+                'phase_a': merged_json
             }
         
         except Exception as e:
@@ -404,6 +359,92 @@ class SummarizationPipeline:
                 'error': str(e)
             }
     
+    async def _run_phase_a(self, text: str, lang: str, format_type: str,
+                           target_chars: int, must_keep_sentences: List[int]) -> List[Dict]:
+        """Фаза A по всем чанкам текста; неудачные чанки пропускаются"""
+        chunks = self._split_into_chunks(text, max_tokens=config.PHASE_A_CHUNK_TOKENS)
+        logger.info(f"Split into {len(chunks)} chunks")
+        
+        json_chunks = []
+        for i, chunk in enumerate(chunks):
+            logger.info(f"Processing chunk {i+1}/{len(chunks)}")
+            
+            chunk_json = await self._llm_phase_a(
+                chunk, lang, format_type, target_chars // len(chunks), must_keep_sentences
+            )
+            
+            if chunk_json:
+                json_chunks.append(chunk_json)
+            else:
+                logger.warning(f"Chunk {i+1} failed, skipping")
+        
+        return json_chunks
+    
+    async def extract_phase_a(self, text: str, lang: Literal["ru", "en"] = "ru",
+                              format_type: str = "bullets", target_chars: int = 1000) -> Optional[Dict]:
+        """
+        Компактное JSON-представление текста (bullets, key_facts, entities)
+        
+        Сохраняется вызывающим кодом и переиспользуется в recompress для
+        любого уровня сжатия и формата без повторной отправки текста.
+        None, если LLM недоступен или все чанки завершились ошибкой.
+        """
+        if not self._llm_available():
+            return None
+        
+        must_keep_sentences = list(select_must_keep_sentences(extract_key_facts(text, lang)))
+        json_chunks = await self._run_phase_a(text, lang, format_type, target_chars, must_keep_sentences)
+        return self._merge_json_chunks(json_chunks) if json_chunks else None
+    
+    def render_from_phase_a(self, phase_a: Dict, format_type: str, target_chars: int) -> str:
+        """Саммари из данных фазы A без LLM: маркеры в пределах длины + блок фактов"""
+        facts_lines = [
+            f"— {fact['value_raw']}" for fact in phase_a.get('key_facts', [])
+            if isinstance(fact, dict) and fact.get('value_raw')
+        ][:10]
+        facts_block = "🔢 Цифры и факты:\n" + '\n'.join(facts_lines) if facts_lines else ""
+        budget = target_chars - len(facts_block)
+        
+        selected = []
+        used = 0
+        for bullet in phase_a.get('bullets', []):
+            bullet = str(bullet).strip()
+            if selected and used + len(bullet) > budget:
+                break
+            selected.append(bullet)
+            used += len(bullet) + 3
+        
+        if format_type == 'paragraph':
+            main_text = ' '.join(selected)
+        else:
+            main_text = '\n'.join(f"• {b}" for b in selected)
+        return f"{main_text}\n\n{facts_block}" if facts_block else main_text
+    
+    async def recompress(self, phase_a: Dict, lang: Literal["ru", "en"] = "ru",
+                         format_type: Literal["bullets", "paragraph", "structured"] = "bullets",
+                         target_chars: int = 1000) -> Dict:
+        """
+        Новый уровень сжатия/формат из сохраненных данных фазы A
+        
+        Если маркеров хватает на целевую длину, саммари собирается локально
+        без LLM. Для более подробных уровней выполняется только фаза B по
+        компактному JSON (промпт в разы меньше исходного текста).
+        
+        Returns:
+            {'summary': str, 'method': 'phase_a_local' | 'phase_b_from_cache'}
+        """
+        bullets_chars = sum(len(str(b)) for b in phase_a.get('bullets', []))
+        
+        if self._llm_available() and bullets_chars < target_chars * 0.8:
+            summary = await self._llm_phase_b(phase_a, lang, format_type, target_chars)
+            if summary:
+                return {'summary': summary.strip(), 'method': 'phase_b_from_cache'}
+        
+        return {
+            'summary': self.render_from_phase_a(phase_a, format_type, target_chars),
+            'method': 'phase_a_local'
+        }
+    
     async def _recover_missing_facts(self, summary: str, missing_facts: List[str]) -> Optional[str]:
         """Попытка восстановить потерянные факты"""
         
@@ -415,17 +456,7 @@ class SummarizationPipeline:
         )
         
         try:
-            response = self.groq_client.chat.completions.create(
-                model="llama-3.3-70b-versatile",
-                messages=[
-                    {"role": "system", "content": fixup_prompt},
-                    {"role": "user", "content": summary}
-                ],
-                temperature=0.1,
-                max_tokens=1500
-            )
-            
-            return response.choices[0].message.content
+            return await self._complete(fixup_prompt, summary, temperature=0.1, max_tokens=1500)
         
         except Exception as e:
             logger.error(f"Fact recovery failed: {e}")
@@ -435,6 +466,14 @@ class SummarizationPipeline:
             return summary + facts_addition
 
 
+def _parse_json_object(text: str) -> Dict:
+    """JSON объект из ответа LLM (допускает обрамление ```json ... ```)"""
+    start, end = text.find('{'), text.rfind('}')
+    if start == -1 or end < start:
+        raise ValueError("JSON object not found in LLM response")
+    return json.loads(text[start:end + 1])
+
+
 def summarize_text_pipeline(text: str, groq_client, lang: Literal["ru", "en"] = "ru",
                            target_chars: int = 1000, 
                            format_type: Literal["bullets", "paragraph", "structured"] = "bullets") -> Dict:
@@ -532,39 +571,7 @@ def summarize_document(text_or_md: str, meta: dict) -> str:
 
 def _chunk_text_smart(text: str) -> List[str]:
     """Smart text chunking with overlap"""
-    chunking_params = get_chunking_params(text, config.SUM_CHUNK_TOKENS)
-    max_chars = chunking_params['max_chars']
-    overlap_chars = chunking_params.get('overlap_chars', config.SUM_OVERLAP_TOKENS * 3)
-    
-    if len(text) <= max_chars:
-        return [text]
-    
-    chunks = []
-    start = 0
-    
-    while start < len(text):
-        end = start + max_chars
-        
-        if end >= len(text):
-            # Last chunk
-            chunks.append(text[start:])
-            break
-        
-        # Try to break at sentence boundary
-        chunk_text = text[start:end]
-        last_sentence_end = max(
-            chunk_text.rfind('. '),
-            chunk_text.rfind('! '),
-            chunk_text.rfind('? ')
-        )
-        
-        if last_sentence_end > max_chars * 0.7:  # At least 70% of target length
-            end = start + last_sentence_end + 2
-        
-        chunks.append(text[start:end])
-        start = end - overlap_chars  # Overlap for context
-    
-    return chunks
+    return chunk_text(text, config.SUM_CHUNK_TOKENS, config.SUM_OVERLAP_TOKENS)
 
 
 def _summarize_single_chunk(text: str, lang: str, lang_info: dict, source_context: str = "") -> str:
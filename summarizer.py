@@ -9,6 +9,7 @@ from typing import Optional, List
 from groq import Groq
 import os
 from utils.lang import detect_lang, is_ru, is_en
+from utils.chunking import chunk_text, estimate_tokens
 
 # Локальные модели отключены по умолчанию
 _local_tokenizer = None
@@ -65,52 +66,12 @@ class TextSummarizer:
             logger.warning(f"Английский суммаризатор недоступен: {e}")
             self.english_summarizer = None
     
-    def _split_text_into_chunks(self, text: str, max_chunk_size: int = 4000) -> List[str]:
-        """Разбивает длинный текст на логические чанки"""
-        if len(text) <= max_chunk_size:
-            return [text]
-        
-        # Попробуем разбить по абзацам
-        paragraphs = text.split('\n\n')
-        chunks = []
-        current_chunk = ""
-        
-        for paragraph in paragraphs:
-            if len(current_chunk) + len(paragraph) + 2 <= max_chunk_size:
-                if current_chunk:
-                    current_chunk += "\n\n" + paragraph
-                else:
-                    current_chunk = paragraph
-            else:
-                if current_chunk:
-                    chunks.append(current_chunk)
-                
-                # Если абзац слишком длинный, разбиваем по предложениям
-                if len(paragraph) > max_chunk_size:
-                    sentences = re.split(r'(?<=[.!?])\s+', paragraph)
-                    temp_chunk = ""
-                    
-                    for sentence in sentences:
-                        if len(temp_chunk) + len(sentence) + 1 <= max_chunk_size:
-                            if temp_chunk:
-                                temp_chunk += " " + sentence
-                            else:
-                                temp_chunk = sentence
-                        else:
-                            if temp_chunk:
-                                chunks.append(temp_chunk)
-                            temp_chunk = sentence
-                    
-                    current_chunk = temp_chunk
-                else:
-                    current_chunk = paragraph
-        
-        if current_chunk:
-            chunks.append(current_chunk)
-        
+    def _split_text_into_chunks(self, text: str, max_tokens: int = 1000) -> List[str]:
+        """Разбивает длинный текст на логические чанки по бюджету токенов"""
+        chunks = chunk_text(text, max_tokens)
         logger.info(f"Текст разбит на {len(chunks)} чанков")
         return chunks
-    
+
     def _create_summarization_prompt(self, text: str, target_ratio: float = 0.3) -> str:
         """Создает промпт для суммаризации"""
         target_length = int(len(text) * target_ratio)
@@ -307,8 +268,8 @@ class TextSummarizer:
         logger.info(f"Начало суммаризации текста длиной {len(text)} символов, целевое соотношение: {target_ratio:.2%}")
         
         # Для очень длинных текстов разбиваем на чанки
-        if len(text) > 5000:
-            chunks = self._split_text_into_chunks(text, 4000)
+        if estimate_tokens(text) > 1250:
+            chunks = self._split_text_into_chunks(text, 1000)
             chunk_summaries = []
             
             for i, chunk in enumerate(chunks):
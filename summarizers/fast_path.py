@@ -0,0 +1,150 @@
+"""
+Быстрый офлайн путь: экстрактивное саммари вместо LLM для коротких
+и малоценных текстов
+
+Политика оценивает пользу от LLM по длине, избыточности и языку текста.
+Если LLM не даст заметного выигрыша (короткое сообщение, повторы), ответ
+строится локально за миллисекунды; пользователь может улучшить его
+через LLM кнопкой под саммари.
+"""
+
+import logging
+import math
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from utils.chunking import estimate_tokens
+from utils.segmentation import split_sentences
+
+logger = logging.getLogger(__name__)
+
+_WORD_RE = re.compile(r"[^\W\d_]+")
+_CYRILLIC_RE = re.compile(r"[а-яё]", re.IGNORECASE)
+_LATIN_RE = re.compile(r"[a-z]", re.IGNORECASE)
+
+
+@dataclass
+class FastPathDecision:
+    """Решение политики для одного текста"""
+    use_extractive: bool
+    reason: str  # 'short', 'redundant', 'llm', 'language'
+    lang: Optional[str]
+    tokens: int
+    redundancy: float
+
+
+def text_redundancy(text: str) -> float:
+    """
+    Доля повторов в тексте (0 - все уникально, ближе к 1 - сплошные повторы)
+
+    Максимум из доли повторяющихся предложений и доли повторяющихся
+    словесных триграмм (отдельные слова повторяются в любом тексте).
+    """
+    sentences = [s.lower() for s in split_sentences(text)]
+    words = _WORD_RE.findall(text.lower())
+    shingles = list(zip(words, words[1:], words[2:]))
+    sentence_repeats = 1 - len(set(sentences)) / len(sentences) if sentences else 0.0
+    shingle_repeats = 1 - len(set(shingles)) / len(shingles) if len(shingles) >= 20 else 0.0
+    return max(sentence_repeats, shingle_repeats)
+
+
+def detect_script_language(text: str) -> Optional[str]:
+    """'ru' / 'en' по преобладающему алфавиту, None для прочих языков"""
+    letters = _WORD_RE.findall(text)
+    total = sum(len(w) for w in letters)
+    if not total:
+        return None
+    cyrillic = len(_CYRILLIC_RE.findall(text))
+    latin = len(_LATIN_RE.findall(text))
+    # Экстрактивные движки рассчитаны только на русский и английский
+    if (cyrillic + latin) / total < 0.8:
+        return None
+    return 'ru' if cyrillic >= latin else 'en'
+
+
+def assess_llm_benefit(text: str, max_tokens: int = 150,
+                       min_redundancy: float = 0.5) -> FastPathDecision:
+    """Оценить, стоит ли отправлять текст в LLM"""
+    tokens = estimate_tokens(text)
+    lang = detect_script_language(text)
+    redundancy = text_redundancy(text)
+
+    if lang is None:
+        reason = 'language'
+    elif tokens <= max_tokens:
+        reason = 'short'
+    elif redundancy >= min_redundancy:
+        reason = 'redundant'
+    else:
+        reason = 'llm'
+
+    return FastPathDecision(
+        use_extractive=reason in ('short', 'redundant'),
+        reason=reason,
+        lang=lang,
+        tokens=tokens,
+        redundancy=round(redundancy, 2),
+    )
+
+
+def extractive_summary(text: str, target_ratio: float, lang: str) -> Optional[str]:
+    """
+    Мгновенное экстрактивное саммари (буллеты), None если не удалось
+
+    Английский - summarize_en, русский - TextRank по предложениям.
+    """
+    sentences = split_sentences(text)
+    if not sentences:
+        return None
+    count = max(1, math.ceil(len(sentences) * target_ratio))
+
+    try:
+        if lang == 'en':
+            from summarizers.english_sumy import summarize_en
+            return summarize_en(text, max_sentences=count) or None
+
+        from summarizers.textrank import summarize_sentences
+        # Повторяющиеся предложения оставляем один раз
+        unique = list(dict.fromkeys(sentences))
+        return "\n".join(f"• {s}" for s in summarize_sentences(unique, count))
+
+    except Exception as e:
+        logger.warning(f"Экстрактивное саммари недоступно: {e}")
+        return None
+
+
+class FastPathStats:
+    """Счетчики решений политики и запросов на улучшение через LLM"""
+
+    def __init__(self):
+        self._decisions: Counter = Counter()
+        self._upgrades = 0
+        self._lock = threading.Lock()
+
+    def record(self, decision: FastPathDecision):
+        with self._lock:
+            self._decisions[decision.reason] += 1
+            totals = dict(self._decisions)
+        logger.info(
+            f"Fast path: {decision.reason} (lang={decision.lang}, tokens={decision.tokens}, "
+            f"redundancy={decision.redundancy}); всего {totals}"
+        )
+
+    def record_upgrade(self):
+        with self._lock:
+            self._upgrades += 1
+            upgrades = self._upgrades
+        logger.info(f"Fast path: пользователь запросил LLM версию (всего {upgrades})")
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self._decisions)
+            stats['upgrades'] = self._upgrades
+            return stats
+
+
+# Общая статистика процесса
+fast_path_stats = FastPathStats()
@@ -12,10 +12,6 @@ logger = logging.getLogger(__name__)
 # Проверяем наличие зависимостей
 try:
     import razdel
-    from sumy.parsers.plaintext import PlaintextParser
-    from sumy.nlp.tokenizers import Tokenizer
-    from sumy.summarizers.text_rank import TextRankSummarizer
-    from sumy.summarizers.lex_rank import LexRankSummarizer
     import rutermextract
     from natasha import (
         Segmenter, MorphVocab, NewsEmbedding, NewsMorphTagger,
@@ -27,6 +23,14 @@ except ImportError as e:
     SUMMARIZATION_AVAILABLE = False
     logger.warning(f"Суммаризация недоступна: {e}")
 
+# Экстрактивный TextRank (NumPy/SciPy) не зависит от razdel/natasha
+try:
+    from summarizers.textrank import summarize_sentences
+    TEXTRANK_AVAILABLE = True
+except ImportError as e:
+    TEXTRANK_AVAILABLE = False
+    logger.warning(f"TextRank недоступен: {e}")
+
 # Ключевые триггеры для категоризации
 AGREEMENT_TRIGGERS = [
     'договор', 'договорились', 'согласились', 'решили', 'обещали',
@@ -232,9 +236,9 @@ def categorize_sentences(sentences: List[str]) -> Dict[str, List[Tuple[int, str]
 
 def extract_important_sentences(text: str, verbosity: str = "normal") -> List[str]:
     """Извлекает важные предложения с помощью TextRank"""
-    if not SUMMARIZATION_AVAILABLE:
-        sentences = extract_sentences(text)
-        # Простой fallback - берем первые и последние предложения
+    sentences = extract_sentences(text)
+    if not TEXTRANK_AVAILABLE:
+        # Простой fallback - берем первые предложения
         count = {"short": 3, "normal": 6, "detailed": 10}.get(verbosity, 6)
         return sentences[:count]
     
@@ -246,16 +250,10 @@ def extract_important_sentences(text: str, verbosity: str = "normal") -> List[st
             "detailed": 14
         }.get(verbosity, 8)
         
-        # Используем TextRank
-        parser = PlaintextParser.from_string(text, Tokenizer("russian"))
-        summarizer = TextRankSummarizer()
-        
-        summary_sentences = summarizer(parser.document, sentence_count)
-        return [str(sentence) for sentence in summary_sentences]
+        return summarize_sentences(sentences, sentence_count, "textrank")
         
     except Exception as e:
         logger.warning(f"Ошибка TextRank, использую fallback: {e}")
-        sentences = extract_sentences(text)
         count = {"short": 3, "normal": 6, "detailed": 10}.get(verbosity, 6)
         return sentences[:count]
 
@@ -491,7 +489,7 @@ def check_summarization_availability() -> Dict[str, bool]:
     """Проверяет доступность компонентов суммаризации"""
     availability = {
         "razdel": False,
-        "sumy": False,
+        "textrank": TEXTRANK_AVAILABLE,
         "rutermextract": False,
         "natasha": False
     }
@@ -502,12 +500,6 @@ def check_summarization_availability() -> Dict[str, bool]:
     except ImportError:
         pass
     
-    try:
-        from sumy.summarizers.text_rank import TextRankSummarizer
-        availability["sumy"] = True
-    except ImportError:
-        pass
-    
     try:
         import rutermextract
         availability["rutermextract"] = True
@@ -535,4 +527,4 @@ def get_summarization_info() -> str:
     elif available_count >= 2:
         return f"Умная суммаризация частично поддерживается ({available_count}/{total_count} модулей)"
     else:
-        return "Умная суммаризация недоступна - установите razdel, sumy, rutermextract, natasha"
\ No newline at end of file
+        return "Умная суммаризация недоступна - установите razdel, numpy/scipy, rutermextract, natasha"
\ No newline at end of file
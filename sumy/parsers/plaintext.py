@@ -1,4 +1,7 @@
 
+from utils.segmentation import split_sentences
+
+
 class PlaintextParser:
     def __init__(self, text, tokenizer):
         self.text = text
@@ -10,4 +13,4 @@ class PlaintextParser:
 
 class Document:
     def __init__(self, text):
-        self.sentences = text.split('.')[:10]  # Simple split
+        self.sentences = split_sentences(text)
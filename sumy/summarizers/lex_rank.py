@@ -1,4 +1,7 @@
 
+from summarizers.textrank import summarize_sentences
+
+
 class LexRankSummarizer:
     def __call__(self, document, sentence_count):
-        return document.sentences[:sentence_count]
+        return summarize_sentences(document.sentences, sentence_count, "lexrank")
@@ -0,0 +1,93 @@
+"""
+Tests for VAD windowing and parallel window transcription
+"""
+
+import shutil
+import threading
+import wave
+from types import SimpleNamespace
+
+import numpy as np
+
+from asr.vad import SAMPLE_RATE, energy_silences, plan_windows
+
+
+def tone_with_pauses(seconds: int, pause_every: int) -> np.ndarray:
+    """Noisy 'speech' with a 1 s pause every pause_every seconds"""
+    rng = np.random.default_rng(0)
+    samples = (0.3 * rng.standard_normal(seconds * SAMPLE_RATE)).astype(np.float32)
+    for start in range(pause_every, seconds, pause_every):
+        samples[start * SAMPLE_RATE:(start + 1) * SAMPLE_RATE] *= 0.001
+    return samples
+
+
+def test_energy_vad_finds_pauses():
+    silences = energy_silences(tone_with_pauses(20, 5))
+    assert len(silences) == 3
+    for (start, end), expected in zip(silences, (5, 10, 15)):
+        assert abs(start - expected) < 0.1 and abs(end - (expected + 1)) < 0.1
+
+
+def test_windows_cut_on_silence_within_bounds():
+    silences = [(25.0, 25.5), (41.0, 42.0), (50.0, 50.2), (95.0, 96.0), (140.0, 140.4)]
+    windows = plan_windows(150.0, silences, min_window=30, max_window=60)
+
+    assert windows[0] == (0.0, 41.5)  # longest pause in 30..60 s, not the first one
+    assert windows[1] == (41.5, 95.5)
+    assert windows[-1][1] == 150.0
+    assert all(end - start <= 60 for start, end in windows)
+    assert plan_windows(20.0, silences) == [(0.0, 20.0)]
+    # No pause in range: hard cut at the maximum
+    assert plan_windows(130.0, [])[:2] == [(0.0, 60.0), (60.0, 120.0)]
+
+
+def test_tune_workers_splits_cores():
+    from asr.engines.faster_whisper_engine import tune_workers
+
+    assert tune_workers(1) == (1, 1)
+    assert tune_workers(8) == (4, 2)
+    assert tune_workers(32) == (4, 8)
+    assert tune_workers(8, requested=2) == (2, 4)
+
+
+def test_engine_merges_parallel_windows_in_order(tmp_path, monkeypatch):
+    from asr.engines import faster_whisper_engine as engine_module
+    from config import config
+
+    monkeypatch.setattr(config, 'ASR_CACHE_MAX_MB', 0, raising=False)
+    monkeypatch.setattr(config, 'ASR_WORKERS', 3, raising=False)
+
+    wav_path = tmp_path / "audio.wav"
+    with wave.open(str(wav_path), 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes((tone_with_pauses(150, 45) * 32767).astype(np.int16).tobytes())
+
+    class FakeModel:
+        def __init__(self):
+            self.calls = []
+            self.lock = threading.Lock()
+
+        def transcribe(self, audio, language=None, **kwargs):
+            with self.lock:
+                self.calls.append(language)
+            seconds = len(audio) / SAMPLE_RATE
+            segment = SimpleNamespace(start=0.0, end=seconds, text=f" {seconds:.0f}s ")
+            return iter([segment]), SimpleNamespace(language=language or 'ru')
+
+    engine = engine_module.FasterWhisperEngine()
+    engine.model = FakeModel()
+    monkeypatch.setattr(engine, '_preprocess_audio', lambda path: shutil.copy(path, str(tmp_path / "pre.wav")))
+
+    partial = []
+    text = engine.transcribe(str(wav_path), on_partial=partial.append)
+
+    starts = [window.start for window in partial]
+    assert starts == sorted(starts) and starts[0] == 0.0 and len(partial) >= 3
+    assert text == " ".join(window.text for window in partial)
+    # Language detected on the first window is passed to the rest
+    assert engine.model.calls[0] is None and set(engine.model.calls[1:]) == {'ru'}
+    # Segment timestamps are absolute
+    assert partial[1].segments[0]["start"] == round(partial[1].start, 2)
+    assert partial[-1].segments[0]["end"] == 150.0
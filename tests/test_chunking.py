@@ -0,0 +1,43 @@
+"""
+Tests for token-aware chunking
+"""
+
+from utils.chunking import chunk_text, estimate_tokens, iter_chunk_spans
+
+RU_PARAGRAPH = "Выручка компании выросла на 42% и составила 5.8 млрд рублей. Это рекорд! " * 5
+EN_PARAGRAPH = "Revenue grew by 42% and reached 5.8 billion dollars. This is a record! " * 5
+
+
+def test_russian_costs_more_tokens_per_char():
+    """Cyrillic text is estimated at about twice the tokens per character"""
+    ru_ratio = estimate_tokens(RU_PARAGRAPH) / len(RU_PARAGRAPH)
+    en_ratio = estimate_tokens(EN_PARAGRAPH) / len(EN_PARAGRAPH)
+    assert ru_ratio > en_ratio * 1.6
+
+
+def test_chunks_respect_budget_and_boundaries():
+    """Chunks fit the token budget and end on sentence boundaries"""
+    text = "\n\n".join([RU_PARAGRAPH, EN_PARAGRAPH] * 20)
+    chunks = chunk_text(text, max_tokens=200)
+
+    assert len(chunks) > 1
+    assert all(estimate_tokens(chunk) <= 200 for chunk in chunks)
+    assert all(chunk.rstrip().endswith(('.', '!')) for chunk in chunks)
+
+
+def test_overlap_repeats_tail_of_previous_chunk():
+    """Consecutive chunks share context when overlap is requested"""
+    text = " ".join(f"Sentence number {i} is here." for i in range(200))
+    spans = list(iter_chunk_spans(text, max_tokens=100, overlap_tokens=20))
+
+    assert len(spans) > 1
+    for (_, prev_end), (next_start, _) in zip(spans, spans[1:]):
+        assert next_start < prev_end
+    assert spans[-1][1] == len(text)
+
+
+def test_oversized_sentence_is_split():
+    """A single sentence larger than the budget is still split"""
+    chunks = chunk_text("слово " * 3000, max_tokens=300)
+    assert len(chunks) > 1
+    assert all(estimate_tokens(chunk) <= 300 for chunk in chunks)
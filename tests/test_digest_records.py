@@ -0,0 +1,23 @@
+"""
+Tests for compact digest message records
+"""
+
+from digest.db import DigestDB
+
+
+def test_messages_in_period_are_compact_mapping_records(tmp_path):
+    db = DigestDB(str(tmp_path / "digest.db"))
+    db.save_user(1, 100)
+    channel_id = db.save_channel("news", -1001, "News", 1)
+    db.add_user_channel(1, channel_id)
+    db.save_message(channel_id, 7, "https://t.me/news/7", 1000, "Рынок вырос на 5%", '{"big": "payload"}')
+
+    [msg] = db.get_messages_in_period(1, 0, 2000)
+    assert not hasattr(msg, '__dict__')
+    assert (msg['text'], msg.get('username'), msg.get('raw_json', 'absent')) == ("Рынок вырос на 5%", "news", 'absent')
+    assert 'title' in msg and msg['posted_at'] == 1000
+
+    # Cluster representatives are editable dict copies
+    representative = dict(msg)
+    representative['cluster_size'] = 1
+    assert representative['message_url'] == "https://t.me/news/7"
@@ -0,0 +1,56 @@
+"""
+Tests for persisted message vectors and document frequencies
+"""
+
+import math
+
+import pytest
+
+from digest.db import DigestDB
+
+
+def test_vector_round_trip_and_df_are_counted_once(tmp_path):
+    db = DigestDB(str(tmp_path / "digest.db"))
+    assert db.save_message_vector(1, b"\x01\x00\x00\x00", b"\x00\x3c", [1])
+    assert db.save_message_vector(2, b"\x01\x00\x00\x00\x05\x00\x00\x00", b"\x00\x3c\x00\x38", [1, 5])
+    # A repeated save is ignored and does not count the document again
+    assert not db.save_message_vector(1, b"\x09\x00\x00\x00", b"\x00\x3c", [9])
+
+    assert db.get_message_vectors([1, 2, 3]) == {
+        1: (b"\x01\x00\x00\x00", b"\x00\x3c"),
+        2: (b"\x01\x00\x00\x00\x05\x00\x00\x00", b"\x00\x3c\x00\x38"),
+    }
+    rows, n_docs = DigestDB(db.db_path).get_term_df()
+    assert sorted(rows) == [(1, 2), (5, 1)]
+    assert n_docs == 2
+
+
+def expected_cosine(n_docs: int) -> float:
+    """
+    Cosine of "альфа бета" and "альфа гамма": the shared "альфа" has df=2,
+    each message adds one unigram and one bigram with df=1
+    """
+    shared = math.log((1 + n_docs) / 3) + 1
+    own = math.log((1 + n_docs) / 2) + 1
+    return shared ** 2 / (shared ** 2 + 2 * own ** 2)
+
+
+def test_cosine_similarity_matches_idf_weights(tmp_path):
+    pytest.importorskip("sklearn")
+    pytest.importorskip("stop_words")
+    from digest.vectors import HashingMessageVectorizer
+
+    db = DigestDB(str(tmp_path / "digest.db"))
+    vectorizer = HashingMessageVectorizer(db=db)
+    first = {'id': 1, 'text': "альфа бета"}
+    second = {'id': 2, 'text': "альфа гамма"}
+
+    assert vectorizer.similarity(first, second) == pytest.approx(expected_cosine(2), abs=1e-2)
+    assert vectorizer.similarity(first, first) == pytest.approx(1.0, abs=1e-2)
+    assert vectorizer.similarity(first, {'id': 3, 'text': "дельта эпсилон"}) == 0.0
+
+    # Stored vectors are reused and frequencies survive a restart
+    reloaded = HashingMessageVectorizer(db=DigestDB(db.db_path))
+    assert reloaded._n_docs == 3
+    assert reloaded.similarity(first, second) == pytest.approx(expected_cosine(3), abs=1e-2)
+    assert reloaded._n_docs == 3
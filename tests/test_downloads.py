@@ -0,0 +1,62 @@
+"""
+Tests for the pooled streaming download service
+"""
+
+import asyncio
+import hashlib
+
+import pytest
+from aiohttp import web
+
+from utils.downloads import DownloadService, DownloadTooLarge
+
+BODY = bytes(range(256)) * 4096  # 1 MiB
+
+
+async def serve():
+    async def sized(request):
+        return web.Response(body=BODY)
+
+    async def streamed(request):
+        # No Content-Length: the limit can only trip while reading
+        response = web.StreamResponse()
+        await response.prepare(request)
+        for start in range(0, len(BODY), 65536):
+            await response.write(BODY[start:start + 65536])
+        await response.write_eof()
+        return response
+
+    app = web.Application()
+    app.router.add_get('/sized', sized)
+    app.router.add_get('/streamed', streamed)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}"
+
+
+def test_download_hashes_while_streaming_and_enforces_limits(tmp_path):
+    async def scenario():
+        runner, base = await serve()
+        service = DownloadService()
+        try:
+            on_disk = await service.download(f"{base}/sized", str(tmp_path / "file.bin"))
+            in_memory = await service.download(f"{base}/sized", max_bytes=len(BODY))
+
+            with pytest.raises(DownloadTooLarge):
+                await service.download(f"{base}/sized", str(tmp_path / "header.bin"), max_bytes=1000)
+            with pytest.raises(DownloadTooLarge):
+                await service.download(f"{base}/streamed", str(tmp_path / "partial.bin"), max_bytes=200_000)
+            return on_disk, in_memory
+        finally:
+            await service.close()
+            await runner.cleanup()
+
+    on_disk, in_memory = asyncio.run(scenario())
+    expected = hashlib.sha256(BODY).hexdigest()
+    assert (on_disk.size, on_disk.sha256) == (len(BODY), expected)
+    assert (tmp_path / "file.bin").read_bytes() == BODY
+    assert in_memory.data == BODY and in_memory.sha256 == expected
+    assert not (tmp_path / "partial.bin").exists()
@@ -0,0 +1,28 @@
+"""
+Tests for single-pass fact extraction
+"""
+
+from summarization.fact_extractor import FactExtractor
+
+
+def make_extractor():
+    return FactExtractor(use_ner=False)
+
+
+def test_each_number_gets_one_type():
+    """Combined regex yields the most specific type once per number"""
+    numbers = make_extractor().extract_numbers("Выручка 5.8 млрд, рост 42%, прибыль $180 и 36 рублей.")
+    assert [(n['type'], n['norm']) for n in numbers] == [
+        ('billions', 5.8e9), ('percentage', 0.42), ('currency_usd', 180.0), ('currency_rub', 36.0)
+    ]
+
+
+def test_numbers_bound_to_sentences_by_offset():
+    """Numbers land in the sentence that contains them, money is tracked"""
+    text = "Вступление без цифр. Выручка 5.8 млрд руб. в 2024 г. выросла. Итог: 45 рублей на акцию!"
+    facts = make_extractor().extract_key_facts(text, 'ru')
+
+    by_sentence = {s['i']: [n['raw'] for n in s['numbers']] for s in facts['sentences_with_numbers']}
+    assert by_sentence == {1: ['5.8 млрд', '2024'], 2: ['45 рублей']}
+    assert facts['money'][0]['sentence_i'] == 2
+    assert facts['sentences_with_numbers'][1]['text'] == "Итог: 45 рублей на акцию!"
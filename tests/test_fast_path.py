@@ -0,0 +1,53 @@
+"""
+Tests for the offline extractive fast path policy
+"""
+
+from summarizers.fast_path import assess_llm_benefit, extractive_summary
+
+LONG_RU = (
+    "Компания подвела итоги года: выручка выросла на 42% и достигла 5.8 млрд рублей. "
+    "Основной вклад внесли новые региональные магазины, открытые весной. "
+    "Расходы на логистику снизились благодаря собственному складу под Казанью. "
+    "Совет директоров рекомендовал выплатить дивиденды по итогам второго полугодия. "
+    "В следующем году планируется выход на рынки Казахстана и Узбекистана. "
+    "Генеральный директор отметил риски, связанные с курсом валют и ставкой ЦБ."
+)
+
+
+def test_policy_reasons():
+    """Short and repetitive texts stay local, long unique text and other scripts go to LLM"""
+    assert assess_llm_benefit("Встреча переносится на завтра, в 15:00. Захватите отчет по продажам.").reason == 'short'
+    assert assess_llm_benefit("Купите слона! " * 80).reason == 'redundant'
+    assert assess_llm_benefit(LONG_RU, max_tokens=50).reason == 'llm'
+    assert assess_llm_benefit("这是一个很长的中文文本。" * 30).reason == 'language'
+
+
+def test_extractive_summary_is_bulleted_and_deduplicated():
+    """Russian fast path returns unique sentences as bullets"""
+    summary = extractive_summary("Купите слона! " * 10 + "Слон стоит дешево.", 0.5, 'ru')
+    lines = summary.split("\n")
+    assert all(line.startswith("• ") for line in lines)
+    assert len(lines) == len(set(lines))
+
+
+def test_handler_runs_fast_path_off_the_event_loop(monkeypatch):
+    """Policy and TextRank run in an executor thread, not on the event loop"""
+    import asyncio
+    import threading
+
+    from bot.handlers import text_handler
+    from bot.handlers.text_handler import TextHandler
+
+    threads = []
+    real_assess = text_handler.assess_llm_benefit
+
+    def recording_assess(text, **kwargs):
+        threads.append(threading.current_thread())
+        return real_assess(text, **kwargs)
+
+    monkeypatch.setattr(text_handler, 'assess_llm_benefit', recording_assess)
+    handler = TextHandler(None, "", None, None, None, None, None, None, {}, {}, {}, None)
+
+    summary = asyncio.run(handler._fast_path_summary("Купите слона! " * 80, 0.3))
+    assert summary.startswith("• Купите слона!")
+    assert threads and threads[0] is not threading.main_thread()
@@ -0,0 +1,185 @@
+"""
+Tests for latency-aware LLM provider routing
+"""
+
+import time
+import pytest
+from llm.routing import CircuitBreaker, LatencyTracker, ProviderBudget
+
+
+def test_unmeasured_providers_keep_configured_order():
+    """Without samples the default priority (Gemini first) is kept"""
+    tracker = LatencyTracker(min_samples=3)
+    assert tracker.rank(['gemini/flash', 'groq/llama']) == ['gemini/flash', 'groq/llama']
+
+
+def test_faster_provider_ranked_first():
+    """Measured providers are ordered by p50 latency"""
+    tracker = LatencyTracker(min_samples=3)
+    for _ in range(5):
+        tracker.record('gemini/flash', 4.0, ok=True)
+        tracker.record('groq/llama', 0.8, ok=True)
+
+    assert tracker.rank(['gemini/flash', 'groq/llama']) == ['groq/llama', 'gemini/flash']
+    assert tracker.p95('groq/llama') == pytest.approx(0.8)
+
+
+def test_unhealthy_provider_ranked_last():
+    """High error rate moves a fast provider behind a healthy one"""
+    tracker = LatencyTracker(min_samples=3, max_error_rate=0.5)
+    for _ in range(5):
+        tracker.record('gemini/flash', 0.5, ok=False)
+        tracker.record('groq/llama', 3.0, ok=True)
+
+    assert not tracker.is_healthy('gemini/flash')
+    assert tracker.rank(['gemini/flash', 'groq/llama']) == ['groq/llama', 'gemini/flash']
+    assert tracker.stats('gemini/flash')['error_rate'] == 1.0
+
+
+def test_hedged_request_returns_faster_backup():
+    """Backup is fired after the primary's p95 and its answer wins"""
+    pytest.importorskip("groq")
+    from llm.provider_router import LLMProviderRouter
+
+    class FakeRouter(LLMProviderRouter):
+        def _initialize_clients(self):
+            pass
+
+        def _available_providers(self):
+            return [('slow', 'm1', 'gemini'), ('fast', 'm2', 'groq')]
+
+        def _call_provider(self, client, model, provider, *args, on_start=None):
+            if on_start:
+                on_start()
+            time.sleep(0.5 if client == 'slow' else 0.01)
+            return client
+
+    router = FakeRouter()
+    router.hedge_default_delay = 0.05
+
+    started = time.monotonic()
+    assert router.generate_completion("prompt") == 'fast'
+    assert time.monotonic() - started < 0.4
+    assert router.current_provider == 'groq'
+
+
+def test_hedge_clock_starts_after_queueing_and_yields_to_quota_waiters():
+    """Time queued for quota does not count toward the hedge delay; no hedge under contention"""
+    pytest.importorskip("groq")
+    from llm.provider_router import LLMProviderRouter
+
+    class FakeRouter(LLMProviderRouter):
+        def _initialize_clients(self):
+            pass
+
+        def _available_providers(self):
+            return [('primary', 'm1', 'gemini'), ('backup', 'm2', 'groq')]
+
+        def _call_provider(self, client, model, provider, *args, on_start=None):
+            self.calls.append(client)
+            if client == 'primary':
+                time.sleep(0.2)  # waiting for quota
+                on_start()
+                time.sleep(0.05)
+            return client
+
+    router = FakeRouter()
+    router.calls = []
+    router.hedge_default_delay = 0.1
+    assert router.generate_completion("prompt") == 'primary'
+    assert router.calls == ['primary']
+
+    # Slow primary, but other callers are queued for quota: no backup request
+    router = FakeRouter()
+    router.calls = []
+    router.hedge_default_delay = 0.01
+    router.budgets['groq'].waiting = 1
+    assert router.generate_completion("prompt") == 'primary'
+    assert router.calls == ['primary']
+
+
+def test_circuit_breaker_transitions():
+    """Rate limit opens the circuit, a single probe is allowed after cooldown"""
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=0.05)
+    assert breaker.allow()
+
+    breaker.record_failure(rate_limited=True)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow()          # half-open probe
+    assert not breaker.allow()      # only one probe at a time
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_budget_queues_and_times_out():
+    """Exhausted RPM budget makes callers wait instead of failing upstream"""
+    budget = ProviderBudget(rpm=600, tpm=0)   # 10 requests per second
+    for _ in range(600):
+        assert budget.acquire(100, timeout=0)
+
+    started = time.monotonic()
+    assert budget.acquire(100, timeout=1.0)
+    assert 0.05 <= time.monotonic() - started < 0.5
+    assert not budget.acquire(100, timeout=0)
+
+
+def test_bad_request_does_not_open_breaker_or_drain_budget():
+    """Only quota errors count as rate limits; '...generateContent' is a 400"""
+    pytest.importorskip("groq")
+    from llm.provider_router import LLMProviderRouter
+
+    class FakeRouter(LLMProviderRouter):
+        def _initialize_clients(self):
+            pass
+
+    router = FakeRouter()
+    bad_request = Exception(
+        "400 models/gemini-2.0-flash is not found for API version v1beta, "
+        "or is not supported for generateContent"
+    )
+    requests_left = router.budgets['gemini'].snapshot()['requests_left']
+
+    assert not router._is_rate_limit(bad_request)
+    router._record_failure('gemini', bad_request)
+    assert router.breakers['gemini'].state == CircuitBreaker.CLOSED
+    assert router.budgets['gemini'].snapshot()['requests_left'] >= requests_left
+
+    class RateLimitError(Exception):
+        status_code = 429
+
+    assert router._is_rate_limit(RateLimitError("Too many requests"))
+    assert router._is_rate_limit(Exception("429 Resource has been exhausted (e.g. check quota)"))
+    router._record_failure('gemini', Exception("Rate limit reached for model, try again in 2s"))
+    assert router.breakers['gemini'].state == CircuitBreaker.OPEN
+
+
+def test_stream_closed_early_releases_half_open_probe():
+    """A consumer stopping the stream must not keep the probe slot forever"""
+    pytest.importorskip("groq")
+    from llm.provider_router import LLMProviderRouter
+
+    class FakeRouter(LLMProviderRouter):
+        def _initialize_clients(self):
+            pass
+
+        def _available_providers(self):
+            return [('client', 'm1', 'gemini')]
+
+        def _stream_from_provider(self, *args):
+            yield "первый"
+            yield "второй"
+
+    router = FakeRouter()
+    breaker = router.breakers['gemini']
+    breaker.state, breaker.opened_at, breaker.open_for = CircuitBreaker.OPEN, 0.0, 0.0
+
+    stream = router.generate_completion_stream("prompt")
+    assert next(stream) == "первый"
+    assert not breaker.available()  # probe in flight
+    stream.close()
+
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.available()
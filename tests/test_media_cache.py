@@ -0,0 +1,46 @@
+"""
+Tests for the file_unique_id media result cache
+"""
+
+import time
+
+from bot.media_cache import MediaResultCache, media_cache_key, params_digest
+from bot.state_store import BoundedStore
+from utils.tg_audio import extract_audio_descriptor
+
+
+def test_key_includes_kind_and_sorted_params():
+    assert media_cache_key('photo', 'AQAD1', prompt='ab', lang='ru') == 'photo:AQAD1:lang=ru:prompt=ab'
+    assert media_cache_key('audio', 'AQAD1') != media_cache_key('document', 'AQAD1')
+    assert params_digest('prompt one') != params_digest('prompt two')
+
+
+def test_results_are_separated_by_params_and_skip_missing_ids():
+    cache = MediaResultCache(BoundedStore('media_results'))
+    cache.put('photo', 'AQAD1', {'analysis': 'cat'}, prompt='p1')
+
+    assert cache.get('photo', 'AQAD1', prompt='p1') == {'analysis': 'cat'}
+    assert cache.get('photo', 'AQAD1', prompt='p2') is None
+
+    cache.put('photo', None, {'analysis': 'dog'})
+    assert cache.get_stats()['entries'] == 1
+    assert cache.get('photo', None) is None
+
+
+def test_cache_evicts_by_size_and_expires_by_ttl():
+    cache = MediaResultCache(BoundedStore('media_results', max_bytes=4000, ttl=0.05))
+    cache.put('document', 'old', {'text': 'x' * 3000})
+    cache.put('document', 'new', {'text': 'y' * 3000})
+
+    assert cache.get('document', 'old') is None
+    assert cache.get_stats()['evictions'] == 1
+
+    time.sleep(0.06)
+    assert cache.get('document', 'new') is None
+
+
+def test_audio_descriptor_carries_file_unique_id():
+    descriptor = extract_audio_descriptor(
+        {'voice': {'file_id': 'BQAC-long-id', 'file_unique_id': 'AgAD5', 'duration': 3}}
+    )
+    assert descriptor['file_unique_id'] == 'AgAD5'
@@ -238,6 +238,26 @@ def test_number_validation_edge_cases():
     assert is_preserved_bad == False, "Измененные числа должны считаться потерянными"
     assert len(missing_bad) > 0, "Должны быть выявлены потерянные числа"
 
+def test_critical_number_regex_and_bounded_index_cache():
+    """Каждый вид чисел находится одним регулярным выражением, кеш индексов ограничен"""
+    from quality import quality_checks
+
+    text = (
+        "Встреча 12.03.2024 и 15 сентября в 10:30: ставка +15 б.п., $1 500, €20, "
+        "3 500 руб., 2,5 млн, 38%, 10-20 штук, код 2024."
+    )
+    assert extract_critical_numbers(text) == {
+        '12.03.2024', '15 сентября', '10:30', '+15 б.п.', '$1 500', '€20',
+        '3 500 руб.', '2,5 млн', '38%', '10-20', '2024',
+    }
+    # Сравнение без учета регистра
+    assert validate_numbers_preserved(text, text.upper()) == (True, [])
+
+    for i in range(10):
+        extract_critical_numbers(f"{text} {i}")
+    assert len(quality_checks._index_cache) == quality_checks._INDEX_CACHE_SIZE
+
+
 if __name__ == "__main__":
     # Запуск тестов
     import sys
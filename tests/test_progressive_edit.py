@@ -0,0 +1,46 @@
+"""
+Tests for progressive message edits during streaming generation
+"""
+
+import asyncio
+from bot.handlers.base import BaseHandler, STREAM_CURSOR
+
+
+class RecordingHandler(BaseHandler):
+    def __init__(self):
+        super().__init__(session=None, base_url="", db=None, state_manager=None)
+        self.edits = []
+
+    async def edit_message_text(self, chat_id, message_id, text, parse_mode=None, reply_markup=None):
+        self.edits.append(text)
+        return {'ok': True}
+
+
+async def fake_stream(parts, delay=0.0):
+    for part in parts:
+        await asyncio.sleep(delay)
+        yield part
+
+
+def test_returns_full_text_and_throttles_edits():
+    """All chunks are collected, edits are rate limited"""
+    handler = RecordingHandler()
+    parts = [f"часть {i} " for i in range(50)]
+
+    text = asyncio.run(handler.edit_message_progressively(1, 10, fake_stream(parts), interval=60))
+
+    assert text == "".join(parts)
+    assert handler.edits == ["часть 0 " + STREAM_CURSOR]
+
+
+def test_edits_are_truncated_to_telegram_limit():
+    """Intermediate edits never exceed 4096 characters"""
+    handler = RecordingHandler()
+    parts = ["x" * 3000, "y" * 3000]
+
+    text = asyncio.run(handler.edit_message_progressively(1, 10, fake_stream(parts), interval=0))
+
+    assert len(text) == 6000
+    assert len(handler.edits) == 2
+    assert all(len(edit) <= 4096 for edit in handler.edits)
+    assert handler.edits[-1].endswith(STREAM_CURSOR)
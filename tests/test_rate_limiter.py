@@ -0,0 +1,38 @@
+"""
+Tests for the shared sliding-window rate limiter
+"""
+
+from bot.rate_limiter import SlidingWindowRateLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_weighted_window_global_cap_and_eviction():
+    clock = FakeClock()
+    limiter = SlidingWindowRateLimiter(capacity=10, window=60, global_capacity=15, clock=clock)
+
+    # A one-hour recording weighs 7 texts, leaving room for three more
+    assert limiter.try_acquire(1, 'audio', duration_sec=3600)
+    assert [limiter.try_acquire(1) for _ in range(4)] == [True, True, True, False]
+
+    # Another user is stopped by the bot-wide cap
+    assert [limiter.try_acquire(2, 'photo') for _ in range(3)] == [True, True, False]
+
+    clock.now = 61
+    assert limiter.try_acquire(1)
+    assert limiter.evict_idle() == 1
+    assert limiter.get_stats()['users'] == 1
+
+
+def test_describe_reports_weighted_budget():
+    limiter = SlidingWindowRateLimiter(capacity=12, window=60, costs={'photo': 3})
+    assert limiter.describe() == (
+        "Лимит: 12 единиц за 60 с (текст — 1, ссылка — 1, фото — 3, документ — 2, "
+        "аудио — 1 + 0.1 за минуту записи)."
+    )
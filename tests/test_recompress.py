@@ -0,0 +1,73 @@
+"""
+Tests for recompression from cached Phase-A data
+"""
+
+import asyncio
+
+from summarization.pipeline import SummarizationPipeline
+
+PHASE_A = {
+    'bullets': [
+        "Выручка выросла на 42% до 5.8 млрд рублей.",
+        "Открыто 47 новых магазинов в регионах.",
+        "Совет директоров рекомендовал дивиденды.",
+        "Планируется выход на рынок Казахстана.",
+    ],
+    'key_facts': [{'value_raw': '42%'}, {'value_raw': '5.8 млрд рублей'}, {'value_raw': '47'}],
+    'entities': {'ORG': [], 'PERSON': [], 'GPE': ['Казахстан']},
+    'uncertainties': [],
+}
+
+
+def test_render_respects_target_length_and_keeps_facts():
+    """Shorter targets keep fewer bullets, the facts block is always present"""
+    pipeline = SummarizationPipeline(None)
+    short = pipeline.render_from_phase_a(PHASE_A, "bullets", 150)
+    full = pipeline.render_from_phase_a(PHASE_A, "bullets", 2000)
+
+    assert short.count("• ") < full.count("• ") == 4
+    for summary in (short, full):
+        assert "🔢 Цифры и факты:\n— 42%\n— 5.8 млрд рублей\n— 47" in summary
+
+
+def test_recompress_without_llm_is_local():
+    """Without an LLM every level is rendered from the cached JSON"""
+    result = asyncio.run(SummarizationPipeline(None).recompress(PHASE_A, "ru", "paragraph", 5000))
+    assert result['method'] == 'phase_a_local'
+    assert result['summary'].startswith("Выручка выросла на 42%")
+
+
+def test_phase_a_is_built_lazily_once_per_text(monkeypatch):
+    """No Phase A call until a level switch; concurrent switches share one build"""
+    from bot.handlers.text_handler import TextHandler
+
+    calls = []
+
+    async def fake_extract_phase_a(text, lang):
+        calls.append(text)
+        await asyncio.sleep(0.01)
+        return PHASE_A
+
+    async def scenario():
+        handler = TextHandler(None, "", None, None, None, None, None, None, {}, {}, {}, None)
+        monkeypatch.setattr(handler.summarization_pipeline, 'extract_phase_a', fake_extract_phase_a)
+        monkeypatch.setattr(handler.summarization_pipeline, '_llm_available', lambda: False)
+
+        handler._remember_text(1, "текст отчета")
+        await asyncio.sleep(0.02)
+        assert calls == [] and handler.user_phase_a.get(1) is None
+
+        first, second = await asyncio.gather(
+            handler._recompress_summary(1, "текст отчета", 0.3),
+            handler._recompress_summary(1, "текст отчета", 0.1),
+        )
+        assert first.startswith("• Выручка выросла на 42%") and second
+        assert handler.user_phase_a.get(1) == PHASE_A
+        await handler._recompress_summary(1, "текст отчета", 0.5)
+        assert calls == ["текст отчета"]
+
+        # A new text drops the cached Phase A of the old one
+        handler._remember_text(1, "новый текст")
+        assert handler.user_phase_a.get(1) is None and not handler._phase_a_tasks
+
+    asyncio.run(scenario())
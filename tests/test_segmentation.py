@@ -0,0 +1,49 @@
+"""
+Tests for linear-time sentence segmentation
+"""
+
+from utils.segmentation import iter_sentence_spans, split_sentences
+
+
+def test_abbreviations_and_decimals():
+    """Russian abbreviations, initials and decimals do not end sentences"""
+    text = (
+        "Выручка выросла на 5.8% в 2024 г. Это рекорд! "
+        "Музей им. А. С. Пушкина открыл 47 залов и т.д. Далее планы. "
+        "Цена 3,5 млн. рублей, т.е. недорого."
+    )
+    assert split_sentences(text) == [
+        "Выручка выросла на 5.8% в 2024 г.",
+        "Это рекорд!",
+        "Музей им. А. С. Пушкина открыл 47 залов и т.д.",
+        "Далее планы.",
+        "Цена 3,5 млн. рублей, т.е. недорого.",
+    ]
+
+
+def test_year_mark_ends_sentence_only_after_a_number():
+    """"г." after a year can end a sentence, "г." before a city name cannot"""
+    text = "Встреча прошла в г. Москве в 2020 г. Потом была пауза в XX в. Конец."
+    assert split_sentences(text) == [
+        "Встреча прошла в г. Москве в 2020 г.",
+        "Потом была пауза в XX в.",
+        "Конец.",
+    ]
+
+
+def test_english_and_punctuation_preserved():
+    """Terminal punctuation and closing quotes stay with the sentence"""
+    text = 'Dr. Smith said "Hello." Then he left... Did he return? Yes.'
+    assert split_sentences(text) == [
+        'Dr. Smith said "Hello."', 'Then he left...', 'Did he return?', 'Yes.'
+    ]
+
+
+def test_spans_point_into_original_text():
+    """Spans are offsets into the source string, paragraphs are boundaries"""
+    text = "  Первый абзац без точки\n\nВторое предложение. Третье  "
+    spans = list(iter_sentence_spans(text))
+    assert [text[s:e] for s, e in spans] == [
+        "Первый абзац без точки", "Второе предложение.", "Третье"
+    ]
+    assert spans[0][0] == 2
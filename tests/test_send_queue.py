@@ -0,0 +1,120 @@
+"""
+Tests for outbound Telegram message queue
+"""
+
+import asyncio
+import pytest
+from bot.middleware.send_queue import (
+    OutboundMessageQueue, TokenBucket, PRIORITY_INTERACTIVE, PRIORITY_BULK
+)
+
+
+class FakeResponse:
+    def __init__(self, result):
+        self.result = result
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+    async def json(self, content_type=None):
+        return self.result
+
+
+class FakeSession:
+    """Записывает запросы и отвечает заданными результатами"""
+
+    def __init__(self, responses=None):
+        self.calls = []
+        self.responses = list(responses or [])
+
+    def post(self, url, json=None):
+        self.calls.append((url.rsplit('/', 1)[-1], dict(json)))
+        if self.responses:
+            return FakeResponse(self.responses.pop(0))
+        return FakeResponse({'ok': True, 'result': {'message_id': len(self.calls)}})
+
+
+def test_token_bucket_burst_and_refill():
+    """Bucket allows a burst, then asks to wait"""
+    bucket = TokenBucket(rate=1.0, capacity=2)
+    now = bucket.updated
+
+    assert bucket.wait_time(now) == 0
+    bucket.consume(now)
+    bucket.consume(now)
+    assert bucket.wait_time(now) == pytest.approx(1.0)
+    assert bucket.wait_time(now + 1.0) == 0
+
+
+def test_token_bucket_block():
+    """retry_after blocks the bucket"""
+    bucket = TokenBucket(rate=10.0, capacity=10)
+    bucket.block(5)
+    assert bucket.wait_time() > 4
+
+
+def test_interactive_before_bulk():
+    """Interactive lane is served before queued digests"""
+    async def scenario():
+        session = FakeSession()
+        queue = OutboundMessageQueue(session, 'https://api', global_rate=100, chat_rate=100, chat_burst=100)
+
+        bulk = [
+            asyncio.create_task(queue.request('sendMessage', {'chat_id': i, 'text': 'digest'},
+                                              chat_id=i, priority=PRIORITY_BULK))
+            for i in range(3)
+        ]
+        reply = asyncio.create_task(queue.request('sendMessage', {'chat_id': 99, 'text': 'reply'},
+                                                  chat_id=99, priority=PRIORITY_INTERACTIVE))
+        await asyncio.gather(*bulk, reply)
+        await queue.stop()
+        return session.calls
+
+    calls = asyncio.run(scenario())
+    assert calls[0][1]['text'] == 'reply'
+    assert len(calls) == 4
+
+
+def test_edits_coalesced():
+    """Pending edits of the same message are merged into one request"""
+    async def scenario():
+        session = FakeSession()
+        queue = OutboundMessageQueue(session, 'https://api', global_rate=100, chat_rate=1, chat_burst=1)
+
+        first = await queue.request('sendMessage', {'chat_id': 1, 'text': 'start'}, chat_id=1)
+        edits = [
+            asyncio.create_task(queue.request(
+                'editMessageText', {'chat_id': 1, 'message_id': 7, 'text': f'{i}%'},
+                chat_id=1, coalesce=True))
+            for i in (10, 50, 90)
+        ]
+        results = await asyncio.gather(*edits)
+        await queue.stop()
+        return first, results, session.calls, queue.get_stats()
+
+    first, results, calls, stats = asyncio.run(scenario())
+    assert first['ok']
+    assert all(r['ok'] for r in results)
+    assert len(calls) == 2
+    assert calls[1][1]['text'] == '90%'
+    assert stats['coalesced'] == 2
+
+
+def test_retry_after_handling():
+    """429 responses are retried after retry_after"""
+    async def scenario():
+        session = FakeSession([
+            {'ok': False, 'error_code': 429, 'parameters': {'retry_after': 0.05}},
+        ])
+        queue = OutboundMessageQueue(session, 'https://api', global_rate=100, chat_rate=100, chat_burst=100)
+        result = await queue.request('sendMessage', {'chat_id': 1, 'text': 'hi'}, chat_id=1)
+        await queue.stop()
+        return result, session.calls, queue.get_stats()
+
+    result, calls, stats = asyncio.run(scenario())
+    assert result['ok']
+    assert len(calls) == 2
+    assert stats['rate_limited'] == 1
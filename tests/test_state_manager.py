@@ -0,0 +1,42 @@
+"""
+Tests for versioned StateManager backends
+"""
+
+import time
+
+import pytest
+
+from bot.state_backends import SQLiteStateBackend
+from bot.state_manager import StateConflict, StateManager, UserStep
+
+
+def test_stale_write_conflicts_and_update_retries(tmp_path):
+    """Two replicas share SQLite; a stale save is rejected, update_state reapplies"""
+    path = str(tmp_path / "state.db")
+    first = StateManager(backend=SQLiteStateBackend(path))
+    second = StateManager(backend=SQLiteStateBackend(path))
+
+    stale = first.get_state(1)
+    fresh = second.get_state(1)
+    fresh.step = UserStep.WAITING_TEXT
+    second.save_state(1, fresh)
+
+    stale.compression = "10"
+    with pytest.raises(StateConflict):
+        first.save_state(1, stale)
+
+    state = first.update_state(1, lambda s: setattr(s, 'compression', "10"))
+    assert (state.step, state.compression) == (UserStep.WAITING_TEXT, "10")
+    assert second.get_state(1).compression == "10"
+
+
+def test_cleanup_inactive_in_batches(tmp_path):
+    backend = SQLiteStateBackend(str(tmp_path / "state.db"))
+    manager = StateManager(backend=backend)
+    for user_id in range(7):
+        manager.get_state(user_id)
+    backend._conn.execute("UPDATE user_state SET last_activity = ? WHERE user_id < 5", (time.time() - 7200,))
+
+    assert manager.cleanup_inactive(max_age_hours=1, batch_size=2) == 5
+    assert sorted(manager.get_all_user_ids()) == [5, 6]
+    assert manager.get_stats()['total_users'] == 2
@@ -0,0 +1,41 @@
+"""
+Tests for bounded TTL/LRU state stores
+"""
+
+import time
+
+from bot.state_store import BoundedStore, SQLiteStoreBackend
+
+
+def test_lru_bytes_and_ttl_limits():
+    """Least recently used entries go first, expired ones disappear"""
+    store = BoundedStore('test', max_entries=3, ttl=0.2)
+    for user_id in range(4):
+        store[user_id] = {'step': 'idle'}
+    store[1]  # обращение делает запись свежей
+    store[4] = {'step': 'idle'}
+    assert sorted(store) == [1, 3, 4]
+    assert store.get_stats()['evictions'] == 2
+
+    time.sleep(0.25)
+    assert 1 not in store and len(store) == 0
+
+    texts = BoundedStore('texts', max_entries=10, max_bytes=1000)
+    texts[1] = 'x' * 600
+    texts[2] = 'y' * 600
+    assert list(texts) == [2]
+
+
+def test_sqlite_backend_shared_between_instances(tmp_path):
+    """Two stores over one SQLite file (two replicas) see the same state"""
+    path = str(tmp_path / 'state.db')
+    replica_a = BoundedStore('user_states', max_entries=2, ttl=60, backend=SQLiteStoreBackend(path))
+    replica_b = BoundedStore('user_states', max_entries=2, ttl=60, backend=SQLiteStoreBackend(path))
+
+    replica_a[42] = {'step': 'waiting_text'}
+    assert replica_b[42] == {'step': 'waiting_text'}
+
+    replica_b[43] = {}
+    replica_b[44] = {}
+    assert replica_a.sweep() == 1
+    assert sorted(replica_a) == [43, 44]
@@ -0,0 +1,35 @@
+"""
+Tests for the vectorized TextRank/LexRank engine
+"""
+
+import pytest
+
+pytest.importorskip("scipy")
+
+from summarizers.textrank import rank_sentences, summarize_sentences, tfidf_matrix
+
+SENTENCES = [
+    "Кошка сидит на окне.",
+    "Собака спит на полу.",
+    "Кошка и собака дружат.",
+    "Сегодня хорошая погода.",
+    "Кошка любит рыбу, собака любит мясо.",
+]
+
+
+def test_central_sentences_win_in_original_order():
+    """Sentences sharing the most content rank highest, order is preserved"""
+    for method in ("textrank", "lexrank"):
+        scores = rank_sentences(SENTENCES, method)
+        assert abs(scores.sum() - 1.0) < 1e-6
+        assert scores.argmin() == 3
+        assert summarize_sentences(SENTENCES, 2, method) == [SENTENCES[2], SENTENCES[4]]
+
+
+def test_degenerate_inputs():
+    """Empty, stop-word-only and short inputs do not break ranking"""
+    assert summarize_sentences([], 3) == []
+    assert summarize_sentences(SENTENCES[:2], 5) == SENTENCES[:2]
+    assert tfidf_matrix(["и в на", "the and"]).nnz == 0
+    scores = rank_sentences(["и в на", "Кошка спит.", "Кошка ест."])
+    assert scores[1] > scores[0] and abs(scores.sum() - 1.0) < 1e-6
@@ -0,0 +1,44 @@
+"""
+Tests for the indexed transcript cache
+"""
+
+import hashlib
+
+from asr.cache import TranscriptCache, file_sha256
+
+
+def test_file_sha256_matches_whole_file_hash(tmp_path):
+    path = tmp_path / "audio.ogg"
+    data = b"\x00\x01voice" * 300000
+    path.write_bytes(data)
+    assert file_sha256(str(path), block_size=4096) == hashlib.sha256(data).hexdigest()
+
+
+def test_cache_is_keyed_by_variant_and_survives_reopen(tmp_path):
+    db_path = str(tmp_path / "cache" / "transcripts.db")
+    cache = TranscriptCache(db_path)
+    cache.put("abc", {"text": "привет"}, "faster_whisper:small:ru")
+
+    assert cache.get("abc", "faster_whisper:small:ru") == {"text": "привет"}
+    assert cache.get("abc", "faster_whisper:small:en") is None
+    cache.close()
+
+    reopened = TranscriptCache(db_path)
+    assert reopened.get("abc", "faster_whisper:small:ru") == {"text": "привет"}
+    assert reopened.get_stats()["entries"] == 1
+
+
+def test_cache_evicts_least_recently_used_over_size_limit(tmp_path):
+    cache = TranscriptCache(str(tmp_path / "transcripts.db"), max_bytes=250)
+    text = "x" * 90
+    cache.put("a", {"text": text})
+    cache.put("b", {"text": text})
+    cache.get("a")  # "b" is now the least recently used
+    cache.put("c", {"text": text})
+
+    assert cache.get("b") is None
+    assert cache.get("a") == {"text": text}
+    assert cache.get("c") == {"text": text}
+    stats = cache.get_stats()
+    assert stats["evictions"] == 1
+    assert stats["bytes"] <= 250
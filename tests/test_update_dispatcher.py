@@ -0,0 +1,131 @@
+"""
+Tests for bounded update dispatcher
+"""
+
+import asyncio
+from bot.core.dispatcher import (
+    UpdateDispatcher, coalesce_text_updates, get_update_queue_key, supersedes_callback
+)
+
+
+def make_update(update_id, chat_id):
+    return {'update_id': update_id, 'message': {'chat': {'id': chat_id}, 'text': str(update_id)}}
+
+
+def test_queue_key_extraction():
+    """Updates are keyed by sender, then chat, unknown updates by update_id"""
+    assert get_update_queue_key(make_update(1, 42)) == 42
+    callback = {'update_id': 2, 'callback_query': {'message': {'chat': {'id': 7}}}}
+    assert get_update_queue_key(callback) == 7
+    callback['callback_query']['from'] = {'id': 5}
+    assert get_update_queue_key(callback) == 5
+    assert get_update_queue_key({'update_id': 3}) == ('update', 3)
+
+
+def test_per_chat_ordering_and_parallelism():
+    """Same chat is serialized, different chats run in parallel"""
+    async def scenario():
+        order = []
+        running = {'now': 0, 'max': 0, 'per_chat': {}}
+
+        async def handle(update):
+            chat_id = update['message']['chat']['id']
+            running['now'] += 1
+            running['max'] = max(running['max'], running['now'])
+            running['per_chat'][chat_id] = running['per_chat'].get(chat_id, 0) + 1
+            assert running['per_chat'][chat_id] == 1
+            await asyncio.sleep(0.01)
+            order.append(update['update_id'])
+            running['per_chat'][chat_id] -= 1
+            running['now'] -= 1
+
+        dispatcher = UpdateDispatcher(handle, max_workers=4)
+        dispatcher.start()
+        for i in range(12):
+            assert dispatcher.submit(make_update(i, i % 3))
+        await dispatcher.stop()
+        return order, running['max'], dispatcher.get_stats()
+
+    order, max_parallel, stats = asyncio.run(scenario())
+    for chat in range(3):
+        chat_updates = [u for u in order if u % 3 == chat]
+        assert chat_updates == sorted(chat_updates)
+    assert max_parallel == 3
+    assert stats['processed'] == 12
+    assert stats['pending'] == 0
+
+
+def test_load_shedding():
+    """Overflowing updates are rejected and reported"""
+    async def scenario():
+        shed = []
+        release = asyncio.Event()
+
+        async def handle(update):
+            await release.wait()
+
+        async def on_overload(update):
+            shed.append(update['update_id'])
+
+        dispatcher = UpdateDispatcher(handle, on_overload=on_overload, max_workers=1, max_pending=2)
+        dispatcher.start()
+        accepted = [dispatcher.submit(make_update(i, i)) for i in range(3)]
+        await asyncio.sleep(0.01)  # первый уходит в работу, освобождая место
+        accepted.append(dispatcher.submit(make_update(3, 3)))
+        accepted.append(dispatcher.submit(make_update(4, 4)))
+        await asyncio.sleep(0)
+        release.set()
+        await dispatcher.stop()
+        return accepted, shed, dispatcher.get_stats()
+
+    accepted, shed, stats = asyncio.run(scenario())
+    assert accepted == [True, True, False, True, False]
+    assert shed == [2, 4]
+    assert stats['shed'] == 2
+
+
+def test_waiting_updates_coalesce_and_supersede():
+    """Queued texts merge, a newer level choice replaces the waiting one"""
+    def text(update_id, body):
+        return {'update_id': update_id, 'message': {'chat': {'id': 1}, 'date': 100, 'text': body}}
+
+    def level(update_id, data):
+        return {'update_id': update_id, 'callback_query': {
+            'id': str(update_id), 'data': data, 'message': {'message_id': 9, 'chat': {'id': 1}}}}
+
+    async def scenario():
+        handled, queued, dropped = [], [], []
+        release = asyncio.Event()
+
+        async def handle(update):
+            await release.wait()
+            handled.append(update)
+
+        async def on_queued(update, ahead, coalesced):
+            queued.append((update['update_id'], ahead, coalesced))
+
+        async def on_dropped(update):
+            dropped.append(update['update_id'])
+
+        dispatcher = UpdateDispatcher(
+            handle, max_workers=2, on_queued=on_queued, on_dropped=on_dropped,
+            coalesce=coalesce_text_updates, supersedes=supersedes_callback,
+        )
+        dispatcher.start()
+        dispatcher.submit(text(1, "first"))
+        await asyncio.sleep(0.01)  # first is running
+        for update in (text(2, "part one"), text(3, "part two"),
+                       level(4, "compression_10"), level(5, "compression_50")):
+            assert dispatcher.submit(update)
+        await asyncio.sleep(0)
+        release.set()
+        await dispatcher.stop()
+        return handled, queued, dropped, dispatcher.get_stats()
+
+    handled, queued, dropped, stats = asyncio.run(scenario())
+    assert [u['update_id'] for u in handled] == [1, 2, 5]
+    assert handled[1]['message']['text'] == "part one\n\npart two"
+    assert handled[1]['coalesced_update_ids'] == [3]
+    assert queued == [(2, 1, False), (3, 1, True), (4, 2, False)]
+    assert dropped == [4]
+    assert (stats['coalesced'], stats['superseded'], stats['pending']) == (1, 1, 0)
@@ -0,0 +1,55 @@
+"""
+Tests for persistent update offset and idempotency ledger
+"""
+
+from bot.core.update_ledger import UpdateLedger, STATUS_SHED
+
+
+def make_update(update_id):
+    return {'update_id': update_id, 'message': {'chat': {'id': 1}, 'text': f'msg {update_id}'}}
+
+
+def test_offset_persisted(tmp_path):
+    """Offset survives ledger re-creation"""
+    db_path = str(tmp_path / 'updates.db')
+    ledger = UpdateLedger(db_path)
+    assert ledger.load_offset() == 0
+
+    ledger.record_batch([make_update(10), make_update(11)], offset=12)
+    assert UpdateLedger(db_path).load_offset() == 12
+
+
+def test_duplicates_skipped(tmp_path):
+    """Already recorded update_id is not returned again"""
+    ledger = UpdateLedger(str(tmp_path / 'updates.db'))
+    assert len(ledger.record_batch([make_update(1), make_update(2)])) == 2
+
+    ledger.mark_done(1)
+    fresh = ledger.record_batch([make_update(1), make_update(2), make_update(3)])
+    assert [u['update_id'] for u in fresh] == [3]
+
+
+def test_resume_after_restart(tmp_path):
+    """Pending updates are resumed, completed ones are not"""
+    db_path = str(tmp_path / 'updates.db')
+    ledger = UpdateLedger(db_path)
+    ledger.record_batch([make_update(1), make_update(2), make_update(3)], offset=4)
+    ledger.mark_done(1)
+    ledger.mark_done(3, STATUS_SHED)
+
+    restarted = UpdateLedger(db_path)
+    resumed = restarted.resume_pending()
+    assert resumed == [make_update(2)]
+
+
+def test_poison_update_gives_up(tmp_path):
+    """Update that keeps crashing the bot is abandoned after max_attempts"""
+    db_path = str(tmp_path / 'updates.db')
+    UpdateLedger(db_path).record_batch([make_update(5)])
+
+    attempts = 0
+    while UpdateLedger(db_path, max_attempts=3).resume_pending():
+        attempts += 1
+        assert attempts < 10
+
+    assert attempts == 2
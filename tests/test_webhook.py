@@ -0,0 +1,86 @@
+"""
+Tests for the webhook HTTP endpoint
+"""
+
+import asyncio
+
+from aiohttp.test_utils import TestClient, TestServer
+
+from bot.core.webhook import SECRET_HEADER, WebhookServer
+
+
+class FakeDispatcher:
+    queue_depth = 0
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, update):
+        self.submitted.append(update)
+        return True
+
+    def get_stats(self):
+        return {'queued': len(self.submitted)}
+
+
+def run_with_client(scenario, secret_token="s3cret"):
+    """Run scenario(client, dispatcher) against an in-process webhook app"""
+    async def main():
+        dispatcher = FakeDispatcher()
+        server = WebhookServer(dispatcher, secret_token=secret_token)
+        async with TestClient(TestServer(server.create_app())) as client:
+            await scenario(client, dispatcher)
+        return dispatcher
+
+    return asyncio.run(main())
+
+
+def test_wrong_or_missing_secret_token_is_rejected():
+    async def scenario(client, dispatcher):
+        update = {'update_id': 1}
+        response = await client.post("/webhook", json=update)
+        assert response.status == 401
+        response = await client.post("/webhook", json=update, headers={SECRET_HEADER: "guess"})
+        assert response.status == 401
+
+    assert run_with_client(scenario).submitted == []
+
+
+def test_malformed_json_returns_4xx():
+    async def scenario(client, dispatcher):
+        response = await client.post(
+            "/webhook", data=b"{not json", headers={SECRET_HEADER: "s3cret"}
+        )
+        assert 400 <= response.status < 500
+
+    assert run_with_client(scenario).submitted == []
+
+
+def test_valid_update_reaches_dispatcher_submit():
+    update = {'update_id': 7, 'message': {'chat': {'id': 42}, 'text': "привет"}}
+
+    async def scenario(client, dispatcher):
+        response = await client.post("/webhook", json=update, headers={SECRET_HEADER: "s3cret"})
+        assert response.status == 200
+        health = await client.get("/healthz")
+        assert (await health.json()) == {'status': 'ok', 'queued': 1}
+
+    assert run_with_client(scenario).submitted == [update]
+
+
+def test_coroutine_acceptor_is_awaited_before_reply():
+    """An async accept_update (ledger write in an executor) finishes before the 200"""
+    accepted = []
+
+    async def accept(update):
+        await asyncio.sleep(0.01)
+        accepted.append(update['update_id'])
+
+    async def main():
+        server = WebhookServer(FakeDispatcher(), accept_update=accept)
+        async with TestClient(TestServer(server.create_app())) as client:
+            response = await client.post("/webhook", json={'update_id': 3})
+            assert response.status == 200
+            assert accepted == [3]
+
+    asyncio.run(main())
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Benchmark: FactExtractor.extract_key_facts scaling with document size
+
+Doubling the input should roughly double the time. The previous
+per-number prefix sum over sentences (kept here as a reference) grows
+as sentences² × numbers.
+"""
+
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from summarization.fact_extractor import FactExtractor
+
+PARAGRAPH = (
+    "Выручка выросла на 42% и составила 5.8 миллиарда рублей против 4.1 миллиарда в 2023 году. "
+    "EBITDA увеличилась до 1.2 млрд рублей (+35%), чистая прибыль $180 миллионов. "
+    "Запуск производства к 15 марта 2025 года, доля рынка выросла с 12.3% до 15.7%. "
+    "Компания открыла новые точки продаж в регионах и расширила штат.\n\n"
+)
+
+
+def legacy_assign(text: str, numbers):
+    """Previous sentence/number binding with the O(i) offset recomputation"""
+    sentences = [s.strip() for s in re.split(r'[.!?]+', text) if s.strip()]
+    hits = 0
+    for i, sentence in enumerate(sentences):
+        for num in numbers:
+            start_pos = sum(len(sentences[j]) + 1 for j in range(i))
+            if start_pos <= num['position'][0] <= start_pos + len(sentence):
+                hits += 1
+    return hits
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - started
+
+
+def run():
+    extractor = FactExtractor(use_ner=False)  # NER cost is not what is measured here
+
+    print(f"{'paragraphs':>10} {'chars':>9} {'extract s':>10} {'legacy bind s':>14}")
+    for paragraphs in (50, 100, 200, 400, 800, 1600):
+        text = PARAGRAPH * paragraphs
+        extract_time = timed(extractor.extract_key_facts, text, 'ru')
+
+        if paragraphs <= 100:
+            numbers = extractor.extract_numbers(text)
+            legacy = f"{timed(legacy_assign, text, numbers):>14.2f}"
+        else:
+            legacy = f"{'(skipped)':>14}"
+
+        print(f"{paragraphs:>10} {len(text):>9} {extract_time:>10.3f} {legacy}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(run())
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Benchmark: memory of per-user and per-message records
+
+Compares the slotted record types with the representations they replaced
+(regular dataclasses and dict(row) per digest message, including raw_json
+that the old SELECT m.* carried along). Memory is measured with tracemalloc.
+"""
+
+import gc
+import sqlite3
+import sys
+import tracemalloc
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from bot.state_manager import UserState
+from digest.records import DIGEST_MESSAGE_COLUMNS, DigestMessage
+
+
+@dataclass
+class LegacyUserState:
+    """UserState before slots"""
+    step: Any = None
+    compression: Optional[str] = "30"
+    format: Optional[str] = "bullets"
+    smart_mode: bool = True
+    messages_buffer: List[Dict[str, Any]] = field(default_factory=list)
+    last_activity: datetime = field(default_factory=datetime.now)
+    version: int = 0
+
+
+def measure(build) -> int:
+    gc.collect()
+    tracemalloc.start()
+    objects = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+    return current
+
+
+def message_db(count: int) -> sqlite3.Connection:
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    conn.executescript("""
+        CREATE TABLE channels (id INTEGER PRIMARY KEY, username TEXT, title TEXT, tg_chat_id INTEGER);
+        CREATE TABLE messages (id INTEGER PRIMARY KEY, channel_id INTEGER, tg_message_id INTEGER,
+                               message_url TEXT, posted_at INTEGER, text TEXT, raw_json TEXT);
+    """)
+    conn.executemany("INSERT INTO channels VALUES (?, ?, ?, ?)",
+                     [(i, f"channel{i}", f"Channel {i}", -100 - i) for i in range(50)])
+    conn.executemany(
+        "INSERT INTO messages VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [(i, i % 50, i, f"https://t.me/channel{i % 50}/{i}", 1700000000 + i,
+          f"Сообщение {i} о новостях рынка и компаний", '{"id": %d, "views": 100}' % i)
+         for i in range(count)]
+    )
+    return conn
+
+
+def main():
+    users = 50000
+    legacy = measure(lambda: [LegacyUserState() for _ in range(users)])
+    slotted = measure(lambda: [UserState() for _ in range(users)])
+    print(f"UserState x{users}: dataclass {legacy / 2**20:.1f} MiB, "
+          f"slots {slotted / 2**20:.1f} MiB ({1 - slotted / legacy:.0%} less)")
+
+    messages = 50000
+    conn = message_db(messages)
+    legacy_query = ("SELECT m.*, c.username, c.title, c.tg_chat_id "
+                    "FROM messages m JOIN channels c ON m.channel_id = c.id")
+    compact_query = (f"SELECT {DIGEST_MESSAGE_COLUMNS} "
+                     "FROM messages m JOIN channels c ON m.channel_id = c.id")
+    legacy = measure(lambda: [dict(row) for row in conn.execute(legacy_query)])
+    slotted = measure(lambda: [DigestMessage.from_row(row) for row in conn.execute(compact_query)])
+    print(f"Digest messages x{messages}: dict rows {legacy / 2**20:.1f} MiB, "
+          f"DigestMessage {slotted / 2**20:.1f} MiB ({1 - slotted / legacy:.0%} less)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Benchmark: sentence segmentation and chunking on multi-megabyte inputs
+
+Compares the index-based segmenter/chunker with the previous
+concatenation-based chunker (kept here only as a reference).
+"""
+
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.chunking import iter_chunk_spans
+from utils.segmentation import iter_sentence_spans
+
+PARAGRAPH = (
+    "Компания «Технологии Будущего» подвела итоги 2024 г. Выручка выросла на 42% "
+    "и составила 5.8 млрд руб. против 4.1 млрд в 2023 г. Генеральный директор "
+    "А. С. Иванов отметил рост доли рынка с 12.3% до 15.7%, открытие 47 точек и т.д. "
+    "Revenue grew by 42% to $5.8 billion, Dr. Smith said. Net profit was $180 million!\n\n"
+)
+
+
+def legacy_split_into_chunks(text: str, max_chars: int):
+    """Previous SummarizationPipeline._split_into_chunks (quadratic concatenation)"""
+    chunks = []
+    current_chunk = ""
+    for section in re.split(r'\n\n(?=[А-ЯЁA-Z].*:|\d+\.|\*|#)', text):
+        if len(current_chunk + section) <= max_chars:
+            current_chunk += section
+        else:
+            if current_chunk:
+                chunks.append(current_chunk.strip())
+            current_chunk = section
+    if current_chunk:
+        chunks.append(current_chunk.strip())
+
+    final_chunks = []
+    for chunk in chunks:
+        if len(chunk) <= max_chars:
+            final_chunks.append(chunk)
+            continue
+        sub_chunk = ""
+        for sentence in re.split(r'[.!?]+', chunk):
+            if len(sub_chunk + sentence) <= max_chars:
+                sub_chunk += sentence + ". "
+            else:
+                if sub_chunk:
+                    final_chunks.append(sub_chunk.strip())
+                sub_chunk = sentence + ". "
+        if sub_chunk:
+            final_chunks.append(sub_chunk.strip())
+    return final_chunks
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - started, result
+
+
+def run():
+    print(f"{'size':>8} {'sentences':>10} {'segment s':>10} {'chunk s':>9} {'legacy s':>9}")
+    for megabytes in (1, 2, 4, 8):
+        text = PARAGRAPH * (megabytes * 1024 * 1024 // len(PARAGRAPH.encode('utf-8')))
+        # Single huge section forces the legacy sentence fallback path
+        single_section = text.replace("\n\n", " ")
+
+        seg_time, sentences = timed(lambda t: sum(1 for _ in iter_sentence_spans(t)), text)
+        chunk_time, _ = timed(lambda t: sum(1 for _ in iter_chunk_spans(t, 1000, 100)), single_section)
+        legacy_time, _ = timed(legacy_split_into_chunks, single_section, 2800)
+
+        print(f"{megabytes:>6}MB {sentences:>10} {seg_time:>10.2f} {chunk_time:>9.2f} {legacy_time:>9.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(run())
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Benchmark: extractive TextRank/LexRank ranking on large sentence counts
+
+TF-IDF build and PageRank are timed separately; TextRank never forms
+the n×n similarity matrix, LexRank builds it sparse with a threshold.
+"""
+
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from summarizers.textrank import pagerank, tfidf_matrix, _lexrank_graph, _textrank_graph
+
+
+def make_sentences(count: int, vocabulary: int = 5000, length: int = 15):
+    rng = random.Random(42)
+    words = [f"слово{i}" for i in range(vocabulary)]
+    return [" ".join(rng.choice(words) for _ in range(length)) + "." for _ in range(count)]
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - started, result
+
+
+def run():
+    print(f"{'sentences':>10} {'tfidf s':>8} {'textrank s':>11} {'lexrank s':>10}")
+    for count in (1000, 10000, 30000):
+        tfidf_time, matrix = timed(tfidf_matrix, make_sentences(count))
+        textrank_time, _ = timed(lambda m: pagerank(*_textrank_graph(m)), matrix)
+        lexrank_time, _ = timed(lambda m: pagerank(*_lexrank_graph(m, 0.1)), matrix)
+        print(f"{count:>10} {tfidf_time:>8.3f} {textrank_time:>11.4f} {lexrank_time:>10.4f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(run())
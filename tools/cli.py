@@ -45,7 +45,11 @@ def main():
         
         elif args.action == 'transcribe':
             if args.file:
-                result = transcribe_audio(args.file, args.lang if args.lang != 'auto' else None)
+                # Windows are printed as soon as they are decoded
+                result = transcribe_audio(
+                    args.file, args.lang if args.lang != 'auto' else None,
+                    on_partial=lambda w: print(f"[{w.start:.0f}-{w.end:.0f}s] {w.text}", flush=True)
+                )
                 print("Transcription:", result)
             else:
                 print("Please provide --file for audio transcription")
@@ -0,0 +1,160 @@
+"""
+Token-aware text chunking shared by all summarizers
+
+Chunks are packed to a token budget on paragraph/sentence boundaries.
+Work is done on offset spans into the original string, so packing is
+linear in the text length and text is only copied when a chunk is emitted.
+"""
+
+import re
+from typing import Iterator, List, Optional, Tuple
+
+from utils.segmentation import iter_sentence_spans
+
+# Characters per token for typical BPE tokenizers (Llama 3 / Gemini)
+ASCII_CHARS_PER_TOKEN = 4.0
+# Cyrillic and other non-ASCII text costs roughly twice as many tokens per char
+NON_ASCII_CHARS_PER_TOKEN = 2.0
+
+_PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+
+Span = Tuple[int, int]
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Fast token estimate without a tokenizer
+
+    Non-ASCII characters (Cyrillic) are 2 bytes in UTF-8, so the byte/char
+    difference counts them in C without a Python-level loop.
+    """
+    if not text:
+        return 0
+    non_ascii = len(text.encode('utf-8')) - len(text)
+    ascii_chars = max(0, len(text) - non_ascii)
+    return int(ascii_chars / ASCII_CHARS_PER_TOKEN + non_ascii / NON_ASCII_CHARS_PER_TOKEN) + 1
+
+
+def chars_per_token(text: str) -> float:
+    """Average characters per token of this text (for char-based limits)"""
+    sample = text[:20000]
+    return len(sample) / estimate_tokens(sample) if sample else ASCII_CHARS_PER_TOKEN
+
+
+def _split_spans(text: str, start: int, end: int, pattern: re.Pattern) -> Iterator[Span]:
+    """Spans of text[start:end] between separator matches (separators dropped)"""
+    position = start
+    for match in pattern.finditer(text, start, end):
+        if match.start() > position:
+            yield position, match.start()
+        position = match.end()
+    if position < end:
+        yield position, end
+
+
+def _hard_split(text: str, start: int, end: int, max_tokens: int) -> Iterator[Span]:
+    """Split an oversized span by characters, preferring whitespace"""
+    step = max(1, int(max_tokens * (end - start) / max(1, estimate_tokens(text[start:end]))))
+    while start < end:
+        stop = min(end, start + step)
+        if stop < end:
+            space = text.rfind(' ', start + step // 2, stop)
+            if space > start:
+                stop = space
+        yield start, stop
+        start = stop
+        while start < end and text[start].isspace():
+            start += 1
+
+
+def iter_units(text: str, max_tokens: int) -> Iterator[Tuple[int, int, int]]:
+    """
+    Segment text into packable units (start, end, tokens)
+
+    Paragraphs are kept whole when they fit; otherwise they fall back to
+    sentences and, for a single huge sentence, to whitespace splits.
+    """
+    for p_start, p_end in _split_spans(text, 0, len(text), _PARAGRAPH_BREAK):
+        tokens = estimate_tokens(text[p_start:p_end])
+        if tokens <= max_tokens:
+            yield p_start, p_end, tokens
+            continue
+
+        for s_start, s_end in iter_sentence_spans(text, p_start, p_end):
+            tokens = estimate_tokens(text[s_start:s_end])
+            if tokens <= max_tokens:
+                yield s_start, s_end, tokens
+            else:
+                for h_start, h_end in _hard_split(text, s_start, s_end, max_tokens):
+                    yield h_start, h_end, estimate_tokens(text[h_start:h_end])
+
+
+def iter_chunk_spans(text: str, max_tokens: int, overlap_tokens: int = 0) -> Iterator[Span]:
+    """
+    Stream (start, end) offsets of chunks packed to max_tokens
+
+    Consecutive chunks share trailing units worth up to overlap_tokens.
+    """
+    if max_tokens <= 0:
+        raise ValueError("max_tokens must be positive")
+    overlap_tokens = min(overlap_tokens, max_tokens // 2)
+
+    window: List[Tuple[int, int, int]] = []
+    window_tokens = 0
+    fresh = False  # window has units not yet emitted
+
+    for unit in iter_units(text, max_tokens):
+        if window and window_tokens + unit[2] > max_tokens:
+            if fresh:
+                yield window[0][0], window[-1][1]
+
+            # Keep the tail of the emitted chunk as overlap for the next one
+            kept: List[Tuple[int, int, int]] = []
+            kept_tokens = 0
+            for previous in reversed(window):
+                if kept_tokens + previous[2] > overlap_tokens or kept_tokens + previous[2] + unit[2] > max_tokens:
+                    break
+                kept.append(previous)
+                kept_tokens += previous[2]
+            window = kept[::-1]
+            window_tokens = kept_tokens
+
+        window.append(unit)
+        window_tokens += unit[2]
+        fresh = True
+
+    if window and fresh:
+        yield window[0][0], window[-1][1]
+
+
+def iter_chunks(text: str, max_tokens: int, overlap_tokens: int = 0) -> Iterator[str]:
+    """Stream chunk strings packed to max_tokens (see iter_chunk_spans)"""
+    for start, end in iter_chunk_spans(text, max_tokens, overlap_tokens):
+        yield text[start:end]
+
+
+def chunk_text(text: str, max_tokens: int, overlap_tokens: int = 0,
+               max_chunks: Optional[int] = None) -> List[str]:
+    """
+    Split text into chunks of at most max_tokens estimated tokens
+
+    Args:
+        text: Source text
+        max_tokens: Token budget per chunk
+        overlap_tokens: Context carried over between consecutive chunks
+        max_chunks: Stop after this many chunks (None - no limit)
+
+    Returns:
+        List of chunks; text that fits the budget is returned as one chunk
+    """
+    if not text:
+        return []
+    if estimate_tokens(text) <= max_tokens:
+        return [text]
+
+    chunks = []
+    for chunk in iter_chunks(text, max_tokens, overlap_tokens):
+        chunks.append(chunk)
+        if max_chunks is not None and len(chunks) >= max_chunks:
+            break
+    return chunks
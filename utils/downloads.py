@@ -0,0 +1,157 @@
+"""
+Общий сервис скачивания файлов Telegram
+
+Одна aiohttp сессия с пулом keep-alive соединений на весь процесс вместо
+новой сессии на каждый файл. Тело ответа читается потоком блоками,
+размер которых подбирается по Content-Length; SHA-256 считается по ходу
+чтения (кэшам не нужно перечитывать файл), лимит размера проверяется по
+заголовку и во время чтения - до того, как тело скачано целиком.
+Небольшие файлы (фото) можно получить в памяти, без временного файла.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+import aiofiles
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+MIN_CHUNK_SIZE = 64 * 1024
+MAX_CHUNK_SIZE = 1024 * 1024
+# Лимит скачивания в память, если вызывающий не задал свой
+SPOOL_MAX_BYTES = 2 * 1024 * 1024
+
+
+class DownloadTooLarge(Exception):
+    """Файл превышает допустимый размер"""
+
+    def __init__(self, size: int, max_bytes: int):
+        super().__init__(f"Файл слишком большой: {size / 1024 / 1024:.1f} МБ (лимит: {max_bytes / 1024 / 1024:.0f} МБ)")
+        self.size = size
+        self.max_bytes = max_bytes
+
+
+@dataclass
+class DownloadResult:
+    """Скачанный файл: на диске (path) или в памяти (data)"""
+    size: int
+    sha256: str
+    path: Optional[str] = None
+    data: Optional[bytes] = None
+
+    async def read_bytes(self) -> bytes:
+        if self.data is not None:
+            return self.data
+        async with aiofiles.open(self.path, 'rb') as f:
+            return await f.read()
+
+
+def choose_chunk_size(content_length: Optional[int]) -> int:
+    """Примерно 1/16 файла, в пределах MIN_CHUNK_SIZE..MAX_CHUNK_SIZE"""
+    if not content_length:
+        return MIN_CHUNK_SIZE
+    return max(MIN_CHUNK_SIZE, min(MAX_CHUNK_SIZE, content_length // 16))
+
+
+class DownloadService:
+    """
+    Пул соединений для скачивания
+
+    Сессия создается лениво внутри работающего event loop и закрывается
+    через close() при остановке бота.
+    """
+
+    def __init__(self, max_connections: int = 16, timeout: float = 600,
+                 spool_max_bytes: int = SPOOL_MAX_BYTES):
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.spool_max_bytes = spool_max_bytes
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._lock = asyncio.Lock()
+
+    async def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            async with self._lock:
+                if self._session is None or self._session.closed:
+                    self._session = aiohttp.ClientSession(
+                        connector=aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=60),
+                        timeout=aiohttp.ClientTimeout(total=self.timeout),
+                    )
+        return self._session
+
+    async def get_json(self, url: str) -> dict:
+        """GET с разбором JSON (getFile и т.п.)"""
+        session = await self.session()
+        async with session.get(url) as response:
+            response.raise_for_status()
+            return await response.json()
+
+    async def download(self, url: str, dst_path: Optional[str] = None,
+                       max_bytes: Optional[int] = None) -> DownloadResult:
+        """
+        Скачать файл потоком
+
+        Args:
+            url: Адрес файла
+            dst_path: Куда сохранить; None - вернуть тело в памяти
+            max_bytes: Лимит размера (без dst_path по умолчанию - spool_max_bytes)
+
+        Raises:
+            DownloadTooLarge: файл больше лимита (по Content-Length или по ходу чтения)
+            aiohttp.ClientResponseError: HTTP ошибка
+        """
+        limit = max_bytes
+        if dst_path is None and not limit:
+            limit = self.spool_max_bytes
+
+        session = await self.session()
+        async with session.get(url) as response:
+            response.raise_for_status()
+            if limit and response.content_length and response.content_length > limit:
+                raise DownloadTooLarge(response.content_length, limit)
+
+            digest = hashlib.sha256()
+            chunk_size = choose_chunk_size(response.content_length)
+            size = 0
+
+            if dst_path is None:
+                # Блоки склеиваются один раз в конце
+                chunks = []
+                async for chunk in response.content.iter_chunked(chunk_size):
+                    size += len(chunk)
+                    if size > limit:
+                        raise DownloadTooLarge(size, limit)
+                    digest.update(chunk)
+                    chunks.append(chunk)
+                return DownloadResult(size=size, sha256=digest.hexdigest(), data=b"".join(chunks))
+
+            try:
+                async with aiofiles.open(dst_path, 'wb') as f:
+                    async for chunk in response.content.iter_chunked(chunk_size):
+                        size += len(chunk)
+                        if limit and size > limit:
+                            raise DownloadTooLarge(size, limit)
+                        digest.update(chunk)
+                        await f.write(chunk)
+            except BaseException:
+                # Недокачанный файл не должен попасть в обработку
+                if os.path.exists(dst_path):
+                    os.remove(dst_path)
+                raise
+
+        logger.debug(f"Скачано {size / 1024:.0f} КБ блоками по {chunk_size // 1024} КБ: {dst_path}")
+        return DownloadResult(size=size, sha256=digest.hexdigest(), path=dst_path)
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+# Общий сервис процесса
+download_service = DownloadService()
@@ -6,6 +6,8 @@ Avoids external API calls by using character-based detection
 import re
 from typing import Optional
 
+from utils.chunking import chars_per_token
+
 def detect_language_simple(text: str) -> str:
     """
     Simple heuristic language detection for RU/EN
@@ -80,12 +82,11 @@ def get_chunking_params(text: str, target_tokens: int = 3000) -> dict:
     Returns:
         Dict with chunking parameters
     """
-    # Rough token estimation: 1 token ≈ 4 characters for English, 3 for Russian
     lang = detect_language_simple(text)
-    chars_per_token = 3 if lang == 'ru' else 4
+    ratio = chars_per_token(text)
     
-    target_chars = target_tokens * chars_per_token
-    overlap_chars = 300 * chars_per_token  # 300 tokens overlap
+    target_chars = int(target_tokens * ratio)
+    overlap_chars = int(300 * ratio)  # 300 tokens overlap
     
     return {
         'max_chars': target_chars,
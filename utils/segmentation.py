@@ -0,0 +1,120 @@
+"""
+Linear-time sentence segmentation for Russian and English text
+
+Single pass over candidate terminators with offset spans into the original
+string; nothing is copied until the caller slices a span. Handles common
+Russian/English abbreviations, initials and decimal numbers.
+"""
+
+import re
+from typing import Iterator, List, Optional, Tuple
+
+Span = Tuple[int, int]
+
+# Terminator (with closing quotes/brackets) followed by whitespace, or a blank line
+_BOUNDARY = re.compile(r'[.!?…]+[»"”’)\]]*(?=\s)|\n[ \t]*\n\s*')
+# Last "word" before a period: letters and inner dots (т.е, e.g, А)
+_WORD_BEFORE = re.compile(r'(?:^|[^\w.])([\w.]{1,12})$')
+_MAX_WORD_LOOKBEHIND = 16
+
+# Never end a sentence: titles and prefixes followed by a name or number
+ABBREVIATIONS_NO_BREAK = frozenset({
+    'им', 'ул', 'пр', 'просп', 'пер', 'д', 'кв', 'корп', 'стр', 'обл', 'р-н',
+    'проф', 'акад', 'доц', 'тов', 'гр', 'св', 'ст', 'см', 'рис', 'табл', 'гл',
+    'п', 'пп', 'ч', 'т', 'тт', 'с', 'напр', 'разд', 'илл', 'с.-пб',
+    'mr', 'mrs', 'ms', 'dr', 'prof', 'st', 'vs', 'no', 'fig', 'p', 'pp', 'vol',
+    'jr', 'sr', 'inc', 'ltd', 'co', 'corp', 'e.g', 'i.e', 'cf', 'approx',
+})
+
+# May end a sentence: only a boundary when the next word is capitalised
+ABBREVIATIONS_MAY_END = frozenset({
+    'т.е', 'т.д', 'т.п', 'т.к', 'т.н', 'др', 'руб',
+    'коп', 'тыс', 'млн', 'млрд', 'трлн', 'долл', 'мин', 'сек', 'кг', 'км', 'etc',
+})
+
+# Year/century marks ("2020 г.", "XX в.") may end a sentence only after a number;
+# otherwise they are prefixes ("в г. Москве", "в. Новгород")
+ABBREVIATIONS_AFTER_NUMBER = frozenset({'г', 'гг', 'в', 'вв'})
+
+# Number or range before a year/century mark: 2020, 2019-2020, XX, XIX–XX
+_NUMBER_BEFORE = re.compile(r'(?:\d+|[IVXLC]+)(?:[-–—](?:\d+|[IVXLC]+))?\s+$')
+
+
+def _is_abbreviation_stop(text: str, dot_pos: int, next_pos: int) -> bool:
+    """True if the period at dot_pos belongs to an abbreviation or initial"""
+    window = text[max(0, dot_pos - _MAX_WORD_LOOKBEHIND):dot_pos]
+    match = _WORD_BEFORE.search(window)
+    if not match:
+        return False
+
+    word = match.group(1).lower().rstrip('.')
+    if not word:
+        return False
+
+    next_char = text[next_pos] if next_pos < len(text) else ''
+
+    # Initials: "А. С. Пушкин", "J. R. R. Tolkien"
+    if len(word) == 1 and word.isalpha() and match.group(1)[0].isupper():
+        return True
+    if word in ABBREVIATIONS_NO_BREAK:
+        return True
+    if word in ABBREVIATIONS_MAY_END:
+        return not next_char.isupper()
+    if word in ABBREVIATIONS_AFTER_NUMBER:
+        word_start = dot_pos - len(window) + match.start(1)
+        before = text[max(0, word_start - _MAX_WORD_LOOKBEHIND):word_start]
+        return not (_NUMBER_BEFORE.search(before) and next_char.isupper())
+    return False
+
+
+def iter_sentence_spans(text: str, start: int = 0, end: Optional[int] = None) -> Iterator[Span]:
+    """
+    Stream (start, end) offsets of sentences in text[start:end]
+
+    Spans exclude surrounding whitespace and keep terminal punctuation.
+    """
+    end = len(text) if end is None else end
+    sentence_start = start
+
+    for match in _BOUNDARY.finditer(text, start, end):
+        boundary_end = match.end()
+        # Next non-space character after the boundary
+        next_pos = boundary_end
+        while next_pos < end and text[next_pos].isspace():
+            next_pos += 1
+
+        boundary = match.group()
+        if boundary[0] == '.':
+            dot_pos = match.start()
+            if (
+                boundary.rstrip('»"”’)]') == '.'
+                and dot_pos > 0 and text[dot_pos - 1].isalpha()
+                and _is_abbreviation_stop(text, dot_pos, next_pos)
+            ):
+                continue
+            # Lowercase continuation is not a new sentence ("5 млн. рублей", "... и т.д. и")
+            if next_pos < end and text[next_pos].islower():
+                continue
+
+        span = _strip_span(text, sentence_start, boundary_end)
+        if span:
+            yield span
+        sentence_start = next_pos
+
+    span = _strip_span(text, sentence_start, end)
+    if span:
+        yield span
+
+
+def _strip_span(text: str, start: int, end: int) -> Optional[Span]:
+    """Trim whitespace at span edges without copying the text"""
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return (start, end) if start < end else None
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split text into sentences (punctuation preserved)"""
+    return [text[s:e] for s, e in iter_sentence_spans(text)]
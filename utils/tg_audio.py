@@ -18,6 +18,7 @@ def extract_audio_descriptor(message: Dict) -> Dict:
         {
             "success": bool,
             "file_id": str,
+            "file_unique_id": str,  # одинаков для пересланных копий файла
             "type": str,           # "voice", "audio", "video_note", "document"
             "filename": str,
             "duration": float,
@@ -33,6 +34,7 @@ def extract_audio_descriptor(message: Dict) -> Dict:
             return {
                 "success": True,
                 "file_id": voice["file_id"],
+                "file_unique_id": voice.get("file_unique_id"),
                 "type": "голосовое сообщение",
                 "filename": f"voice_{voice['file_id'][:8]}.ogg",
                 "duration": voice.get("duration", 0.0),
@@ -47,6 +49,7 @@ def extract_audio_descriptor(message: Dict) -> Dict:
             return {
                 "success": True,
                 "file_id": audio["file_id"],
+                "file_unique_id": audio.get("file_unique_id"),
                 "type": "аудиофайл",
                 "filename": filename,
                 "duration": audio.get("duration", 0.0),
@@ -60,6 +63,7 @@ def extract_audio_descriptor(message: Dict) -> Dict:
             return {
                 "success": True,
                 "file_id": video_note["file_id"],
+                "file_unique_id": video_note.get("file_unique_id"),
                 "type": "видео-заметка",
                 "filename": f"video_note_{video_note['file_id'][:8]}.mp4",
                 "duration": video_note.get("duration", 0.0),
@@ -90,6 +94,7 @@ def extract_audio_descriptor(message: Dict) -> Dict:
                 return {
                     "success": True,
                     "file_id": document["file_id"],
+                    "file_unique_id": document.get("file_unique_id"),
                     "type": "аудио-документ",
                     "filename": filename or f"document_{document['file_id'][:8]}",
                     "duration": 0.0,  # Документы не имеют duration в API